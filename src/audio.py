@@ -0,0 +1,127 @@
+import json
+import math
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from httpclient import HttpClient, default_client, set_default_client
+from ytdlp import startupinfo
+
+# label -> ffmpeg libmp3lame arguments
+QUALITY_PRESETS = {
+    "V0 (VBR ~245k)": ["-q:a", "0"],
+    "V2 (VBR ~190k)": ["-q:a", "2"],
+    "320k CBR": ["-b:a", "320k"],
+    "256k CBR": ["-b:a", "256k"],
+    "192k CBR": ["-b:a", "192k"],
+    "128k CBR": ["-b:a", "128k"],
+}
+DEFAULT_QUALITY = "V2 (VBR ~190k)"
+
+# Files "ba/b" can leave in staging; subtitles, thumbnails and .info.json never match
+AUDIO_EXTENSIONS = (".m4a", ".webm", ".opus", ".ogg", ".aac", ".flac", ".wav", ".mp4")
+
+LOUDNORM_JSON = re.compile(r"\{[^{}]*\"input_i\"[^{}]*\}", re.DOTALL)
+LOUDNORM_MEASURED = ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")
+
+
+def ffmpeg_exe(ffmpeg_dir):
+    return os.path.join(ffmpeg_dir, "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg") if ffmpeg_dir else "ffmpeg"
+
+
+def measure_loudness(ffmpeg, src, target=-14.0, true_peak=-1.0, lra=11.0):
+    """EBU R128 pass 1: loudnorm analysis only, returns ffmpeg's measured values."""
+    command = [ffmpeg, "-hide_banner", "-nostats", "-i", src, "-vn",
+               "-af", f"loudnorm=I={target}:TP={true_peak}:LRA={lra}:print_format=json", "-f", "null", "-"]
+    process = subprocess.run(command, capture_output=True, text=True, errors="replace", startupinfo=startupinfo())
+    match = LOUDNORM_JSON.search(process.stderr)
+    if process.returncode != 0 or not match:
+        raise Exception(f"Loudness analysis failed: {process.stderr.strip()[-200:]}")
+    return json.loads(match.group(0))
+
+
+def fetch_cover(url, dest_dir):
+    if not url: return None
+    path = os.path.join(dest_dir, "cover")
+    try:
+        data = default_client().get(url, max_bytes=20 * 1024 * 1024).body
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+    except Exception:
+        return None
+
+
+def process_track(ffmpeg_dir, src, dest, tags=None, cover_url=None, quality=DEFAULT_QUALITY,
+                  normalize=True, target=-14.0, true_peak=-1.0, lra=11.0):
+    """Normalize (two-pass loudnorm), encode to MP3 and tag. Runs inside a pool process."""
+    ffmpeg = ffmpeg_exe(ffmpeg_dir)
+    tags = tags or {}
+    with tempfile.TemporaryDirectory() as tmp:
+        command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", src]
+        cover = fetch_cover(cover_url, tmp)
+        if cover: command.extend(["-i", cover])
+        command.extend(["-map", "0:a:0"])
+        m = measure_loudness(ffmpeg, src, target, true_peak, lra) if normalize else None
+        # A silent track measures -inf, which pass 2 cannot take; such tracks are encoded as they are
+        if m and all(math.isfinite(float(m[k])) for k in LOUDNORM_MEASURED):
+            # Pass 2 feeds the measurements back so the gain is linear rather than dynamic
+            command.extend(["-af", (f"loudnorm=I={target}:TP={true_peak}:LRA={lra}"
+                                    f":measured_I={m['input_i']}:measured_TP={m['input_tp']}"
+                                    f":measured_LRA={m['input_lra']}:measured_thresh={m['input_thresh']}"
+                                    f":offset={m['target_offset']}:linear=true"), "-ar", "44100"])
+        command.extend(["-c:a", "libmp3lame"] + QUALITY_PRESETS.get(quality, QUALITY_PRESETS[DEFAULT_QUALITY]))
+        if cover:
+            command.extend(["-map", "1:v:0", "-c:v", "mjpeg", "-vf", "scale='min(600,iw)':-2",
+                            "-disposition:v", "attached_pic", "-metadata:s:v", "title=Album cover",
+                            "-metadata:s:v", "comment=Cover (front)"])
+        for key, value in tags.items():
+            if value: command.extend(["-metadata", f"{key}={value}"])
+        command.extend(["-id3v2_version", "3", "-write_id3v1", "1", dest])
+        process = subprocess.run(command, capture_output=True, text=True, errors="replace", startupinfo=startupinfo())
+        if process.returncode != 0:
+            raise Exception(process.stderr.strip()[-300:] or "ffmpeg failed")
+    return dest
+
+
+def tags_from_info(info):
+    """ID3 fields from a yt-dlp info dict."""
+    date = info.get("release_date") or info.get("upload_date") or ""
+    return {
+        "title": info.get("track") or info.get("title"),
+        "artist": info.get("artist") or info.get("creator") or info.get("uploader") or info.get("channel"),
+        "album": info.get("album") or info.get("playlist_title"),
+        "track": str(info["playlist_index"]) if info.get("playlist_index") else None,
+        "date": date[:4] or None,
+        "comment": info.get("webpage_url"),
+    }
+
+
+def init_worker(proxy):
+    if proxy: set_default_client(HttpClient(proxy=proxy))
+
+
+class AudioPipeline:
+    """Process pool that post-processes finished audio downloads on every core.
+
+    ffmpeg's MP3 encoder is single-threaded, so one track per core is what
+    actually fills the machine when a whole playlist finishes. Workers are
+    spawned, not forked: a fork of this threaded process would inherit held
+    locks and the pooled keep-alive sockets of the parent's HTTP client.
+    """
+
+    def __init__(self, ffmpeg_dir, workers=None, proxy=None):
+        self.ffmpeg_dir = ffmpeg_dir
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 2,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker, initargs=(proxy,))
+
+    def submit(self, src, dest, tags=None, cover_url=None, quality=DEFAULT_QUALITY, normalize=True, target=-14.0):
+        return self.pool.submit(process_track, self.ffmpeg_dir, src, dest, tags, cover_url, quality, normalize, target)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,78 @@
+import json
+import re
+import threading
+import time
+
+UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3}
+SPEED_REGEX = re.compile(r"\bat\s+~?\s*([0-9.]+)\s*([KMG]i?B|B)/s")
+
+
+def parse_speed(line):
+    """Bytes/s from a yt-dlp progress line ('... at  2.31MiB/s ETA 00:40'), or None."""
+    match = SPEED_REGEX.search(line)
+    if not match: return None
+    return float(match.group(1)) * UNITS[match.group(2)]
+
+
+def format_rate(bytes_per_sec):
+    return f"{bytes_per_sec / (1024 * 1024):.2f}MiB/s"
+
+
+def estimate_size(fmt, duration=None):
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if not size and fmt.get("tbr") and duration:
+        size = fmt["tbr"] * 1000 / 8 * duration
+    return size
+
+
+class BandwidthEstimator:
+    """Rolling (EWMA) throughput per extractor, persisted between sessions."""
+
+    def __init__(self, path, alpha=0.2):
+        self.path = path
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.rates = {}
+        try:
+            with open(path, "r") as f:
+                self.rates = json.load(f)
+        except Exception:
+            pass
+
+    def record(self, key, bytes_per_sec):
+        if not key or not bytes_per_sec or bytes_per_sec <= 0: return
+        with self.lock:
+            entry = self.rates.get(key)
+            if entry:
+                entry["rate"] = (1 - self.alpha) * entry["rate"] + self.alpha * bytes_per_sec
+                entry["samples"] += 1
+            else:
+                entry = {"rate": bytes_per_sec, "samples": 1}
+                self.rates[key] = entry
+            entry["updated"] = time.time()
+
+    def estimate(self, key, default=None):
+        with self.lock:
+            entry = self.rates.get(key)
+            return entry["rate"] if entry else default
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.rates)
+        with open(self.path, "w") as f:
+            f.write(data)
+
+
+def pick_within_deadline(candidates, rate, seconds, extra_bytes=0, margin=0.85):
+    """Best candidate whose download fits in `seconds` at `rate`.
+
+    `candidates` is a list of (format_id, size) ordered worst -> best, as
+    yt-dlp lists them. Formats with unknown size are skipped. Returns None if
+    nothing fits, so the caller can fall back to the smallest.
+    """
+    budget = rate * seconds * margin
+    best = None
+    for format_id, size in candidates:
+        if size and size + extra_bytes <= budget:
+            best = format_id
+    return best
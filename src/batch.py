@@ -0,0 +1,67 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from links import site_of
+
+
+class BatchAnalyzer:
+    """Runs `analyze(url)` for many URLs with a global and a per-site concurrency cap.
+
+    Work is only handed to the pool when its site has a free slot, so a long
+    run of links from one site never blocks workers that other sites could use.
+    `on_result(url, info, error)` is called from worker threads as each finishes.
+    """
+
+    def __init__(self, analyze, on_result, max_workers=8, per_site=3):
+        self.analyze = analyze
+        self.on_result = on_result
+        self.per_site = per_site
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analyze")
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.inflight = {}
+        self.total_inflight = 0
+        self.cancelled = False
+
+    def submit(self, urls):
+        with self.lock:
+            for url in urls:
+                self.pending.setdefault(site_of(url), deque()).append(url)
+        self._dispatch()
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            self.pending.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.shutdown(wait=False)
+
+    def _dispatch(self):
+        with self.lock:
+            while not self.cancelled and self.total_inflight < self.max_workers:
+                site = next((s for s, q in self.pending.items() if q and self.inflight.get(s, 0) < self.per_site), None)
+                if site is None: break
+                url = self.pending[site].popleft()
+                if not self.pending[site]: del self.pending[site]
+                self.inflight[site] = self.inflight.get(site, 0) + 1
+                self.total_inflight += 1
+                self.pool.submit(self._run, site, url)
+
+    def _run(self, site, url):
+        info, error = None, None
+        try:
+            info = self.analyze(url)
+        except Exception as e:
+            error = e
+        finally:
+            with self.lock:
+                self.inflight[site] -= 1
+                self.total_inflight -= 1
+        try:
+            if not self.cancelled: self.on_result(url, info, error)
+        finally:
+            self._dispatch()
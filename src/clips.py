@@ -0,0 +1,64 @@
+import os
+import re
+
+RANGE_SPLIT = re.compile(r"[,;\n]+")
+
+
+def parse_timestamp(text):
+    """'90', '1:30', '01:02:03.5' -> seconds."""
+    parts = text.strip().split(":")
+    if not parts or len(parts) > 3 or not all(re.fullmatch(r"\d+(\.\d+)?", p) for p in parts):
+        raise ValueError(f"Bad timestamp: {text!r}")
+    seconds = 0.0
+    for p in parts:
+        seconds = seconds * 60 + float(p)
+    return seconds
+
+
+def parse_ranges(text):
+    """'0:30-1:00, 1:02:00-1:02:30' -> [(30.0, 60.0), (3720.0, 3750.0)]"""
+    ranges = []
+    for chunk in RANGE_SPLIT.split(text):
+        chunk = chunk.strip()
+        if not chunk: continue
+        if "-" not in chunk:
+            raise ValueError(f"Range needs start-end: {chunk!r}")
+        start, end = chunk.split("-", 1)
+        start, end = parse_timestamp(start), parse_timestamp(end)
+        if end <= start:
+            raise ValueError(f"Range ends before it starts: {chunk!r}")
+        ranges.append((start, end))
+    return ranges
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def section_args(ranges, accurate=False):
+    """yt-dlp fetches only the fragments covering each section.
+
+    Fast cuts land on the nearest keyframes and are stream-copied; accurate
+    cuts re-encode around the cut points.
+    """
+    args = []
+    for start, end in ranges:
+        # Fixed precision: :g would turn long offsets into 1.23457e+06
+        args.extend(["--download-sections", f"*{start:.3f}-{end:.3f}"])
+    if accurate:
+        args.append("--force-keyframes-at-cuts")
+    return args
+
+
+def clip_output_paths(save_path, count):
+    """One file per clip: 'Video.mp4' -> 'Video.clip1.mp4', 'Video.clip2.mp4', ..."""
+    if count <= 1: return [save_path]
+    root, ext = os.path.splitext(save_path)
+    return [f"{root}.clip{i}{ext}" for i in range(1, count + 1)]
+
+
+def clip_output_template(save_path, count):
+    if count <= 1: return save_path
+    root, ext = os.path.splitext(save_path)
+    return root.replace("%", "%%") + ".clip%(section_number)s" + ext.replace("%", "%%")
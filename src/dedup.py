@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from io import BytesIO
+
+CHUNK_SIZE = 1024 * 1024
+FICLONE = 0x40049409  # Linux ioctl, clones extents on btrfs/xfs
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def staging_candidates(path):
+    """Files yt-dlp writes on the way to `path`, in the order they appear."""
+    root, ext = os.path.splitext(path)
+    return [path + ".part", f"{root}.temp{ext}", path]
+
+
+class GrowingFileHasher:
+    """Hashes a download while yt-dlp is still writing it.
+
+    The followed file descriptor survives the `.part` -> final rename, so the
+    bytes are read once, straight out of the page cache. Only yt-dlp's
+    `.part` is written strictly front to back; ffmpeg's `.temp` outputs are
+    patched in place (mp4 `mdat` size, matroska duration) after we have read
+    past them. So the streamed hash counts only for a followed `.part` that
+    became the final file; anything else is hashed again once finished.
+    """
+
+    def __init__(self, path, poll_interval=0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._hash = hashlib.sha256()
+        self._fh = None
+        self._followed = None
+        self._pos = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _open(self):
+        for candidate in staging_candidates(self.path):
+            try:
+                fh = open(candidate, "rb")
+            except OSError:
+                continue
+            if self._fh: self._fh.close()
+            self._fh = fh
+            self._followed = candidate
+            self._hash = hashlib.sha256()
+            self._pos = 0
+            return
+
+    def _pump(self):
+        if self._fh is None:
+            self._open()
+            if self._fh is None: return
+        while True:
+            chunk = self._fh.read(CHUNK_SIZE)
+            if not chunk: break
+            self._hash.update(chunk)
+            self._pos += len(chunk)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try: self._pump()
+            except OSError: pass
+            self._stop.wait(self.poll_interval)
+
+    def cancel(self):
+        self._stop.set()
+        if self._fh: self._fh.close()
+
+    def finish(self):
+        """Stop following and return the sha256 of the final file (or None)."""
+        self._stop.set()
+        self._thread.join()
+        try:
+            if self._fh:
+                self._pump()
+                followed = os.fstat(self._fh.fileno())
+                final = os.stat(self.path)
+                if (self._followed == self.path + ".part" and (followed.st_ino, followed.st_dev) == (final.st_ino, final.st_dev)
+                        and self._pos == final.st_size):
+                    return self._hash.hexdigest()
+            return hash_file(self.path) if os.path.isfile(self.path) else None
+        finally:
+            if self._fh: self._fh.close()
+
+
+def clone_or_link(src, dst):
+    """Replace `dst` with a reflink (preferred) or hardlink of `src`, atomically."""
+    tmp = dst + ".dedup-tmp"
+    try:
+        if sys.platform.startswith("linux"):
+            try:
+                import fcntl
+                with open(src, "rb") as s, open(tmp, "wb") as d:
+                    fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                os.replace(tmp, dst)
+                return "reflink"
+            except OSError:
+                if os.path.exists(tmp): os.remove(tmp)
+        os.link(src, tmp)
+        os.replace(tmp, dst)
+        return "hardlink"
+    except OSError:
+        if os.path.exists(tmp): os.remove(tmp)
+        return None
+
+
+# --- Perceptual hashing (optional, needs Pillow / ffmpeg) ---
+
+def image_dhash(image, size=8):
+    image = image.convert("L").resize((size + 1, size))
+    px = list(image.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            right = px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def perceptual_hash(path, ffmpeg_path=None):
+    from PIL import Image
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jpg", ".jpeg", ".png", ".webp", ".gif", ".heic"):
+        with Image.open(path) as img:
+            return image_dhash(img)
+    if ext in (".mp3", ".m4a", ".opus", ".wav", ".flac"):
+        return None
+    exe = os.path.join(ffmpeg_path, "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg") if ffmpeg_path else "ffmpeg"
+    # A frame a few seconds in skips black intros/fades
+    command = [exe, "-v", "error", "-ss", "5", "-i", path, "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-"]
+    proc = subprocess.run(command, capture_output=True, check=False)
+    if proc.returncode != 0 or not proc.stdout:
+        return None
+    with Image.open(BytesIO(proc.stdout)) as img:
+        return image_dhash(img)
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class ContentIndex:
+    """sqlite index of finished downloads keyed by content hash."""
+
+    def __init__(self, db_path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER,
+            phash TEXT, source_url TEXT, added REAL, media_key TEXT)""")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        if "media_key" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN media_key TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_media_key ON files(media_key)")
+        # What each file was downloaded as, and replacements the upgrade scanner has found
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS formats (
+            path TEXT PRIMARY KEY, url TEXT NOT NULL, record TEXT NOT NULL, args TEXT,
+            recorded REAL, checked REAL)""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS upgrades (
+            path TEXT PRIMARY KEY, url TEXT NOT NULL, selector TEXT NOT NULL, reason TEXT,
+            status TEXT NOT NULL DEFAULT 'pending', error TEXT, updated REAL)""")
+        self.conn.commit()
+
+    def lookup(self, digest, exclude=None):
+        with self.lock:
+            rows = self.conn.execute("SELECT path, size FROM files WHERE sha256 = ?", (digest,)).fetchall()
+        for path, size in rows:
+            if path == exclude: continue
+            try:
+                if os.path.getsize(path) == size: return path
+            except OSError:
+                self.forget(path)
+        return None
+
+    def add(self, path, digest, source_url=None, phash=None, media_key=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, sha256, size, phash, source_url, added, media_key) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), digest, os.path.getsize(path), phash, source_url, time.time(), media_key))
+            self.conn.commit()
+
+    def paths_for_key(self, media_key):
+        """Existing files downloaded from the same item (any URL variant)."""
+        with self.lock:
+            rows = self.conn.execute("SELECT path FROM files WHERE media_key = ?", (media_key,)).fetchall()
+        return [p for (p,) in rows if os.path.exists(p)]
+
+    def forget(self, path):
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+            self.conn.commit()
+
+    def register(self, path, digest, source_url=None, media_key=None):
+        """Record a finished file; link it to an identical earlier copy if there is one.
+
+        Returns (existing_path, method) where method is "reflink", "hardlink",
+        or None when the file is new or could not be linked (e.g. cross-device).
+        """
+        path = os.path.abspath(path)
+        existing = self.lookup(digest, exclude=path)
+        method = clone_or_link(existing, path) if existing else None
+        self.add(path, digest, source_url, media_key=media_key)
+        return existing, method
+
+    # --- Formats / upgrades ---
+
+    def record_formats(self, path, url, record, args=()):
+        """Remember the formats `path` was downloaded with (yt-dlp's info fields for the final file)."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO formats (path, url, record, args, recorded, checked) VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), url, json.dumps(record), json.dumps(list(args)), time.time(), time.time()))
+            self.conn.commit()
+
+    def due_for_check(self, checked_before, limit=1):
+        """[(path, url, record)] least recently checked first, skipping missing files and pending upgrades."""
+        with self.lock:
+            rows = self.conn.execute(
+                """SELECT path, url, record FROM formats WHERE checked < ?
+                   AND path NOT IN (SELECT path FROM upgrades WHERE status = 'pending')
+                   ORDER BY checked LIMIT ?""", (checked_before, limit * 4)).fetchall()
+        found = []
+        for path, url, record in rows:
+            if not os.path.exists(path):
+                with self.lock:
+                    self.conn.execute("DELETE FROM formats WHERE path = ?", (path,))
+                    self.conn.commit()
+                continue
+            found.append((path, url, json.loads(record)))
+        return found[:limit]
+
+    def mark_checked(self, path):
+        with self.lock:
+            self.conn.execute("UPDATE formats SET checked = ? WHERE path = ?", (time.time(), path))
+            self.conn.commit()
+
+    def queue_upgrade(self, path, url, selector, reason):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO upgrades (path, url, selector, reason, status, updated) VALUES (?, ?, ?, ?, 'pending', ?)",
+                (path, url, selector, reason, time.time()))
+            self.conn.commit()
+
+    def pending_upgrades(self, limit=1):
+        """[(path, url, selector, reason, args)] oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                """SELECT u.path, u.url, u.selector, u.reason, f.args FROM upgrades u
+                   LEFT JOIN formats f ON f.path = u.path WHERE u.status = 'pending' ORDER BY u.updated LIMIT ?""",
+                (limit,)).fetchall()
+        return [(p, u, s, r, json.loads(a or "[]")) for p, u, s, r, a in rows]
+
+    def finish_upgrade(self, path, status, error=None):
+        with self.lock:
+            self.conn.execute("UPDATE upgrades SET status = ?, error = ?, updated = ? WHERE path = ?",
+                              (status, error, time.time(), path))
+            self.conn.commit()
+
+    def set_phash(self, path, phash):
+        with self.lock:
+            self.conn.execute("UPDATE files SET phash = ? WHERE path = ?", (phash, os.path.abspath(path)))
+            self.conn.commit()
+
+    def near_duplicates(self, path, threshold=6):
+        with self.lock:
+            row = self.conn.execute("SELECT phash, sha256 FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+            if not row or not row[0]: return []
+            others = self.conn.execute(
+                "SELECT path, phash FROM files WHERE phash IS NOT NULL AND sha256 != ?", (row[1],)).fetchall()
+        return [p for p, h in others if len(h) == len(row[0]) and hamming(h, row[0]) <= threshold]
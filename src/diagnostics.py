@@ -0,0 +1,158 @@
+import gc
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def rss_bytes():
+    """Resident set size of this process, without requiring psutil."""
+    try:
+        if psutil: return psutil.Process().memory_info().rss
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class Counters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                    (name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                                                         "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                                                         "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+            counters = Counters()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize
+        out = subprocess.run(["ps", "-o", "rss=", "-p", str(os.getpid())], capture_output=True, text=True).stdout
+        return int(out.strip()) * 1024
+    except Exception:
+        return 0
+
+
+def thread_groups():
+    """Live threads by what they run; 'Thread-12 (analyze_url)' counts as 'analyze_url'."""
+    groups = Counter()
+    for thread in threading.enumerate():
+        name = re.sub(r"^Thread-\d+ ?", "", thread.name).strip("()") or "thread"
+        groups[re.sub(r"-\d+$", "", name)] += 1
+    return dict(groups.most_common())
+
+
+class MemoryMonitor:
+    """Samples memory use over a long session and evicts caches past a budget.
+
+    Recent samples are kept at full resolution; older ones are folded into
+    hourly min/max so a week-long run fits in a few hundred entries. The
+    trend is the slope of the hourly minima, which is what a leak moves
+    (the maxima just follow whatever was being downloaded at the time).
+    Subsystems report their own sizes through probes; evictors are called
+    in registration order when RSS crosses the budget.
+    """
+
+    def __init__(self, budget_bytes=0, cooldown=120, recent=240, hourly=24 * 14):
+        self.budget_bytes = budget_bytes
+        self.cooldown = cooldown
+        self.probes = {}   # name -> fn() -> bytes
+        self.evictors = []  # [(name, fn)]
+        self.recent = deque(maxlen=recent)
+        self.hourly = deque(maxlen=hourly)  # [hour_start, min_rss, max_rss]
+        self.evictions = deque(maxlen=50)
+        self.started = time.time()
+        self.last_evict = 0
+        self.log = None
+
+    def register(self, name, probe):
+        self.probes[name] = probe
+
+    def on_pressure(self, name, evict):
+        self.evictors.append((name, evict))
+
+    def sample(self, tk_images=0, record=True):
+        """Take one sample (main thread: probes may read Tk state); evicts if over budget."""
+        now = time.time()
+        subsystems = {}
+        for name, probe in self.probes.items():
+            try: subsystems[name] = int(probe())
+            except Exception: subsystems[name] = None
+        sample = {"time": now, "rss": rss_bytes(), "threads": threading.active_count(),
+                  "tk_images": tk_images, "subsystems": subsystems}
+        if not record: return sample
+        self.recent.append(sample)
+        hour = int(now // 3600) * 3600
+        if self.hourly and self.hourly[-1][0] == hour:
+            bucket = self.hourly[-1]
+            bucket[1] = min(bucket[1], sample["rss"])
+            bucket[2] = max(bucket[2], sample["rss"])
+        else:
+            self.hourly.append([hour, sample["rss"], sample["rss"]])
+        if self.budget_bytes and sample["rss"] > self.budget_bytes and now - self.last_evict > self.cooldown:
+            self.evict(f"RSS {sample['rss'] / 2 ** 20:.0f}MB over budget {self.budget_bytes / 2 ** 20:.0f}MB")
+        return sample
+
+    def evict(self, reason="manual"):
+        self.last_evict = time.time()
+        before = rss_bytes()
+        for name, fn in self.evictors:
+            try: fn()
+            except Exception as e:
+                if self.log: self.log(f"Eviction '{name}' failed: {e}")
+        gc.collect()
+        after = rss_bytes()
+        self.evictions.append({"time": self.last_evict, "reason": reason, "rss_before": before, "rss_after": after})
+        if self.log: self.log(f"Memory: evicted caches ({reason}); RSS {before / 2 ** 20:.0f}MB -> {after / 2 ** 20:.0f}MB")
+
+    def trend(self):
+        """Growth of the hourly RSS floor in bytes/hour (None until there are 3 complete hours)."""
+        points = [(h[0] / 3600, h[1]) for h in list(self.hourly)[:-1]]
+        if len(points) < 3: return None
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        var = sum((x - mean_x) ** 2 for x, _ in points)
+        return sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var else None
+
+    # --- Leak hunting ---
+
+    def start_tracing(self):
+        if not tracemalloc.is_tracing(): tracemalloc.start(10)
+
+    def stop_tracing(self):
+        if tracemalloc.is_tracing(): tracemalloc.stop()
+
+    def top_allocations(self, limit=20):
+        if not tracemalloc.is_tracing(): return []
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+        return [{"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "bytes": s.size, "blocks": s.count}
+                for s in stats]
+
+    def snapshot(self):
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "budget_bytes": self.budget_bytes,
+            "trend_bytes_per_hour": self.trend(),
+            "latest": self.recent[-1] if self.recent else None,
+            "threads": thread_groups(),
+            "gc_objects": len(gc.get_objects()),
+            "recent": list(self.recent),
+            "hourly": [{"hour": h, "min_rss": lo, "max_rss": hi} for h, lo, hi in self.hourly],
+            "evictions": list(self.evictions),
+            "top_allocations": self.top_allocations(),
+        }
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        return path
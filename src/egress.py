@@ -0,0 +1,173 @@
+import ipaddress
+import socket
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+
+class Endpoint:
+    """One way out to the internet: the default route, a bound local address or a proxy."""
+
+    def __init__(self, proxy=None, source=None, rate=30, name=None):
+        self.proxy = proxy    # http://, https:// or socks5:// URL
+        self.source = source  # local IP to bind
+        self.rate = rate      # job starts per minute (0 = unlimited)
+        self.name = name or proxy or source or "direct"
+        self.active = 0
+        self.starts = deque()
+        self.healthy = True
+        self.benched_until = 0
+        self.strikes = 0
+        self.stats = {"jobs": 0, "throttled": 0, "failed_checks": 0}
+
+    def ytdlp_args(self):
+        if self.proxy: return ["--proxy", self.proxy]
+        if self.source: return ["--source-address", self.source]
+        return []
+
+    def configure_session(self, session):
+        """Route a requests session (instaloader) through this endpoint."""
+        if self.proxy:
+            session.proxies = {"http": self.proxy, "https": self.proxy}
+        elif self.source:
+            from requests.adapters import HTTPAdapter
+            source = self.source
+
+            class SourceAddressAdapter(HTTPAdapter):
+                def init_poolmanager(self, *args, **kwargs):
+                    kwargs["source_address"] = (source, 0)
+                    super().init_poolmanager(*args, **kwargs)
+
+            session.mount("http://", SourceAddressAdapter())
+            session.mount("https://", SourceAddressAdapter())
+
+
+def parse_endpoint(spec):
+    """Endpoint from a config entry: "direct", a local IP, a proxy URL, or a dict with proxy/source/rate/name."""
+    if isinstance(spec, dict):
+        return Endpoint(spec.get("proxy"), spec.get("source"), spec.get("rate", 30), spec.get("name"))
+    spec = spec.strip()
+    if spec == "direct": return Endpoint()
+    if "://" in spec: return Endpoint(proxy=spec)
+    try:
+        return Endpoint(source=str(ipaddress.ip_address(spec)))
+    except ValueError:
+        raise ValueError(f"Not an IP address or proxy URL: {spec}")
+
+
+class EgressPool:
+    """Spreads yt-dlp and instaloader traffic over several endpoints.
+
+    Sites throttle per address, so each job takes the least-loaded endpoint
+    that is healthy, within its start budget and not benched. A throttled
+    endpoint is benched for `bench` seconds, doubling on every strike up to
+    `max_bench`; a clean job resets it. Health checks only prove the route
+    works (a TCP connect through it), so they never lift a bench.
+    """
+
+    def __init__(self, endpoints, window=60, bench=300, max_bench=6 * 3600,
+                 check_host="www.youtube.com", check_interval=300, log=None):
+        self.endpoints = list(endpoints)
+        self.window = window
+        self.bench = bench
+        self.max_bench = max_bench
+        self.check_host = check_host
+        self.check_interval = check_interval
+        self.log = log
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def available_locked(self, endpoint, now):
+        while endpoint.starts and endpoint.starts[0] < now - self.window: endpoint.starts.popleft()
+        return endpoint.benched_until <= now and (not endpoint.rate or len(endpoint.starts) < endpoint.rate)
+
+    def acquire(self):
+        """Reserve the least-loaded usable endpoint, or None if all are busy or benched right now."""
+        now = time.time()
+        with self.lock:
+            candidates = [e for e in self.endpoints if self.available_locked(e, now)]
+            # A failed health check may be the check host's fault; better to try than to stall every job
+            candidates = [e for e in candidates if e.healthy] or candidates
+            if not candidates: return None
+            endpoint = min(candidates, key=lambda e: (e.active, len(e.starts) / (e.rate or 1000)))
+            endpoint.active += 1
+            endpoint.starts.append(now)
+            endpoint.stats["jobs"] += 1
+            return endpoint
+
+    def wait_time(self):
+        """Seconds until acquire may succeed again."""
+        now = time.time()
+        with self.lock:
+            waits = []
+            for e in self.endpoints:
+                if self.available_locked(e, now): return 0.0
+                free_at = e.starts[0] + self.window if e.rate and len(e.starts) >= e.rate else now
+                waits.append(max(e.benched_until, free_at) - now)
+            return max(0.0, min(waits)) if waits else 0.0
+
+    def release(self, endpoint):
+        with self.lock:
+            endpoint.active = max(0, endpoint.active - 1)
+
+    def succeeded(self, endpoint):
+        with self.lock:
+            endpoint.strikes = 0
+
+    def throttled(self, endpoint):
+        """Take `endpoint` out of rotation after a 429 / bot check."""
+        with self.lock:
+            endpoint.strikes += 1
+            endpoint.stats["throttled"] += 1
+            seconds = min(self.max_bench, self.bench * 2 ** (endpoint.strikes - 1))
+            endpoint.benched_until = time.time() + seconds
+        if self.log: self.log(f"Egress {endpoint.name} is being throttled, out of rotation for {seconds / 60:.0f} min")
+
+    # --- Health checks ---
+
+    def check(self, endpoint, timeout=5):
+        if endpoint.proxy:
+            parts = urllib.parse.urlsplit(endpoint.proxy)
+            default_port = 1080 if parts.scheme.startswith("socks") else 443 if parts.scheme == "https" else 8080
+            address, source = (parts.hostname, parts.port or default_port), None
+        else:
+            address, source = (self.check_host, 443), (endpoint.source, 0) if endpoint.source else None
+        try:
+            socket.create_connection(address, timeout, source_address=source).close()
+            ok = True
+        except OSError:
+            ok = False
+        with self.lock:
+            if not ok: endpoint.stats["failed_checks"] += 1
+            changed = endpoint.healthy != ok
+            endpoint.healthy = ok
+        if changed and self.log: self.log(f"Egress {endpoint.name} is {'back up' if ok else 'unreachable'}")
+        return ok
+
+    def check_all(self):
+        for endpoint in self.endpoints: self.check(endpoint)
+
+    def start(self):
+        if self.thread and self.thread.is_alive(): return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="egress-health", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.check_all()
+            self.stop_event.wait(self.check_interval)
+
+    def snapshot(self):
+        now = time.time()
+        with self.lock:
+            return [{"name": e.name, "healthy": e.healthy, "active": e.active, "starts_in_window": len(e.starts),
+                     "benched_for": max(0, e.benched_until - now), **e.stats} for e in self.endpoints]
@@ -0,0 +1,512 @@
+"""asyncio download engine: analysis, downloads and IG photos without any UI.
+
+    engine = Engine()
+    info = await engine.analyze(url)
+    job = engine.video_job(url, "/videos/clip.mp4", info=info)
+    async for event in engine.download(job):
+        print(event.kind, event.value)
+
+Cancelling the task that iterates a download kills yt-dlp and removes the
+partial files. Many jobs can run on one event loop; `run_all` feeds them
+through a bounded queue so a large backlog never gets far ahead.
+"""
+import asyncio
+import itertools
+import json
+import os
+import re
+import time
+import urllib.parse
+from collections import Counter, deque, namedtuple
+from contextlib import suppress
+
+from audio import AudioPipeline, AUDIO_EXTENSIONS, DEFAULT_QUALITY, tags_from_info
+from bandwidth import BandwidthEstimator, parse_speed, estimate_size
+from clips import section_args, clip_output_paths, clip_output_template, format_timestamp
+from dedup import GrowingFileHasher, hash_file, perceptual_hash
+from failures import classify, next_action, CircuitBreaker, THROTTLED, MERGE_ERROR, MAX_ATTEMPTS
+from jobs import DownloadJob
+from links import media_key, site_of, LinkResolver
+from storage import DiskAdmission, staging_dir, staged_path, finalize, discard, discard_partials
+from upgrades import best_available, record_args, read_record
+from ytdlp import InfoCache, low_priority, startupinfo, tool_paths, with_format
+
+# Event kinds
+LOG = "log"
+PROGRESS = "progress"
+DONE = "done"      # value: list of finished paths
+FAILED = "failed"  # value: message
+
+Event = namedtuple("Event", "kind job value")
+
+PROGRESS_REGEX = re.compile(r"\[download\]\s+([0-9.]+)%")
+IG_SHORTCODE = re.compile(r"instagram\.com/(?:p|reel)/([^/?#&]+)")
+
+
+def video_formats(info):
+    """Formats with a video track, in the extractor's (worst-to-best) order."""
+    return [f for f in info.get("formats") or () if f.get("vcodec") != "none" and f.get("format_id")]
+
+
+def format_fallbacks(info, video_id, audio_id, is_mp3):
+    """Format selectors to try in order when the chosen one is unavailable or fails to merge."""
+    if is_mp3:
+        return [audio_id or "ba/b", "ba/b"]
+    chain = []
+    if video_id:
+        chain.append(f"{video_id}+{audio_id}" if audio_id else video_id)
+        formats = video_formats(info or {})
+        ids = [f["format_id"] for f in formats]
+        if video_id in ids:
+            for f in reversed(formats[:ids.index(video_id)][-3:]):
+                has_audio = f.get("acodec") != "none"
+                chain.append(f["format_id"] if has_audio or not audio_id else f"{f['format_id']}+{audio_id}")
+    chain.append("bv*+ba/b")
+    return chain
+
+
+def estimate_job_bytes(info, video_id, audio_id, is_mp3, clip_ranges=()):
+    """Peak disk use of a job, from the sizes analysis reported (None if unknown)."""
+    info = info or {}
+    by_id = {f.get("format_id"): f for f in info.get("formats") or ()}
+    def size_of(fid):
+        f = by_id.get(fid)
+        return (estimate_size(f, info.get("duration")), f.get("acodec") != "none") if f else (None, False)
+    video_size, video_has_audio = size_of(video_id) if not is_mp3 else (None, False)
+    audio_size = size_of(audio_id)[0]
+    if is_mp3:
+        if not audio_size: return None
+        size = audio_size * 2  # source audio and the converted mp3 coexist briefly
+    else:
+        if not video_size: return None
+        size = video_size
+        if audio_size and not video_has_audio:
+            size = (video_size + audio_size) * 2  # parts + merged output until the parts are removed
+    if clip_ranges and info.get("duration"):
+        size *= min(1.0, sum(b - a for a, b in clip_ranges) / info["duration"])
+    return int(size * 1.1)
+
+
+class Engine:
+    """Analysis and downloads as coroutines; safe to embed in any asyncio program.
+
+    At most `max_downloads` jobs run at once (`per_site` per site) and at most
+    `max_analyses` yt-dlp extractions. Each download's events pass through a
+    queue of `event_buffer` entries: a consumer that falls behind stalls the
+    reader, and yt-dlp in turn, instead of letting memory grow.
+    """
+
+    def __init__(self, yt_dlp_path=None, ffmpeg_dir=None, max_downloads=4, per_site=3, max_analyses=8,
+                 event_buffer=64, queue_size=100, info_cache=None, link_resolver=None, bandwidth=None,
+                 circuit_breaker=None, disk_admission=None, content_index=None, http=None, egress=None, stream_hash=False):
+        default_yt_dlp, default_ffmpeg = tool_paths()
+        self.yt_dlp_path = yt_dlp_path or default_yt_dlp
+        self.ffmpeg_dir = ffmpeg_dir or default_ffmpeg
+        self.max_downloads = max_downloads
+        self.per_site = per_site
+        self.max_analyses = max_analyses
+        self.event_buffer = event_buffer
+        self.queue_size = queue_size
+        self.info_cache = info_cache if info_cache is not None else InfoCache()
+        self.link_resolver = link_resolver or LinkResolver()
+        self.bandwidth = bandwidth or BandwidthEstimator(None)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.disk_admission = disk_admission or DiskAdmission()
+        self.content_index = content_index
+        self.http = http
+        self.egress = egress  # EgressPool; None sends everything out the default route
+        # Follows each file as it is written (one thread per job); off by default for large fleets
+        self.stream_hash = stream_hash
+        self.audio_pipeline = None
+        self.ids = itertools.count(1)
+        self.active = set()  # job ids currently downloading
+        self.download_slots = None
+        self.analysis_slots = None
+        self.site_slots = {}
+
+    def slots(self):
+        # Created lazily so they bind to the loop the engine actually runs on
+        if self.download_slots is None:
+            self.download_slots = asyncio.Semaphore(self.max_downloads)
+            self.analysis_slots = asyncio.Semaphore(self.max_analyses)
+        return self.download_slots, self.analysis_slots
+
+    def site_slot(self, url):
+        site = site_of(url)
+        if site not in self.site_slots: self.site_slots[site] = asyncio.Semaphore(self.per_site)
+        return self.site_slots[site]
+
+    async def acquire_egress(self, emit=None):
+        """An endpoint from the egress pool (waits while all are busy or benched), or None without a pool."""
+        if not self.egress: return None
+        waited = False
+        while (endpoint := self.egress.acquire()) is None:
+            if emit and not waited: await emit(LOG, "All egress endpoints are busy or throttled, waiting...")
+            waited = True
+            await asyncio.sleep(min(max(self.egress.wait_time(), 1), 30))
+        return endpoint
+
+    def get_audio_pipeline(self):
+        if self.audio_pipeline is None:
+            self.audio_pipeline = AudioPipeline(self.ffmpeg_dir, proxy=self.http.proxy if self.http else None)
+        return self.audio_pipeline
+
+    def close(self):
+        if self.audio_pipeline: self.audio_pipeline.shutdown()
+
+    # --- Analysis ---
+
+    async def resolve(self, url):
+        """Stable media key for `url` (follows short links once)."""
+        return media_key(await asyncio.to_thread(self.link_resolver.resolve, url))
+
+    async def analyze(self, url, background=False, cache=True, timeout=120):
+        """Info dict of the first item at `url`, shared by every URL variant of the same item.
+
+        `background` runs yt-dlp at low CPU priority; `cache=False` neither reads
+        nor fills the shared cache (speculative work that may never be used).
+        A stuck extraction is killed after `timeout` seconds so it cannot hold a slot forever.
+        """
+        key = await self.resolve(url)
+        info = self.info_cache.get(key) if cache else None
+        if info is not None: return info
+        _, analysis_slots = self.slots()
+        async with analysis_slots:
+            endpoint = await self.acquire_egress()
+            try:
+                command, kwargs = [self.yt_dlp_path, *(endpoint.ytdlp_args() if endpoint else ()), "--dump-json", url,
+                                   "--js-runtimes", "node", "--playlist-items", "1"], {}
+                if background: command, kwargs = low_priority(command)
+                process = await asyncio.create_subprocess_exec(
+                    *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                    startupinfo=startupinfo(), **kwargs)
+                try:
+                    out, err = await asyncio.wait_for(process.communicate(), timeout)
+                except asyncio.TimeoutError:
+                    raise Exception(f"Analysis timed out after {timeout:g}s.")
+                finally:
+                    if process.returncode is None:
+                        process.kill()
+                        await asyncio.shield(process.wait())
+                out = out.decode("utf-8", "replace").strip()
+                if endpoint and not out and classify(err.decode("utf-8", "replace").splitlines()) == THROTTLED:
+                    self.egress.throttled(endpoint)
+            finally:
+                if endpoint: self.egress.release(endpoint)
+        if not out:
+            error = next((l for l in err.decode("utf-8", "replace").splitlines() if "ERROR" in l), "")
+            raise Exception(error or "No data received.")
+        info = json.loads(out.split("\n")[0])
+        if cache: self.info_cache.put(key, info)
+        return info
+
+    # --- Jobs ---
+
+    def video_job(self, url, save_path, mode="mp4", video_id=None, audio_id=None, info=None, clips=(),
+                  accurate_cuts=False, extra_args=(), audio_quality=DEFAULT_QUALITY, normalize=True, index_options=None):
+        """Job for a video (mp4/mkv) or an MP3 at `save_path`; raises OSError if the folder is not writable."""
+        info = info or {}
+        is_mp3 = mode == "mp3"
+        command = [self.yt_dlp_path]
+        if is_mp3:
+            # No -x: the raw audio is converted afterwards by the multi-core audio pipeline
+            command.extend(["-f", audio_id or "ba/b"])
+        else:
+            if video_id and audio_id: command.extend(["-f", f"{video_id}+{audio_id}"])
+            elif video_id: command.extend(["-f", f"{video_id}"])
+            if mode in ("mp4", "mkv"): command.extend(["--merge-output-format", mode])
+        command.extend(extra_args)
+        if clips: command.extend(section_args(clips, accurate_cuts))
+        save_dir = os.path.dirname(save_path)
+        job = DownloadJob(next(self.ids), url, command, clip_output_paths(save_path, len(clips)), save_dir,
+                          extractor=info.get("extractor_key") or info.get("extractor"),
+                          format_chain=format_fallbacks(info, video_id, audio_id, is_mp3), index_options=index_options,
+                          estimate=estimate_job_bytes(info, video_id, audio_id, is_mp3, clips))
+        job.extra_args = list(extra_args)
+        # Created when the download starts: jobs built ahead in run_all may never run
+        if not os.access(save_dir, os.W_OK): raise PermissionError(f"{save_dir} is not writable")
+        job.staging = staging_dir(save_dir, job.id)
+        staged_template = staged_path(job.staging, clip_output_template(save_path, len(clips)))
+        # Whole videos remember their formats so the upgrade scanner can tell when better ones appear
+        if not is_mp3 and not clips:
+            command.extend(record_args(job.staging))
+            # What was on offer, so a deliberately lower pick is not "upgraded" later
+            found = best_available(info)
+            job.offered = found[1] if found else None
+        if is_mp3:
+            staged_template = os.path.splitext(staged_template)[0] + ".%(ext)s"
+            job.audio = {"quality": audio_quality, "normalize": normalize,
+                         "tags": tags_from_info(info), "cover_url": info.get("thumbnail")}
+        command.extend(["--ffmpeg-location", self.ffmpeg_dir, "-o", staged_template,
+                        url, "--progress", "--newline", "--js-runtimes", "node", "--no-playlist"])
+        if clips:
+            job.note = "Clips: " + ", ".join(f"{format_timestamp(a)}-{format_timestamp(b)}" for a, b in clips)
+        return job
+
+    def photo_job(self, url, save_dir, index_options=None):
+        """Job for the photos of an Instagram post, saved under `save_dir/<shortcode>/`."""
+        match = IG_SHORTCODE.search(url)
+        if not match: raise ValueError("No shortcode found.")
+        job = DownloadJob(next(self.ids), url, None, [os.path.join(save_dir, match.group(1))], save_dir,
+                          index_options=index_options, kind="ig_photo")
+        return job
+
+    # --- Downloads ---
+
+    async def download(self, job):
+        """Async iterator of Events for `job`, ending with DONE or FAILED."""
+        events = asyncio.Queue(maxsize=self.event_buffer)
+        task = asyncio.create_task(self._run(job, events))
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event.kind in (DONE, FAILED): break
+        finally:
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError): await task
+
+    async def run_all(self, jobs, on_event=None):
+        """Download every job from an (async) iterable; returns {job id: paths or None}.
+
+        Jobs are pulled through a queue of `queue_size`, so the producer stays
+        only that far ahead of `max_downloads` workers.
+        """
+        pending = asyncio.Queue(maxsize=self.queue_size)
+        results = {}
+
+        async def _produce():
+            if hasattr(jobs, "__aiter__"):
+                async for job in jobs: await pending.put(job)
+            else:
+                for job in jobs: await pending.put(job)
+            for _ in range(self.max_downloads): await pending.put(None)
+
+        async def _work():
+            while (job := await pending.get()) is not None:
+                results[job.id] = None
+                async for event in self.download(job):
+                    if on_event: on_event(event)
+                    if event.kind == DONE: results[job.id] = event.value
+
+        await asyncio.gather(_produce(), *(_work() for _ in range(self.max_downloads)))
+        return results
+
+    async def _run(self, job, events):
+        async def emit(kind, value=None):
+            await events.put(Event(kind, job.id, value))
+
+        download_slots, _ = self.slots()
+        self.active.add(job.id)
+        try:
+            # Site first: a job queued behind its own site must not sit on a slot other sites could use
+            async with self.site_slot(job.url), download_slots:
+                if job.kind == "ig_photo":
+                    paths = await self._download_photos(job, emit)
+                else:
+                    paths = await self._download_video(job, emit)
+            await emit(DONE, paths)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await emit(LOG, f"Error: {e}")
+            await emit(FAILED, str(e))
+        finally:
+            self.active.discard(job.id)
+
+    async def _download_video(self, job, emit):
+        command = job.command
+        staged_paths = [staged_path(job.staging, p) for p in job.output_paths]
+        host = urllib.parse.urlparse(job.url).hostname if job.url else None
+        fallbacks = list(job.format_chain[1:])
+        attempt = 0
+        seen = Counter()  # failures so far per category
+        hasher = None
+        process = None
+        holding = None  # egress endpoint reserved for the running attempt
+        finished = False
+        admitted = False
+        try:
+            os.makedirs(job.staging, exist_ok=True)
+            if job.note: await emit(LOG, job.note)
+            # Jobs of unknown size (live, many non-YouTube sites) are admitted with a default reservation
+            estimate = job.estimate or self.disk_admission.unknown_bytes
+            waited = False
+            while not await asyncio.to_thread(self.disk_admission.admit, job.id, job.save_dir, estimate,
+                                              job.staging, timeout=0):
+                if not waited: await emit(LOG, f"Waiting for disk space (~{estimate / (1024 * 1024):.0f}MB needed)...")
+                waited = True
+                await asyncio.sleep(15)
+            admitted = True
+            # Multi-clip and MP3 jobs produce their final files later; those are hashed once they are done
+            if self.stream_hash and len(staged_paths) == 1 and self.content_index and not job.audio:
+                hasher = GrowingFileHasher(staged_paths[0]).start()
+            while True:
+                endpoint = holding = await self.acquire_egress(emit)
+                # Throttling is per address, so each endpoint gets its own breaker
+                breaker = f"{host} via {endpoint.name}" if endpoint else host
+                wait = self.circuit_breaker.wait_time(breaker)
+                if wait:
+                    await emit(LOG, f"{host} is rate-limiting us, pausing {wait:.0f}s...")
+                    await asyncio.sleep(wait)
+                if endpoint and len(self.egress) > 1: await emit(LOG, f"Egress: {endpoint.name}")
+                process = await asyncio.create_subprocess_exec(
+                    command[0], *(endpoint.ytdlp_args() if endpoint else ()), *command[1:], stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                    startupinfo=startupinfo(), limit=1024 * 1024)
+                last_sample = 0
+                tail = deque(maxlen=40)
+                while line := (await process.stdout.readline()).decode("utf-8", "replace"):
+                    tail.append(line)
+                    await emit(LOG, line.strip())
+                    match = PROGRESS_REGEX.search(line)
+                    if match: await emit(PROGRESS, float(match.group(1)))
+                    speed = parse_speed(line)
+                    # yt-dlp prints several lines a second; sample sparsely so the EWMA tracks minutes, not bursts
+                    if speed and time.monotonic() - last_sample >= 2:
+                        last_sample = time.monotonic()
+                        self.bandwidth.record(job.extractor, speed)
+                returncode = await process.wait()
+                process = None
+                if holding:
+                    self.egress.release(holding)
+                    holding = None
+                    if returncode == 0: self.egress.succeeded(endpoint)
+                with suppress(OSError, TypeError): self.bandwidth.save()
+                if returncode == 0:
+                    self.circuit_breaker.record_success(breaker)
+                    digest = await asyncio.to_thread(hasher.finish) if hasher else None
+                    hasher = None
+                    if job.audio: await self.convert_audio(job, staged_paths, emit)
+                    record = read_record(job.staging)
+                    if record and job.offered: record["offered"] = job.offered
+                    # Renames within one filesystem keep the inode, so the streamed hash stays valid
+                    done = finalize(job.staging, job.output_paths)
+                    finished = True
+                    if record and done and self.content_index:
+                        self.content_index.record_formats(done[0], job.url, record, job.extra_args)
+                    for i, path in enumerate(done):
+                        await self.index_download(path, digest if i == 0 and len(done) == 1 else None, job.url,
+                                                  job.index_options, emit)
+                    await emit(PROGRESS, 100)
+                    return done
+
+                category = classify(tail)
+                if category == THROTTLED:
+                    self.circuit_breaker.record_failure(breaker)
+                    if endpoint: self.egress.throttled(endpoint)
+                action = next_action(category, attempt, seen[category])
+                seen[category] += 1
+                # With other endpoints to fall back on, the next attempt need not back off
+                if category == THROTTLED and endpoint and len(self.egress) > 1 and action.kind == "retry":
+                    action = action._replace(delay=0)
+                if action.kind == "fallback":
+                    # A pre-merged format sidesteps a broken merge
+                    if category == MERGE_ERROR and "b" not in fallbacks: fallbacks.insert(0, "b")
+                    if fallbacks:
+                        command = with_format(command, fallbacks.pop(0))
+                        # yt-dlp would otherwise resume the previous format's .part into the new one
+                        await asyncio.to_thread(discard_partials, job.staging)
+                        await emit(LOG, f"Failure ({category}), falling back to format {command[command.index('-f') + 1]}")
+                    else:
+                        action = action._replace(kind="give_up")
+                if action.kind == "give_up":
+                    job.failure = category
+                    raise Exception(f"Download failed ({category.replace('_', ' ')}).")
+                if action.kind == "retry":
+                    await emit(LOG, f"Failure ({category}), retrying in {action.delay:.0f}s (attempt {attempt + 2}/{MAX_ATTEMPTS})")
+                    if action.delay: await asyncio.sleep(action.delay)
+                attempt += 1
+        finally:
+            if process and process.returncode is None:
+                process.kill()
+                await asyncio.shield(process.wait())
+            if hasher: hasher.cancel()
+            if holding: self.egress.release(holding)
+            # Nothing half-written is left behind in the destination folder
+            if not finished: discard(job.staging)
+            if admitted: self.disk_admission.release(job.id)
+
+    async def convert_audio(self, job, staged_mp3_paths, emit):
+        """Turn the raw audio yt-dlp left in staging into normalized, tagged MP3s (in parallel)."""
+        pipeline = self.get_audio_pipeline()
+        futures = []
+        for mp3_path in staged_mp3_paths:
+            root = os.path.splitext(mp3_path)[0]
+            source = next((root + ext for ext in AUDIO_EXTENSIONS if os.path.isfile(root + ext)), None)
+            if not source: continue
+            futures.append((source, pipeline.submit(source, mp3_path, job.audio["tags"], job.audio["cover_url"],
+                                                    job.audio["quality"], job.audio["normalize"])))
+        await emit(LOG, f"Converting {len(futures)} track(s) to MP3...")
+        for src, future in futures:
+            await asyncio.wrap_future(future)
+            os.remove(src)
+
+    async def _download_photos(self, job, emit):
+        await emit(LOG, "Starting IG Photo download...")
+        await emit(PROGRESS, 10)
+        post_dir = job.output_paths[0]
+        endpoint = await self.acquire_egress(emit)
+        try:
+            await asyncio.to_thread(self.fetch_post, job.url, job.save_dir, endpoint)
+            if endpoint: self.egress.succeeded(endpoint)
+        except Exception as e:
+            if endpoint and classify([f"ERROR: {e}"]) == THROTTLED: self.egress.throttled(endpoint)
+            raise
+        finally:
+            if endpoint: self.egress.release(endpoint)
+        # Photos are small, so hashing them after the fact is cheap
+        done = []
+        for name in sorted(os.listdir(post_dir)):
+            path = os.path.join(post_dir, name)
+            if not os.path.isfile(path): continue
+            done.append(path)
+            await self.index_download(path, None, job.url, job.index_options, emit)
+        await emit(PROGRESS, 100)
+        return done
+
+    def fetch_post(self, url, save_dir, endpoint=None):
+        import instaloader
+        shortcode = IG_SHORTCODE.search(url).group(1)
+        # dirname_pattern instead of chdir: the working directory is shared by every job in the process
+        L = instaloader.Instaloader(
+            download_pictures=True, download_videos=False,
+            download_video_thumbnails=False, download_geotags=False,
+            download_comments=False, save_metadata=False, compress_json=False,
+            dirname_pattern=os.path.join(save_dir, "{target}"),
+            request_timeout=self.http.timeout if self.http else 300.0
+        )
+        if endpoint:
+            endpoint.configure_session(L.context._session)
+        else:
+            proxy = self.http.proxy_for("https", "www.instagram.com") if self.http else None
+            if proxy: L.context._session.proxies = {"http": proxy, "https": proxy}
+        post = instaloader.Post.from_shortcode(L.context, shortcode)
+        L.download_post(post, target=shortcode)
+
+    # --- Library index ---
+
+    async def index_download(self, path, digest, url=None, options=None, emit=None):
+        if not self.content_index: return
+        if not digest: digest = await asyncio.to_thread(hash_file, path)
+        options = options or {"dedup": True, "similar": False}
+        log = emit or (lambda kind, value: asyncio.sleep(0))
+        if options["dedup"]:
+            existing, method = await asyncio.to_thread(self.content_index.register, path, digest, url,
+                                                       media_key(url) if url else None)
+            if existing and method:
+                await log(LOG, f"Duplicate of {existing} ({method}, space reclaimed)")
+            elif existing:
+                await log(LOG, f"Duplicate of {existing} (could not link across devices)")
+        else:
+            self.content_index.add(path, digest, url, media_key=media_key(url) if url else None)
+        if options["similar"]:
+            try:
+                phash = await asyncio.to_thread(perceptual_hash, path, self.ffmpeg_dir)
+            except Exception as e:
+                await log(LOG, f"Similarity check error: {e}")
+                return
+            if not phash: return
+            self.content_index.set_phash(path, phash)
+            for other in self.content_index.near_duplicates(path):
+                await log(LOG, f"Looks similar to: {other}")
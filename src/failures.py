@@ -0,0 +1,97 @@
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+
+THROTTLED = "throttled"
+FORBIDDEN = "forbidden"  # YouTube: the signed format URL expired or is refused, not rate limiting
+FORMAT_UNAVAILABLE = "format_unavailable"
+MERGE_ERROR = "merge_error"
+NETWORK_RESET = "network_reset"
+FATAL = "fatal"
+UNKNOWN = "unknown"
+
+# Checked in order; the first category with a matching line wins
+PATTERNS = [
+    (FATAL, [r"Private video", r"Video unavailable", r"This video has been removed", r"members-only",
+             r"Unsupported URL", r"is not a valid URL", r"copyright"]),
+    (THROTTLED, [r"HTTP Error 429", r"Too Many Requests", r"rate[- ]limit", r"Sign in to confirm you.re not a bot"]),
+    (FORBIDDEN, [r"HTTP Error 403", r"403: Forbidden"]),
+    (FORMAT_UNAVAILABLE, [r"Requested format is not available", r"format .* not available", r"No video formats found"]),
+    (MERGE_ERROR, [r"Postprocessing:", r"Conversion failed", r"ffmpeg exited with code", r"[Mm]erg(e|ing) .*(fail|error)",
+                   r"ffprobe and ffmpeg not found"]),
+    (NETWORK_RESET, [r"Connection reset", r"Errno 104", r"Errno 10054", r"timed out", r"IncompleteRead",
+                     r"Remote end closed", r"Connection aborted", r"Temporary failure in name resolution",
+                     r"Unable to download", r"Got error:", r"HTTP Error 5\d\d"]),
+]
+COMPILED = [(cat, [re.compile(p, re.IGNORECASE) for p in pats]) for cat, pats in PATTERNS]
+
+MAX_ATTEMPTS = 6
+
+Action = namedtuple("Action", "kind delay")  # kind: "retry", "fallback" or "give_up"
+
+
+def classify(lines):
+    """Map the tail of yt-dlp's output to a failure category."""
+    errors = [l for l in lines if "ERROR" in l or "error" in l.lower()] or list(lines)
+    for category, regexes in COMPILED:
+        if any(r.search(line) for line in errors for r in regexes):
+            return category
+    return UNKNOWN
+
+
+def backoff_delay(attempt, base=5.0, cap=300.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def next_action(category, attempt, repeats=0):
+    """What to do after failed attempt number `attempt`; `repeats` counts earlier failures of the same category."""
+    if attempt + 1 >= MAX_ATTEMPTS or category == FATAL:
+        return Action("give_up", 0)
+    if category == THROTTLED:
+        return Action("retry", backoff_delay(attempt, base=10))
+    if category in (FORMAT_UNAVAILABLE, MERGE_ERROR):
+        return Action("fallback", 0)
+    if category == FORBIDDEN:
+        # A fresh run re-extracts fresh URLs; if the format is still refused, try another
+        return Action("retry", 0) if repeats < 1 else Action("fallback", 0)
+    if category == NETWORK_RESET:
+        # yt-dlp resumes the .part file; retry straight away, then back off if the link stays down
+        return Action("retry", 0 if attempt < 2 else backoff_delay(attempt - 2))
+    if attempt < 1:
+        return Action("retry", backoff_delay(attempt))
+    return Action("give_up", 0)
+
+
+class CircuitBreaker:
+    """Per-host breaker: after `threshold` throttles within `window` seconds, stop sending for `cooldown`."""
+
+    def __init__(self, threshold=3, window=600, cooldown=900):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.open_until = {}
+
+    def record_failure(self, host):
+        now = time.time()
+        with self.lock:
+            recent = [t for t in self.failures.get(host, []) if now - t < self.window]
+            recent.append(now)
+            self.failures[host] = recent
+            if len(recent) >= self.threshold:
+                self.open_until[host] = now + self.cooldown
+                self.failures[host] = []
+
+    def record_success(self, host):
+        with self.lock:
+            self.failures.pop(host, None)
+            self.open_until.pop(host, None)
+
+    def wait_time(self, host):
+        """Seconds until requests to `host` may resume (0 when closed)."""
+        with self.lock:
+            return max(0.0, self.open_until.get(host, 0) - time.time())
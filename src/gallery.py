@@ -0,0 +1,250 @@
+import itertools
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from io import BytesIO
+
+import ttkbootstrap as ttk
+from ttkbootstrap.constants import *
+from PIL import Image, ImageTk
+
+from httpclient import default_client
+
+THUMB_SIZE = (160, 90)
+CELL_W, CELL_H = 176, 130
+HIGH, LOW = 0, 1
+
+
+class ThumbnailCache:
+    """LRU of decoded (already shrunk) PIL images, bounded by approximate bytes."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cost(image):
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key):
+        with self.lock:
+            image = self.items.get(key)
+            if image is not None: self.items.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self.lock:
+            if key in self.items:
+                self.size -= self.cost(self.items.pop(key))
+            self.items[key] = image
+            self.size += self.cost(image)
+            while self.size > self.max_bytes and len(self.items) > 1:
+                _, old = self.items.popitem(last=False)
+                self.size -= self.cost(old)
+
+    def discard(self, key):
+        with self.lock:
+            image = self.items.pop(key, None)
+            if image is not None: self.size -= self.cost(image)
+
+    def trim(self, max_bytes):
+        """Evict down to `max_bytes` without changing the normal budget."""
+        with self.lock:
+            while self.size > max_bytes and self.items:
+                _, old = self.items.popitem(last=False)
+                self.size -= self.cost(old)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+
+class ThumbnailFetcher:
+    """Background fetch + decode. Visible cells go first; requests nobody wants any more are dropped."""
+
+    def __init__(self, cache, on_ready, workers=4):
+        self.cache = cache
+        self.on_ready = on_ready
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.wanted = set()
+        self.inflight = set()
+        self.failed = set()  # not retried on every scroll
+        self.workers = workers
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"thumb-{i}", daemon=True).start()
+
+    def request(self, url, priority=LOW):
+        if not url or url in self.failed or self.cache.get(url) is not None: return
+        with self.lock:
+            self.wanted.add(url)
+        self.queue.put((priority, next(self.counter), url))
+
+    def set_wanted(self, urls):
+        with self.lock:
+            self.wanted = set(urls)
+
+    def fetch(self, url):
+        return default_client().get(url, cache=True, max_bytes=10 * 1024 * 1024).body
+
+    def close(self):
+        """Stop the workers once they finish what they are fetching."""
+        with self.lock:
+            self.wanted = set()
+        # Sentinels sort before every real request
+        for _ in range(self.workers): self.queue.put((-1, next(self.counter), None))
+
+    def _worker(self):
+        while True:
+            _, _, url = self.queue.get()
+            if url is None: return
+            with self.lock:
+                if url not in self.wanted or url in self.inflight: continue
+                self.inflight.add(url)
+            try:
+                if self.cache.get(url) is None:
+                    image = Image.open(BytesIO(self.fetch(url)))
+                    image.draft("RGB", THUMB_SIZE)  # cheap JPEG downscale while decoding
+                    image = image.convert("RGB")
+                    image.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+                    self.cache.put(url, image)
+                self.on_ready(url)
+            except Exception:
+                with self.lock:
+                    self.failed.add(url)
+            finally:
+                with self.lock:
+                    self.inflight.discard(url)
+
+
+class VirtualGallery(ttk.Frame):
+    """Grid of thumbnails that only materialises the rows on screen.
+
+    The canvas scroll region covers every entry, but canvas items and
+    PhotoImages exist only for visible cells; they are released as soon as a
+    cell scrolls out. The next couple of screens are prefetched at low priority.
+    """
+
+    def __init__(self, master, cache, post, on_open=None, prefetch_screens=2):
+        super().__init__(master)
+        self.cache = cache
+        self.on_open = on_open
+        self.prefetch_screens = prefetch_screens
+        self.entries = []
+        self.drawn = {}   # index -> list of canvas item ids
+        self.photos = {}  # index -> PhotoImage, visible cells only
+        self.fetcher = ThumbnailFetcher(cache, lambda url: post(self.on_image_ready, url))
+        self.refresh_pending = False
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, bg="#222")
+        scrollbar = ttk.Scrollbar(self, orient=VERTICAL, command=self.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        self.canvas.pack(side=LEFT, fill=BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_refresh(relayout=True))
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+        self.canvas.bind("<Double-1>", self.on_double_click)
+
+    # --- Layout ---
+
+    def columns(self):
+        return max(1, self.canvas.winfo_width() // CELL_W)
+
+    def set_entries(self, entries):
+        """entries: list of dicts with 'url', 'title' and 'thumbnail'."""
+        self.entries = entries
+        self.clear_cells()
+        self.schedule_refresh(relayout=True)
+
+    def update_entry(self, index, entry):
+        self.entries[index] = entry
+        if index in self.drawn:
+            self.release(index)
+            self.schedule_refresh()
+
+    def schedule_refresh(self, relayout=False):
+        if relayout: self.clear_cells()
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_refresh()
+
+    def on_wheel(self, event):
+        self.yview("scroll", -1 if event.delta > 0 else 1, "units")
+
+    def visible_range(self, cols):
+        height = self.canvas.winfo_height()
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // CELL_H) * cols)
+        last = min(len(self.entries), (int((top + height) // CELL_H) + 1) * cols)
+        return first, last, max(1, (height // CELL_H + 1) * cols)
+
+    def refresh(self):
+        self.refresh_pending = False
+        cols = self.columns()
+        rows = (len(self.entries) + cols - 1) // cols
+        self.canvas.configure(scrollregion=(0, 0, cols * CELL_W, rows * CELL_H), yscrollincrement=CELL_H // 4)
+        first, last, screen = self.visible_range(cols)
+
+        for index in [i for i in self.drawn if not first <= i < last]:
+            self.release(index)
+        for index in range(first, last):
+            if index not in self.drawn: self.draw(index, cols)
+
+        visible = [self.entries[i].get("thumbnail") for i in range(first, last)]
+        ahead = [e.get("thumbnail") for e in self.entries[last:last + screen * self.prefetch_screens]]
+        self.fetcher.set_wanted(visible + ahead)
+        for url in visible: self.fetcher.request(url, HIGH)
+        for url in ahead: self.fetcher.request(url, LOW)
+
+    def draw(self, index, cols):
+        entry = self.entries[index]
+        x = (index % cols) * CELL_W + (CELL_W - THUMB_SIZE[0]) // 2
+        y = (index // cols) * CELL_H + 6
+        items = [self.canvas.create_rectangle(x, y, x + THUMB_SIZE[0], y + THUMB_SIZE[1], outline="#444", fill="#2b2b2b")]
+        image = self.cache.get(entry.get("thumbnail"))
+        if image is not None:
+            self.photos[index] = ImageTk.PhotoImage(image)
+            items.append(self.canvas.create_image(x + THUMB_SIZE[0] // 2, y + THUMB_SIZE[1] // 2, image=self.photos[index]))
+        title = entry.get("title") or entry.get("url", "")
+        items.append(self.canvas.create_text(x, y + THUMB_SIZE[1] + 4, text=title[:48], anchor="nw",
+                                             width=THUMB_SIZE[0], fill="#ddd", font=("Helvetica", 8)))
+        self.drawn[index] = items
+
+    def release(self, index):
+        for item in self.drawn.pop(index, []):
+            self.canvas.delete(item)
+        self.photos.pop(index, None)
+
+    def clear_cells(self):
+        for index in list(self.drawn):
+            self.release(index)
+
+    def on_image_ready(self, url):
+        for index in list(self.drawn):
+            if self.entries[index].get("thumbnail") == url and index not in self.photos:
+                self.release(index)
+        self.schedule_refresh()
+
+    def on_double_click(self, event):
+        cols = self.columns()
+        col = int(self.canvas.canvasx(event.x) // CELL_W)
+        index = int(self.canvas.canvasy(event.y) // CELL_H) * cols + col
+        if col < cols and 0 <= index < len(self.entries) and self.on_open:
+            self.on_open(self.entries[index])
+
+    def image_count(self):
+        return len(self.photos)
+
+    def close(self):
+        self.fetcher.close()
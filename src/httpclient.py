@@ -0,0 +1,353 @@
+import base64
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+import zlib
+
+from failures import backoff_delay
+
+try:
+    import certifi  # bundled in frozen builds, where the system store may be missing
+except ImportError:
+    certifi = None
+
+USER_AGENT = "Mozilla/5.0"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+RECONNECT_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+IDLE_SECONDS = 30  # most servers drop keep-alive connections not long after this
+
+
+class HttpError(OSError):
+    def __init__(self, status, url, reason=""):
+        super().__init__(f"HTTP {status} {reason} for {url}".replace("  ", " "))
+        self.status = status
+        self.url = url
+
+
+class Response:
+    def __init__(self, status, headers, body, url, from_cache=False):
+        self.status = status
+        self.headers = headers  # lower-cased names
+        self.body = body
+        self.url = url
+        self.from_cache = from_cache
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+class HttpCache:
+    """Tiny on-disk cache for validators (ETag / Last-Modified) and bodies.
+
+    Fresh entries (Cache-Control max-age) are served without touching the
+    network; stale ones are revalidated, and a 304 costs only the headers.
+    Least recently used entries go once the directory passes `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_entry=4 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry = max_entry
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self, url):
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".json"), os.path.join(self.directory, name + ".body")
+
+    def get(self, url):
+        meta_path, body_path = self.paths(url)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def put(self, url, headers, body):
+        control = headers.get("cache-control", "")
+        if "no-store" in control or len(body) > self.max_entry: return
+        if not (headers.get("etag") or headers.get("last-modified") or "max-age" in control): return
+        meta = {"etag": headers.get("etag"), "last_modified": headers.get("last-modified"),
+                "content_type": headers.get("content-type"), "expires": time.time() + max_age(control)}
+        meta_path, body_path = self.paths(url)
+        with self.lock:
+            try:
+                with open(body_path, "wb") as f:
+                    f.write(body)
+                with open(meta_path, "w") as f:
+                    json.dump(meta, f)
+            except OSError:
+                return
+            self.prune()
+
+    def refresh(self, url, meta, headers):
+        """After a 304: keep the body, take any new validators and freshness."""
+        control = headers.get("cache-control", "")
+        meta.update(expires=time.time() + max_age(control),
+                    etag=headers.get("etag") or meta.get("etag"),
+                    last_modified=headers.get("last-modified") or meta.get("last_modified"))
+        try:
+            with open(self.paths(url)[0], "w") as f:
+                json.dump(meta, f)
+        except OSError:
+            pass
+
+    def prune(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"): continue
+            meta_path = os.path.join(self.directory, name)
+            body_path = meta_path[:-5] + ".body"
+            try:
+                size = os.path.getsize(body_path)
+                entries.append((os.path.getmtime(meta_path), size, meta_path, body_path))
+                total += size
+            except OSError:
+                pass
+        for _, size, meta_path, body_path in sorted(entries):
+            if total <= self.max_bytes: break
+            for path in (meta_path, body_path):
+                try: os.remove(path)
+                except OSError: pass
+            total -= size
+
+
+def max_age(control):
+    for part in control.split(","):
+        name, _, value = part.strip().partition("=")
+        if name.lower() == "max-age" and value.strip().isdigit(): return int(value)
+    return 0
+
+
+class HostPool:
+    def __init__(self, limit):
+        self.slots = threading.BoundedSemaphore(limit)
+        self.idle = []  # [(last_used, connection)]
+
+
+class HttpClient:
+    """One keep-alive connection pool for every in-app HTTP request.
+
+    Each host gets at most `per_host` concurrent connections, reused across
+    requests. `timeout` bounds every socket operation and `deadline` the whole
+    response, so a CDN that stalls or trickles fails instead of hanging a
+    worker. Connection errors and 429/5xx are retried with jittered backoff.
+    Proxies come from `proxy` or the usual *_proxy environment variables.
+    """
+
+    def __init__(self, timeout=15, deadline=120, retries=3, per_host=4, proxy=None, cache_dir=None):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.per_host = per_host
+        self.cache = HttpCache(cache_dir) if cache_dir else None
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.ssl_context = ssl.create_default_context(cafile=certifi.where() if certifi else None)
+        self.set_proxy(proxy)
+
+    def set_proxy(self, proxy):
+        """`proxy` is an http://[user:pass@]host:port URL; empty means use the environment."""
+        self.proxy = proxy or None
+        self.close()
+
+    def proxy_for(self, scheme, host):
+        if self.proxy: return self.proxy
+        if urllib.request.proxy_bypass(host): return None
+        return urllib.request.getproxies().get(scheme)
+
+    # --- Connections ---
+
+    def pool(self, key):
+        with self.lock:
+            if key not in self.hosts: self.hosts[key] = HostPool(self.per_host)
+            return self.hosts[key]
+
+    def connect(self, scheme, host, port):
+        proxy = self.proxy_for(scheme, host)
+        headers = {}
+        if proxy:
+            p = urllib.parse.urlsplit(proxy if "://" in proxy else "http://" + proxy)
+            if p.username:
+                auth = f"{urllib.parse.unquote(p.username)}:{urllib.parse.unquote(p.password or '')}"
+                headers["Proxy-Authorization"] = "Basic " + base64.b64encode(auth.encode()).decode()
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(p.hostname, p.port or 8080, timeout=self.timeout, context=self.ssl_context)
+                conn.set_tunnel(host, port, headers)
+                return conn, False, {}
+            # Plain HTTP through a proxy sends the absolute URL to the proxy itself
+            return http.client.HTTPConnection(p.hostname, p.port or 8080, timeout=self.timeout), True, headers
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.ssl_context), False, {}
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False, {}
+
+    def checkout(self, key):
+        pool = self.pool(key)
+        pool.slots.acquire()
+        now = time.monotonic()
+        with self.lock:
+            while pool.idle:
+                last_used, entry = pool.idle.pop()
+                if now - last_used < IDLE_SECONDS: return pool, entry, True
+                entry[0].close()
+        try:
+            return pool, self.connect(*key), False
+        except Exception:
+            pool.slots.release()
+            raise
+
+    def checkin(self, pool, entry, reusable):
+        if reusable:
+            with self.lock:
+                pool.idle.append((time.monotonic(), entry))
+        else:
+            entry[0].close()
+        pool.slots.release()
+
+    def warm(self, url):
+        """Open (DNS + TCP + TLS) a pooled connection to `url`'s host so the next request skips the handshake."""
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        pool, entry, reused = self.checkout(key)
+        ok = reused
+        try:
+            if not reused:
+                entry[0].connect()
+                ok = True
+        finally:
+            self.checkin(pool, entry, ok)
+
+    def close(self):
+        with self.lock:
+            for pool in self.hosts.values():
+                for _, entry in pool.idle: entry[0].close()
+                pool.idle.clear()
+
+    # --- Requests ---
+
+    def send(self, method, url, headers, max_bytes):
+        """One request/response on a pooled connection: (status, headers, body)."""
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"): raise ValueError(f"Unsupported URL: {url}")
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        target = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        for fresh_try in range(2):
+            pool, entry, reused = self.checkout(key)
+            conn, absolute, proxy_headers = entry
+            ok = False
+            try:
+                conn.request(method, url if absolute else target, headers={**headers, **proxy_headers})
+                response = conn.getresponse()
+                body = self.read_body(response, method, max_bytes)
+                ok = not response.will_close
+                return response.status, {k.lower(): v for k, v in response.getheaders()}, body
+            except RECONNECT_ERRORS:
+                # The server dropped an idle keep-alive connection; that is not a real failure
+                if not reused or fresh_try: raise
+            finally:
+                self.checkin(pool, entry, ok)
+
+    def read_body(self, response, method, max_bytes):
+        if method == "HEAD":
+            response.read()
+            return b""
+        ends = time.monotonic() + self.deadline
+        chunks = []
+        size = 0
+        while True:
+            chunk = response.read(64 * 1024)
+            if not chunk: break
+            size += len(chunk)
+            if max_bytes and size > max_bytes: raise OSError(f"Response larger than {max_bytes} bytes")
+            if time.monotonic() > ends: raise TimeoutError(f"Response took longer than {self.deadline}s")
+            chunks.append(chunk)
+        body = b"".join(chunks)
+        encoding = response.getheader("Content-Encoding", "").lower()
+        if encoding == "gzip": body = gzip.decompress(body)
+        elif encoding == "deflate": body = zlib.decompress(body)
+        return body
+
+    def send_with_retries(self, method, url, headers, max_bytes, retries):
+        attempt = 0
+        while True:
+            try:
+                status, response_headers, body = self.send(method, url, headers, max_bytes)
+            except ssl.SSLCertVerificationError:
+                raise
+            except (OSError, http.client.HTTPException):
+                if attempt >= retries: raise
+                time.sleep(backoff_delay(attempt, base=0.5, cap=8))
+                attempt += 1
+                continue
+            if status in RETRY_STATUSES and attempt < retries:
+                retry_after = response_headers.get("retry-after", "")
+                time.sleep(min(30, int(retry_after)) if retry_after.isdigit() else backoff_delay(attempt, base=0.5, cap=8))
+                attempt += 1
+                continue
+            return status, response_headers, body
+
+    def request(self, method, url, headers=None, cache=False, max_bytes=None, retries=None):
+        """Follows redirects; raises HttpError for 4xx/5xx. `cache` only applies to GET."""
+        headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate", **(headers or {})}
+        retries = self.retries if retries is None else retries
+        cache = cache and method == "GET" and self.cache is not None
+        for _ in range(6):
+            cached = self.cache.get(url) if cache else None
+            send_headers = dict(headers)
+            if cached:
+                meta, body = cached
+                if meta.get("expires", 0) > time.time():
+                    return Response(200, {"content-type": meta.get("content_type")}, body, url, from_cache=True)
+                if meta.get("etag"): send_headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"): send_headers["If-Modified-Since"] = meta["last_modified"]
+            status, response_headers, body = self.send_with_retries(method, url, send_headers, max_bytes, retries)
+            if status in REDIRECT_STATUSES and response_headers.get("location"):
+                url = urllib.parse.urljoin(url, response_headers["location"])
+                if status == 303 and method != "HEAD": method = "GET"
+                continue
+            if status == 304 and cached:
+                self.cache.refresh(url, meta, response_headers)
+                return Response(200, {"content-type": meta.get("content_type"), **response_headers}, cached[1], url, from_cache=True)
+            if status >= 400: raise HttpError(status, url, http.client.responses.get(status, ""))
+            if cache and status == 200: self.cache.put(url, response_headers, body)
+            return Response(status, response_headers, body, url)
+        raise HttpError(status, url, "Too many redirects")
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """Process-wide client (the GUI installs its configured one with set_default_client)."""
+    global _default
+    with _default_lock:
+        if _default is None: _default = HttpClient()
+        return _default
+
+
+def set_default_client(client):
+    global _default
+    with _default_lock:
+        _default = client
@@ -0,0 +1,21 @@
+class DownloadJob:
+    """Everything a download worker needs, captured on the Tk thread when the job is created."""
+
+    def __init__(self, job_id, url, command, output_paths, save_dir, extractor=None,
+                 format_chain=(), index_options=None, estimate=None, kind="video"):
+        self.id = job_id
+        self.kind = kind  # "video" (yt-dlp, also MP3) or "ig_photo" (instaloader)
+        self.url = url
+        self.command = command
+        self.output_paths = output_paths  # final destinations
+        self.save_dir = save_dir
+        self.extractor = extractor
+        self.format_chain = format_chain
+        self.index_options = index_options
+        self.estimate = estimate  # bytes at peak (merges hold both parts and the output)
+        self.staging = None
+        self.audio = None  # MP3 post-processing settings, see Engine.convert_audio
+        self.note = None  # logged when the download starts (clip ranges)
+        self.offered = None  # best format metrics available when the job was made (upgrades.describe)
+        self.extra_args = []  # options a later re-download must repeat (subtitles)
+        self.failure = None  # failure category the engine gave up on (failures.classify)
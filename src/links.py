@@ -0,0 +1,143 @@
+import html
+import json
+import re
+import threading
+import urllib.parse
+
+from httpclient import default_client
+
+URL_REGEX = re.compile(r"""https?://[^\s"'<>()\[\]{}]+""", re.IGNORECASE)
+HREF_REGEX = re.compile(r"""href\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+TRACKING_PARAMS = {"si", "feature", "igsh", "igshid", "fbclid", "gclid", "utm_source", "utm_medium",
+                   "utm_campaign", "utm_term", "utm_content", "xmt", "mibextid"}
+
+
+def extract_links(text):
+    """All http(s) links in a block of plain text or HTML, in order, without duplicates."""
+    text = html.unescape(text)
+    found = HREF_REGEX.findall(text) + URL_REGEX.findall(text)
+    seen = set()
+    links = []
+    for url in found:
+        if not url.lower().startswith("http"): continue
+        url = canonicalize(url.rstrip(".,;:!?"))
+        key = media_key(url)
+        if key not in seen:
+            seen.add(key)
+            links.append(url)
+    return links
+
+
+def canonicalize(url):
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host == "threads.com" or host.endswith(".threads.com"):
+        host = host[:-len("threads.com")] + "threads.net"
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in TRACKING_PARAMS]
+    return urllib.parse.urlunsplit((parts.scheme.lower(), host, parts.path, urllib.parse.urlencode(query), ""))
+
+
+# Public suffixes with two labels: the site is the label in front of them
+SECOND_LEVEL = {"co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "com.au", "net.au", "org.au", "co.nz", "org.nz",
+                "co.jp", "ne.jp", "or.jp", "co.kr", "co.in", "co.za", "co.id", "co.il", "co.th", "com.br", "com.mx",
+                "com.ar", "com.tr", "com.cn", "com.hk", "com.tw", "com.sg", "com.my", "com.ph", "com.vn", "com.ua"}
+
+
+def site_of(url):
+    """Registrable-ish domain used for per-site limits ('m.youtube.com' -> 'youtube.com', 'www.bbc.co.uk' -> 'bbc.co.uk')."""
+    host = urllib.parse.urlsplit(url).hostname or ""
+    if host == "youtu.be": return "youtube.com"
+    labels = host.split(".")
+    return ".".join(labels[-3:] if ".".join(labels[-2:]) in SECOND_LEVEL else labels[-2:])
+
+
+# --- Stable (extractor, id) keys ---
+
+YOUTUBE_ID = r"([A-Za-z0-9_-]{11})"
+KEY_PATTERNS = [
+    ("youtube", re.compile(r"(?:^|\.)youtube(?:-nocookie)?\.com/(?:shorts|embed|live|v|e)/" + YOUTUBE_ID)),
+    ("youtube", re.compile(r"^youtu\.be/" + YOUTUBE_ID)),
+    ("instagram", re.compile(r"(?:^|\.)instagram\.com/(?:[^/]+/)?(?:p|reels?|tv)/([A-Za-z0-9_-]+)")),
+    ("threads", re.compile(r"(?:^|\.)threads\.(?:net|com)/@[^/]+/post/([A-Za-z0-9_-]+)")),
+    ("facebook", re.compile(r"(?:^|\.)facebook\.com/(?:[^/]+/)?(?:videos|reel)/(?:[^/]+/)?(\d+)")),
+    ("tiktok", re.compile(r"(?:^|\.)tiktok\.com/@[^/]+/video/(\d+)")),
+]
+QUERY_KEYS = [
+    ("youtube", re.compile(r"(?:^|\.)youtube\.com/watch$"), "v"),
+    ("facebook", re.compile(r"(?:^|\.)facebook\.com/watch/?$"), "v"),
+]
+SHORTENERS = {"fb.watch", "bit.ly", "t.co", "tinyurl.com", "goo.gl", "instagr.am", "vm.tiktok.com", "vt.tiktok.com", "l.facebook.com"}
+
+
+def media_key(url):
+    """'youtube:dQw4w9WgXcQ' for every URL variant of the same item.
+
+    youtu.be, m./music. hosts, shorts/embed/live paths and tracking or time
+    parameters all collapse onto one key; IG /p/ and /reel/ share a key too.
+    Unknown sites fall back to the canonical URL.
+    """
+    url = canonicalize(url)
+    parts = urllib.parse.urlsplit(url)
+    host = parts.netloc.split("@")[-1].split(":")[0]
+    for prefix in ("www.", "m.", "mobile.", "music.", "web."):
+        if host.startswith(prefix): host = host[len(prefix):]
+    location = host + parts.path
+    for site, regex in KEY_PATTERNS:
+        match = regex.search(location)
+        if match: return f"{site}:{match.group(1)}"
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    for site, regex, param in QUERY_KEYS:
+        if regex.search(location) and query.get(param):
+            return f"{site}:{query[param]}"
+    return url
+
+
+def is_media_link(url):
+    """True for links to a single item on a known site (or a short link that may lead to one)."""
+    return is_short_link(url) or not media_key(url).startswith("http")
+
+
+def is_short_link(url):
+    parts = urllib.parse.urlsplit(url)
+    host = (parts.hostname or "").lower()
+    return host in SHORTENERS or ((host == "facebook.com" or host.endswith(".facebook.com")) and parts.path.startswith("/share/"))
+
+
+class LinkResolver:
+    """Follows short links / redirects once and remembers where they went."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.cache = {}
+        if path:
+            try:
+                with open(path, "r") as f:
+                    self.cache = json.load(f)
+            except Exception:
+                pass
+
+    def resolve(self, url):
+        """Final URL for short links (network on first sight only); other URLs pass straight through."""
+        url = canonicalize(url)
+        if not is_short_link(url): return url
+        with self.lock:
+            if url in self.cache: return self.cache[url]
+        try:
+            final = canonicalize(default_client().head(url, retries=1).url)
+        except Exception:
+            return url
+        with self.lock:
+            self.cache[url] = final
+        self.save()
+        return final
+
+    def save(self):
+        if not self.path: return
+        with self.lock:
+            data = json.dumps(self.cache)
+        try:
+            with open(self.path, "w") as f:
+                f.write(data)
+        except OSError:
+            pass
@@ -0,0 +1,201 @@
+import csv
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from ytdlp import startupinfo
+
+SEGMENT_PATTERN = "seg-%06d.ts"
+SEGMENT_NAME = re.compile(r"seg-(\d+)\.ts$")
+LIST_NAME = re.compile(r"list-(\d+)\.csv$")
+
+
+def segment_number(name):
+    match = SEGMENT_NAME.match(name)
+    return int(match.group(1)) if match else None
+
+
+class LiveCapture:
+    """Records a live stream into fixed-length MPEG-TS segments and keeps only the newest ones.
+
+    yt-dlp writes the stream to stdout and ffmpeg's segment muxer cuts it
+    (stream copy, no re-encode) into numbered files, listing each finished one
+    with its stream-time span in a CSV per connection. Stream time becomes wall
+    time through the connection's live edge: once caught up, a segment is
+    finished right as its end goes by, so the smallest (mtime - end) over the
+    list is where stream time 0 fell on the clock. Catch-up bursts from
+    --live-from-start therefore get their real times, not when they arrived.
+    Finished segments are complete files, so a crash costs one segment at most.
+    Segments older than the retention window are deleted, which keeps disk use
+    bounded during 24/7 capture. If the stream drops, capture restarts.
+    """
+
+    def __init__(self, yt_dlp_path, ffmpeg_dir, url, out_dir, segment_seconds=60,
+                 retention_seconds=2 * 3600, from_start=False, log=print):
+        self.yt_dlp_path = yt_dlp_path
+        self.ffmpeg = os.path.join(ffmpeg_dir, "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg")
+        self.url = url
+        self.out_dir = out_dir
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+        self.from_start = from_start
+        self.log = log
+        self.stop_event = threading.Event()
+        self.processes = []
+        self.thread = None
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        threading.Thread(target=self._prune_loop, daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        for p in self.processes:
+            try: p.terminate()
+            except OSError: pass
+
+    def join(self, timeout=5):
+        """Wait for yt-dlp and ffmpeg to exit after stop(); kills whichever ignores the terminate."""
+        deadline = time.monotonic() + timeout
+        for p in self.processes:
+            try: p.wait(max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired: p.kill()
+
+    def is_running(self):
+        return bool(self.thread and self.thread.is_alive())
+
+    def _run(self):
+        from_start = self.from_start
+        while not self.stop_event.is_set():
+            # Numbering continues across reconnects; each connection gets its own list
+            first = max((n for n in map(segment_number, self._names()) if n is not None), default=-1) + 1
+            fetch = [self.yt_dlp_path, "-f", "b/bv*+ba", "-o", "-", self.url, "--js-runtimes", "node",
+                     "--no-part", "--hls-use-mpegts", "--quiet", "--no-warnings"]
+            if from_start: fetch.append("--live-from-start")
+            cut = [self.ffmpeg, "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-map", "0", "-c", "copy",
+                   "-f", "segment", "-segment_time", str(self.segment_seconds), "-segment_format", "mpegts",
+                   "-reset_timestamps", "1", "-segment_start_number", str(first),
+                   "-segment_list", os.path.join(self.out_dir, f"list-{first:06d}.csv"), "-segment_list_type", "csv",
+                   os.path.join(self.out_dir, SEGMENT_PATTERN)]
+            si = startupinfo()
+            source = subprocess.Popen(fetch, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, startupinfo=si)
+            sink = subprocess.Popen(cut, stdin=source.stdout, stderr=subprocess.PIPE, startupinfo=si)
+            source.stdout.close()  # ffmpeg owns the pipe now
+            self.processes = [source, sink]
+            if self.stop_event.is_set(): self.stop()  # stopped while these were starting
+            self.log("Live capture: recording...")
+            sink.wait()
+            source.wait()
+            error = sink.stderr.read().decode("utf-8", "replace").strip()
+            if self.stop_event.is_set(): break
+            self.log(f"Live capture: stream ended or dropped{': ' + error[-200:] if error else ''}; reconnecting in 15s")
+            # Only the first connection should rewind to the stream start
+            from_start = False
+            self.stop_event.wait(15)
+        self.log("Live capture stopped.")
+
+    # --- Buffer ---
+
+    def _names(self):
+        try:
+            return os.listdir(self.out_dir)
+        except OSError:
+            return []
+
+    def _read_list(self, name):
+        """[(stream_start, stream_end, path)] of one connection's finished segments that still exist."""
+        entries = []
+        try:
+            with open(os.path.join(self.out_dir, name), newline="", encoding="utf-8") as f:
+                for row in csv.reader(f):
+                    try: start, end = float(row[1]), float(row[2])
+                    except (IndexError, ValueError): continue  # ffmpeg may be mid-line
+                    path = os.path.join(self.out_dir, row[0])
+                    if os.path.exists(path): entries.append((start, end, path))
+        except OSError:
+            pass
+        return entries
+
+    def segments(self):
+        """[(start_time, end_time, path)] in wall-clock time, oldest first."""
+        found = []
+        for name in self._names():
+            if not LIST_NAME.match(name): continue
+            entries = self._read_list(name)
+            if not entries: continue
+            try:
+                anchor = min(os.path.getmtime(path) - end for _, end, path in entries)
+            except OSError:
+                continue
+            found.extend((anchor + start, anchor + end, path) for start, end, path in entries)
+        return sorted(found)
+
+    def prune(self):
+        cutoff = time.time() - self.retention_seconds
+        listed = set()
+        # Only listed segments are finished; the one ffmpeg is writing is never touched
+        for start, end, path in self.segments():
+            listed.add(os.path.basename(path))
+            if end < cutoff:
+                try: os.remove(path)
+                except OSError: pass
+        # A segment cut short by a crash never got listed; age it out by mtime (but not the one being written)
+        unlisted = sorted((n for n in self._names() if segment_number(n) is not None and n not in listed), key=segment_number)
+        for name in unlisted[:-1]:
+            path = os.path.join(self.out_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff: os.remove(path)
+            except OSError: pass
+        # Lists of earlier connections go once all their segments are gone
+        lists = sorted(n for n in self._names() if LIST_NAME.match(n))
+        for name in lists[:-1]:
+            if not self._read_list(name):
+                try: os.remove(os.path.join(self.out_dir, name))
+                except OSError: pass
+
+    def _prune_loop(self):
+        while not self.stop_event.wait(min(60, self.segment_seconds)):
+            self.prune()
+        self.prune()
+
+    def status(self):
+        segments = self.segments()
+        if not segments: return 0, 0, 0
+        size = 0
+        for _, _, path in segments:
+            try: size += os.path.getsize(path)
+            except OSError: pass
+        span = (time.time() if self.is_running() else segments[-1][1]) - segments[0][0]
+        return len(segments), span, size
+
+    def export(self, start, end, dest):
+        """Write wall-clock range [start, end] from the buffer to `dest` with stream copy.
+
+        Cuts land on keyframes near the requested times, because nothing is re-encoded.
+        """
+        chosen = [(s, e, p) for s, e, p in self.segments() if s < end and e > start]
+        if not chosen:
+            raise ValueError("That time range is no longer (or not yet) in the buffer.")
+        list_path = dest + ".concat.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for i, (seg_start, seg_end, path) in enumerate(chosen):
+                quoted = path.replace("'", "'\\''")
+                f.write(f"file '{quoted}'\n")
+                if i == 0 and start > seg_start: f.write(f"inpoint {start - seg_start:.3f}\n")
+                if i == len(chosen) - 1 and end < seg_end:
+                    f.write(f"outpoint {end - seg_start:.3f}\n")
+        try:
+            command = [self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+                       "-i", list_path, "-c", "copy", dest]
+            process = subprocess.run(command, capture_output=True, text=True, errors="replace", startupinfo=startupinfo())
+            if process.returncode != 0:
+                raise Exception(process.stderr.strip()[-300:] or "ffmpeg failed")
+        finally:
+            os.remove(list_path)
+        return dest
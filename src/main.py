@@ -1,21 +1,46 @@
+import asyncio
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-import subprocess
 import json
 import os
 import threading
 import sys
 import re
-import instaloader
-import urllib.request
+import time
+import multiprocessing
 import webbrowser
 from PIL import Image, ImageTk, ImageOps, ImageDraw
 from io import BytesIO
+from bandwidth import BandwidthEstimator, estimate_size, pick_within_deadline, format_rate
+from failures import CircuitBreaker
+from batch import BatchAnalyzer
+from audio import QUALITY_PRESETS, DEFAULT_QUALITY
+from engine import Engine, LOG as ENGINE_LOG, PROGRESS as ENGINE_PROGRESS, DONE, FAILED
+from live import LiveCapture
+from sharedqueue import SharedQueue
+from worker import QueueWorker
+from storage import DiskAdmission
+from uibus import UIBus, LOG, PROGRESS, STATE, CALL, DIALOG
+from httpclient import HttpClient, set_default_client
+from links import extract_links, canonicalize, media_key, is_media_link, LinkResolver
+from speculate import Speculator
+from diagnostics import MemoryMonitor, thread_groups
+from egress import EgressPool, parse_endpoint
+from storyboard import Storyboard, StoryboardScrubber, pick_storyboard
+from ytdlp import InfoCache, flat_playlist, is_playlist_url
+from gallery import ThumbnailCache, VirtualGallery
+from clips import parse_ranges, format_timestamp
+from dedup import ContentIndex
+from upgrades import UpgradeScanner
 
 CURRENT_VERSION = "v1.3.0"
 GITHUB_REPO = "RyuOuO/YT-Downloder"
+MAX_LOG_LINES = 5000
+MEMORY_SAMPLE_MS = 30000
+CLIPBOARD_POLL_MS = 1500
+DEFAULT_MEMORY_BUDGET_MB = 1536
 
 class App(ttk.Window):
     def __init__(self):
@@ -33,6 +58,11 @@ class App(ttk.Window):
         # --- Config & Paths ---
         self.user_home = os.path.expanduser("~")
         self.config_path = os.path.join(self.user_home, ".yt_downloader_config.json")
+        self.index_path = os.path.join(self.user_home, ".yt_downloader_index.db")
+        self.bandwidth_path = os.path.join(self.user_home, ".yt_downloader_bandwidth.json")
+        self.redirects_path = os.path.join(self.user_home, ".yt_downloader_redirects.json")
+        self.http_cache_path = os.path.join(self.user_home, ".yt_downloader_http_cache")
+        self.storyboard_path = os.path.join(self.user_home, ".yt_downloader_storyboards")
 
         if getattr(sys, 'frozen', False):
             self.base_path = sys._MEIPASS
@@ -45,9 +75,54 @@ class App(ttk.Window):
 
         self.video_formats = []
         self.audio_formats = []
-        self.last_analyzed_url = ""
+        self.format_sizes = {}
+        # One pooled client for thumbnails, covers, redirects and the update check
+        self.http = HttpClient(cache_dir=self.http_cache_path)
+        set_default_client(self.http)
+        self.info_cache = InfoCache()  # media_key -> info dict
+        self.link_resolver = LinkResolver(self.redirects_path)
+        self.batch_window = None
+        self.thumb_cache = ThumbnailCache()
+        self.shared_queue = None
+        self.queue_worker = None
+        self.current_extractor = None
+        self.bandwidth = BandwidthEstimator(self.bandwidth_path)
+        self.circuit_breaker = CircuitBreaker()
+        self.disk_admission = DiskAdmission()
+        self.current_duration = None
+        self.current_is_live = False
+        self.current_info = None
+        self.live_windows = {}
+        self.last_analyzed_key = None
         self.analysis_timer = None
         self.thumbnail_image = None
+        self.storyboard = None
+        self.clip_mark = None
+        self.scrubber = StoryboardScrubber(lambda *args: self.ui_bus.call(self.show_frame, *args), self.storyboard_path)
+        try: self.content_index = ContentIndex(self.index_path)
+        except Exception: self.content_index = None
+
+        # Analysis and downloads run as coroutines of one engine on one event-loop thread
+        self.engine = Engine(self.yt_dlp_path, self.ffmpeg_path, info_cache=self.info_cache, link_resolver=self.link_resolver,
+                             bandwidth=self.bandwidth, circuit_breaker=self.circuit_breaker, disk_admission=self.disk_admission,
+                             content_index=self.content_index, http=self.http, stream_hash=True)
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="engine", daemon=True).start()
+
+        # Workers never touch Tk directly; they post here and the main loop applies batches
+        self.ui_bus = UIBus()
+        self.ui_tick = 50
+        self.active_job = None
+        self.upgrade_scanner = None
+        self.egress_specs = []
+        self.speculator = None
+        self.clipboard_poll = None
+        self.last_clipboard = None
+        self.warm_connections = True
+
+        self.memory = MemoryMonitor(DEFAULT_MEMORY_BUDGET_MB * 2 ** 20)
+        self.memory.log = self.log
+        self.diagnostics_window = None
         
         # --- UI Construction ---
         self.create_widgets()
@@ -57,11 +132,8 @@ class App(ttk.Window):
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.after(1000, self.check_for_updates)
         self.bind("<FocusIn>", self.check_clipboard)
-
-        # Log buffering
-        self.log_queue = []
-        self.is_log_updating = False
-        self.update_log_interval = 100
+        self.after(self.ui_tick, self.drain_ui_events)
+        self.setup_memory_monitor()
 
     def create_widgets(self):
         # Custom Fonts
@@ -77,6 +149,7 @@ class App(ttk.Window):
         header_frame.pack(fill=X, pady=(0, 20))
         ttk.Label(header_frame, text="⬇ Universal Downloader", font=title_font, bootstyle="inverse-primary").pack(side=LEFT, padx=5, ipady=5, ipadx=10)
         ttk.Label(header_frame, text="YouTube • Instagram • Facebook • Threads", font=("Helvetica", 9), bootstyle="secondary").pack(side=LEFT, padx=10)
+        ttk.Button(header_frame, text="🩺", width=3, command=self.open_diagnostics, bootstyle="secondary-link").pack(side=RIGHT)
 
         # --- Input Section ---
         input_group = ttk.Labelframe(main_frame, text=" 🔗 Link Input ", padding=15, bootstyle="info")
@@ -88,11 +161,14 @@ class App(ttk.Window):
         url_container = ttk.Frame(input_group)
         url_container.pack(fill=X)
         
-        url_entry = ttk.Entry(url_container, textvariable=self.url_var, font=("Consolas", 10))
-        url_entry.pack(side=LEFT, fill=X, expand=True, padx=(0, 10))
+        self.url_entry = ttk.Entry(url_container, textvariable=self.url_var, font=("Consolas", 10))
+        self.url_entry.pack(side=LEFT, fill=X, expand=True, padx=(0, 10))
         
         self.analyze_button = ttk.Button(url_container, text="🔍 Analyze", command=self.start_analysis, bootstyle="info", width=10)
         self.analyze_button.pack(side=LEFT)
+        ttk.Button(url_container, text="📋 Batch", command=self.open_batch_window, bootstyle="info-outline", width=8).pack(side=LEFT, padx=(5, 0))
+        self.speculative_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(input_group, text="⚡ Pre-analyze Copied Links", variable=self.speculative_var, command=self.toggle_speculation, bootstyle="round-toggle").pack(anchor="w", pady=(8, 0))
 
         # --- Settings & Preview Grid ---
         grid_frame = ttk.Frame(main_frame)
@@ -124,9 +200,16 @@ class App(ttk.Window):
         self.video_format_combo.set("Waiting for analysis...")
         
         self.audio_format_combo = ttk.Combobox(settings_frame, state="readonly", bootstyle="secondary")
-        self.audio_format_combo.pack(fill=X, pady=(0, 15))
+        self.audio_format_combo.pack(fill=X, pady=(0, 5))
         self.audio_format_combo.set("Waiting for analysis...")
 
+        deadline_box = ttk.Frame(settings_frame)
+        deadline_box.pack(fill=X, pady=(0, 15))
+        ttk.Label(deadline_box, text="Finish within (min):").pack(side=LEFT)
+        self.deadline_var = tk.StringVar()
+        ttk.Spinbox(deadline_box, textvariable=self.deadline_var, from_=0, to=1440, increment=5, width=6).pack(side=LEFT, padx=5)
+        ttk.Label(deadline_box, text="blank = best quality", font=("Helvetica", 8), bootstyle="secondary").pack(side=LEFT)
+
         # Subtitles & Extras
         ttk.Label(settings_frame, text="Extras:", font=header_font).pack(anchor="w", pady=(0, 5))
         extras_box = ttk.Frame(settings_frame)
@@ -140,7 +223,33 @@ class App(ttk.Window):
         self.sub_lang_combo = ttk.Combobox(extras_box, textvariable=self.sub_lang_var, state="readonly", width=15)
         self.sub_lang_combo.pack(side=LEFT, padx=10)
         self.sub_lang_combo.set("No Subtitles")
+
+        dedup_box = ttk.Frame(settings_frame)
+        dedup_box.pack(fill=X, pady=(5, 0))
+        self.dedup_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(dedup_box, text="Link Duplicates", variable=self.dedup_var, bootstyle="round-toggle").pack(side=LEFT)
+        self.similar_check_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dedup_box, text="Find Similar", variable=self.similar_check_var, bootstyle="round-toggle").pack(side=LEFT, padx=10)
+        self.upgrade_scan_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dedup_box, text="Auto-upgrade Library", variable=self.upgrade_scan_var, command=self.toggle_upgrade_scanner, bootstyle="round-toggle").pack(side=LEFT)
+
+        audio_box = ttk.Frame(settings_frame)
+        audio_box.pack(fill=X, pady=(5, 0))
+        self.normalize_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(audio_box, text="MP3: Normalize Loudness", variable=self.normalize_var, bootstyle="round-toggle").pack(side=LEFT)
+        self.mp3_quality_var = tk.StringVar(value=DEFAULT_QUALITY)
+        ttk.Combobox(audio_box, textvariable=self.mp3_quality_var, values=list(QUALITY_PRESETS), state="readonly", width=15).pack(side=LEFT, padx=10)
         
+        # Clip Ranges
+        ttk.Label(settings_frame, text="Clip Ranges (optional):", font=header_font).pack(anchor="w", pady=(15, 5))
+        clip_box = ttk.Frame(settings_frame)
+        clip_box.pack(fill=X)
+        self.clip_var = tk.StringVar()
+        ttk.Entry(clip_box, textvariable=self.clip_var, font=("Consolas", 9)).pack(side=LEFT, fill=X, expand=True)
+        self.accurate_cuts_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(clip_box, text="Accurate Cuts", variable=self.accurate_cuts_var, bootstyle="round-toggle").pack(side=LEFT, padx=(10, 0))
+        ttk.Label(settings_frame, text="e.g. 0:30-1:00, 1:02:00-1:02:30", font=("Helvetica", 8), bootstyle="secondary").pack(anchor="w")
+
         # Save Location
         ttk.Label(settings_frame, text="Save Location:", font=header_font).pack(anchor="w", pady=(15, 5))
         save_box = ttk.Frame(settings_frame)
@@ -157,6 +266,16 @@ class App(ttk.Window):
         self.thumb_label = ttk.Label(preview_frame, text="No Media Selected", anchor="center", font=("Helvetica", 10))
         self.thumb_label.pack(fill=BOTH, expand=True)
 
+        # Scrub through the storyboard (a few KB per sprite sheet) before downloading or clipping
+        scrub_box = ttk.Frame(preview_frame)
+        scrub_box.pack(fill=X, pady=(5, 0))
+        self.scrub_scale = ttk.Scale(scrub_box, from_=0, to=1, command=self.on_scrub, state="disabled", bootstyle="warning")
+        self.scrub_scale.pack(side=LEFT, fill=X, expand=True)
+        self.scrub_time_var = tk.StringVar(value="--:--:--")
+        ttk.Label(scrub_box, textvariable=self.scrub_time_var, font=("Consolas", 9)).pack(side=LEFT, padx=5)
+        self.mark_button = ttk.Button(scrub_box, text="✂ Start", command=self.mark_clip, state="disabled", bootstyle="warning-outline", width=7)
+        self.mark_button.pack(side=LEFT)
+
         # --- Bottom Section ---
         self.download_button = ttk.Button(main_frame, text="🚀 START DOWNLOAD", command=self.download_content, state="disabled", bootstyle="success-lg", width=30)
         self.download_button.pack(pady=10)
@@ -178,22 +297,70 @@ class App(ttk.Window):
     # --- Logic (Kept mostly same, adjusted for new widgets) ---
     # ... [Same helper methods as before: check_clipboard, load_thumbnail, etc.] ...
     
+    def fetch_preview(self, url):
+        image = Image.open(BytesIO(self.http.get(url, cache=True, max_bytes=10 * 1024 * 1024).body))
+        # Smart Resize: fit into preview area while keeping aspect ratio
+        target_w, target_h = 300, 250 
+        image.thumbnail((target_w, target_h), Image.Resampling.LANCZOS)
+        return image
+
     def load_thumbnail(self, url):
+        """Worker side: fetch and shrink the image; the PhotoImage is made on the main thread."""
         try:
-            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req) as u:
-                raw_data = u.read()
-            image = Image.open(BytesIO(raw_data))
-            
-            # Smart Resize: fit into preview area while keeping aspect ratio
-            target_w, target_h = 300, 250 
-            image.thumbnail((target_w, target_h), Image.Resampling.LANCZOS)
-            
-            self.thumbnail_image = ImageTk.PhotoImage(image)
-            self.thumb_label.configure(image=self.thumbnail_image, text="")
+            image = self.thumb_cache.get(("preview", url))
+            if image is None: image = self.fetch_preview(url)
+            self.ui_bus.call(self.show_thumbnail, image)
         except Exception as e:
             self.log(f"Thumbnail error: {e}")
+            self.ui_bus.call(self.show_thumbnail, None)
+
+    def show_thumbnail(self, image):
+        if image is None:
             self.thumb_label.configure(image='', text="(No Preview)")
+            return
+        self.thumbnail_image = ImageTk.PhotoImage(image)
+        self.thumb_label.configure(image=self.thumbnail_image, text="")
+
+    # --- Storyboard scrubbing ---
+
+    def setup_storyboard(self, key, info):
+        fmt = None if info.get('is_live') else pick_storyboard(info)
+        self.storyboard = Storyboard(fmt, info.get('duration'), self.storyboard_path, key, self.thumb_cache) if fmt else None
+        self.clip_mark = None
+        self.mark_button.configure(text="✂ Start")
+        state = "normal" if self.storyboard else "disabled"
+        self.scrub_scale.configure(to=self.storyboard.duration if self.storyboard else 1, state=state)
+        self.mark_button["state"] = state
+        self.scrub_scale.set(0)
+        self.scrub_time_var.set("--:--:--")
+
+    def on_scrub(self, value):
+        if not self.storyboard: return
+        seconds = float(value)
+        self.scrub_time_var.set(format_timestamp(seconds))
+        self.scrubber.request(self.storyboard, seconds)
+
+    def show_frame(self, board, seconds, image, error):
+        if board is not self.storyboard: return  # a frame of the previous video
+        if error:
+            self.log(f"Storyboard error: {error}")
+            return
+        # Storyboard tiles are small; scale them up to the preview size
+        scale = min(300 / image.width, 250 / image.height)
+        self.show_thumbnail(image.resize((int(image.width * scale), int(image.height * scale)), Image.Resampling.BILINEAR))
+
+    def mark_clip(self):
+        """First press marks where a clip starts, the second adds the range to Clip Ranges."""
+        seconds = float(self.scrub_scale.get())
+        if self.clip_mark is None or int(seconds) <= int(self.clip_mark):
+            self.clip_mark = seconds
+            self.mark_button.configure(text="✂ End")
+            return
+        clip = f"{format_timestamp(self.clip_mark)}-{format_timestamp(seconds)}"
+        current = self.clip_var.get().strip().rstrip(",")
+        self.clip_var.set(f"{current}, {clip}" if current else clip)
+        self.clip_mark = None
+        self.mark_button.configure(text="✂ Start")
 
     # ... [Rest of logic: check_clipboard, on_url_change, on_mode_change, log, process_log_queue, load_config, save_config, select_save_directory, on_closing, check_for_updates, prompt_update, start_analysis, analyze_url, download_content, download_ig_photo, download_video, run_download_process] ...
     # I will inject the previous logic here to ensure completeness without typing it all out again if not needed, 
@@ -202,18 +369,83 @@ class App(ttk.Window):
     def check_clipboard(self, event=None):
         try:
             content = self.clipboard_get()
+            links = extract_links(content)
+            if len(links) > 1:
+                self.log(f"Clipboard has {len(links)} links - use 📋 Batch to analyze them all.")
+                return
             if (content.startswith("http") and 
-                content != self.url_var.get() and 
-                content != self.last_analyzed_url):
+                media_key(content) != media_key(self.url_var.get()) and 
+                media_key(content) != self.last_analyzed_key):
                 self.url_var.set(content)
                 self.log(f"Detected: {content}")
         except: pass
 
+    # --- Speculative analysis ---
+
+    def toggle_speculation(self):
+        if self.speculative_var.get():
+            if not self.speculator:
+                self.speculator = Speculator(self.speculate_url, discard=self.discard_speculation,
+                                             busy=lambda: bool(self.engine.active))
+            self.last_clipboard = None
+            if not self.clipboard_poll: self.poll_clipboard()
+        else:
+            if self.clipboard_poll: self.after_cancel(self.clipboard_poll)
+            self.clipboard_poll = None
+            if self.speculator: self.speculator.shutdown()
+            self.speculator = None
+
+    def poll_clipboard(self):
+        """Offer newly copied links for background analysis, even while the window is in the background."""
+        self.clipboard_poll = self.after(CLIPBOARD_POLL_MS, self.poll_clipboard)
+        self.speculator.prune()
+        try: content = self.clipboard_get().strip()
+        except tk.TclError: return
+        if content == self.last_clipboard: return
+        self.last_clipboard = content
+        if not content.startswith("http") or len(content) > 2048: return
+        links = extract_links(content)
+        if len(links) != 1 or not is_media_link(links[0]): return
+        # IG posts download through instaloader; there is no format list to prepare
+        if "instagram.com/p/" in links[0] or "instagram.com/reel/" in links[0]: return
+        key = media_key(links[0])
+        if key in (self.last_analyzed_key, media_key(self.url_var.get())): return
+        self.speculator.offer(key, links[0])
+
+    def speculate_url(self, url):
+        """Speculator worker: what analyze_url would do, at low priority and without touching the UI."""
+        if self.warm_connections:
+            try: self.http.warm(url)
+            except Exception: pass
+        info = self.run_async(self.engine.analyze(url, background=True, cache=False)).result()
+        thumb_url = info.get("thumbnail")
+        if thumb_url:
+            try: self.thumb_cache.put(("preview", thumb_url), self.fetch_preview(thumb_url))
+            except Exception: thumb_url = None
+        return info, thumb_url
+
+    def discard_speculation(self, result):
+        _, thumb_url = result
+        if thumb_url: self.thumb_cache.discard(("preview", thumb_url))
+
+    async def claim_speculation(self, key):
+        """Info prepared speculatively for `key` (waits if still running), or None."""
+        future = self.speculator.take(key) if self.speculator else None
+        if not future: return None
+        try: return (await asyncio.wrap_future(future))[0]
+        except Exception: return None
+
     def on_url_change(self, *args):
         url = self.url_var.get().strip()
         if not url: return
         if self.analysis_timer: self.after_cancel(self.analysis_timer)
 
+        links = extract_links(url)
+        if len(links) > 1:
+            self.url_var.set("")
+            self.open_batch_window(links)
+            return
+
         if "instagram.com/p/" in url or "instagram.com/reel/" in url:
             if self.output_format.get() != "ig_photo":
                 self.output_format.set("ig_photo")
@@ -221,8 +453,10 @@ class App(ttk.Window):
             if self.output_format.get() == "ig_photo":
                 self.output_format.set("mp4")
             
-            if url != self.last_analyzed_url:
-                self.analysis_timer = self.after(800, self.start_analysis)
+            if media_key(url) != self.last_analyzed_key:
+                # A link analyzed speculatively needs no debounce: the result is already there
+                ready = self.speculator and self.speculator.has(media_key(canonicalize(url)))
+                self.analysis_timer = self.after(1 if ready else 800, self.start_analysis)
 
     def on_mode_change(self, *args):
         mode = self.output_format.get()
@@ -255,21 +489,66 @@ class App(ttk.Window):
             self.sub_lang_combo["state"] = "disabled"
 
     def log(self, message):
-        self.log_queue.append(message.strip())
-        if not self.is_log_updating:
-            self.is_log_updating = True
-            self.after(self.update_log_interval, self.process_log_queue)
-
-    def process_log_queue(self):
-        if self.log_queue:
-            messages = "\n".join(self.log_queue)
-            self.log_queue = []
-            self.output_text.insert(tk.END, messages + "\n")
+        # Safe from any thread
+        self.ui_bus.log(message.strip())
+
+    def drain_ui_events(self):
+        self.after(self.ui_tick, self.drain_ui_events)
+        log_lines = None
+        for event in self.ui_bus.drain():
+            try:
+                if event.kind == LOG:
+                    log_lines = event.payload
+                    self.output_text.insert(tk.END, log_lines + "\n")
+                elif event.kind == PROGRESS:
+                    # Only the latest value per job survives the drain; show the job in focus
+                    if event.key == self.active_job: self.progress_var.set(event.payload)
+                elif event.kind == STATE:
+                    event.key["state"] = event.payload
+                elif event.kind == CALL:
+                    fn, args = event.payload
+                    fn(*args)
+                elif event.kind == DIALOG:
+                    kind, title, message = event.payload
+                    # Modal dialogs run their own loop; keep them off the drain path
+                    self.after_idle(getattr(messagebox, f"show{kind}"), title, message)
+            except Exception as e:
+                # Shown on the next tick, with everything else the app logs
+                self.log(f"UI event error ({event.kind}): {e}")
+        if log_lines is not None:
+            self.trim_log(MAX_LOG_LINES)
             self.output_text.see(tk.END)
-        self.is_log_updating = False
-        if self.log_queue:
-             self.is_log_updating = True
-             self.after(self.update_log_interval, self.process_log_queue)
+
+    def trim_log(self, max_lines):
+        lines = int(self.output_text.index("end-1c").split(".")[0])
+        if lines > max_lines: self.output_text.delete("1.0", f"{lines - max_lines + 1}.0")
+
+    # --- Memory ---
+
+    def setup_memory_monitor(self):
+        # Probes report bytes held by each subsystem; evictors run cheapest-to-lose first
+        self.memory.register("thumbnails", lambda: self.thumb_cache.size)
+        self.memory.register("analysis_cache", lambda: self.info_cache.size)
+        self.memory.register("log", lambda: len(self.output_text.get("1.0", tk.END)))
+        self.memory.on_pressure("http", self.http.close)
+        self.memory.on_pressure("log", lambda: self.trim_log(1000))
+        self.memory.on_pressure("thumbnails", lambda: self.thumb_cache.trim(self.thumb_cache.max_bytes // 4))
+        self.memory.on_pressure("analysis_cache", lambda: self.info_cache.trim(self.info_cache.max_bytes // 4))
+        self.bind_all("<Control-Shift-D>", lambda e: self.open_diagnostics())
+        self.sample_memory()
+
+    def tk_image_count(self):
+        return len(self.tk.call("image", "names"))
+
+    def sample_memory(self):
+        self.after(MEMORY_SAMPLE_MS, self.sample_memory)
+        self.memory.sample(self.tk_image_count())
+
+    def open_diagnostics(self):
+        if self.diagnostics_window and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        self.diagnostics_window = DiagnosticsWindow(self)
 
     def load_config(self):
         try:
@@ -281,13 +560,43 @@ class App(ttk.Window):
                 else:
                     self.save_path_var.set(os.path.join(os.path.expanduser("~"), "Downloads"))
                 self.embed_subs_var.set(config.get("embed_subs", False))
+                self.dedup_var.set(config.get("dedup", True))
+                self.similar_check_var.set(config.get("similar_check", False))
+                self.upgrade_scan_var.set(config.get("upgrade_scan", False))
+                self.speculative_var.set(config.get("speculative", False))
+                self.warm_connections = config.get("warm_connections", True)
+                self.accurate_cuts_var.set(config.get("accurate_cuts", False))
+                self.deadline_var.set(config.get("deadline_minutes", ""))
+                self.normalize_var.set(config.get("normalize_audio", True))
+                self.memory.budget_bytes = int(config.get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)) * 2 ** 20
+                if config.get("mp3_quality") in QUALITY_PRESETS: self.mp3_quality_var.set(config["mp3_quality"])
+                if config.get("shared_queue_path"): self.set_shared_queue(config["shared_queue_path"])
+                self.http.set_proxy(config.get("http_proxy"))
+                self.set_egress(config.get("egress") or [])
         except:
             self.save_path_var.set(os.path.join(os.path.expanduser("~"), "Downloads"))
+        # Started only once every setting is in, so one that fails cannot make the rest be skipped
+        for name, start in (("Speculative analysis", self.toggle_speculation), ("Upgrade scanner", self.toggle_upgrade_scanner)):
+            try: start()
+            except Exception as e: self.log(f"{name} could not start: {e}")
 
     def save_config(self):
         config = {
             "save_path": self.save_path_var.get(),
-            "embed_subs": self.embed_subs_var.get()
+            "embed_subs": self.embed_subs_var.get(),
+            "dedup": self.dedup_var.get(),
+            "similar_check": self.similar_check_var.get(),
+            "upgrade_scan": self.upgrade_scan_var.get(),
+            "speculative": self.speculative_var.get(),
+            "warm_connections": self.warm_connections,
+            "accurate_cuts": self.accurate_cuts_var.get(),
+            "deadline_minutes": self.deadline_var.get(),
+            "normalize_audio": self.normalize_var.get(),
+            "mp3_quality": self.mp3_quality_var.get(),
+            "shared_queue_path": self.shared_queue.path if self.shared_queue else None,
+            "http_proxy": self.http.proxy,
+            "egress": self.egress_specs,
+            "memory_budget_mb": self.memory.budget_bytes // 2 ** 20
         }
         with open(self.config_path, "w") as f:
             json.dump(config, f)
@@ -300,6 +609,17 @@ class App(ttk.Window):
     def on_closing(self):
         try: self.save_config() # pylint: disable=no-member
         except: pass
+        self.engine.close()
+        if self.upgrade_scanner: self.upgrade_scanner.stop()
+        self.upgrade_scanner = None
+        # Capture processes outlive os._exit and nothing would prune their segments any more
+        captures = [w.capture for w in self.live_windows.values() if w.capture]
+        for capture in captures: capture.stop()
+        for capture in captures: capture.join()
+        if self.engine.egress: self.engine.egress.stop()
+        if self.speculator: self.speculator.shutdown()
+        try: self.bandwidth.save()
+        except: pass
         self.destroy()
         os._exit(0)
 
@@ -307,14 +627,14 @@ class App(ttk.Window):
         def _check():
             try:
                 url = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
-                with urllib.request.urlopen(url) as response:
-                    data = json.loads(response.read().decode())
-                    latest_version = data.get("tag_name", "")
-                    if latest_version and latest_version != CURRENT_VERSION:
-                        v1 = [int(x) for x in latest_version.lstrip('v').split('.')]
-                        v2 = [int(x) for x in CURRENT_VERSION.lstrip('v').split('.')]
-                        if v1 > v2:
-                            self.after_idle(lambda: self.prompt_update(latest_version, data.get("html_url")))
+                # Revalidated with the stored ETag, so an unchanged release costs a 304
+                data = self.http.get(url, cache=True, headers={"Accept": "application/vnd.github+json"}).json()
+                latest_version = data.get("tag_name", "")
+                if latest_version and latest_version != CURRENT_VERSION:
+                    v1 = [int(x) for x in latest_version.lstrip('v').split('.')]
+                    v2 = [int(x) for x in CURRENT_VERSION.lstrip('v').split('.')]
+                    if v1 > v2:
+                        self.ui_bus.call(self.prompt_update, latest_version, data.get("html_url"))
             except: pass
         threading.Thread(target=_check, daemon=True).start()
 
@@ -324,146 +644,277 @@ class App(ttk.Window):
 
     def start_analysis(self):
         if self.output_format.get() == "ig_photo": return
+        url = self.url_var.get().strip()
+        if not url: return
+        url = canonicalize(url)
         self.analyze_button["state"] = "disabled"
         self.download_button["state"] = "disabled"
         self.log("Auto-analyzing...")
         self.thumb_label.configure(image='', text="Loading...")
-        threading.Thread(target=self.analyze_url, daemon=True).start()
+        self.run_async(self.analyze_url(url))
 
-    def analyze_url(self):
-        url = self.url_entry.get()
-        if not url:
-            self.analyze_button["state"] = "normal"
-            return
+    def run_async(self, coro):
+        """Schedule a coroutine on the engine loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def fetch_info(self, url):
+        """(media key, info dict) for `url`, shared by every URL variant of the same item."""
+        key = await self.engine.resolve(url)
+        info = self.info_cache.get(key)
+        if info is None:
+            info = await self.claim_speculation(media_key(url))
+            if info is None: info = await self.engine.analyze(url)
+            self.info_cache.put(key, info)
+        return key, info
+
+    def get_info(self, url):
+        """fetch_info for worker threads (batch analysis)."""
+        return self.run_async(self.fetch_info(url)).result()
+
+    async def analyze_url(self, url):
+        try:
+            key, info = await self.fetch_info(url)
+            self.ui_bus.call(self.apply_analysis, key, info)
+            thumb_url = info.get('thumbnail')
+            if thumb_url: await asyncio.to_thread(self.load_thumbnail, thumb_url)
+        except Exception as e:
+            self.log(f"Analysis error: {e}")
+            self.ui_bus.call(self.thumb_label.configure, {"text": "Error loading info"})
+            self.ui_bus.state(self.analyze_button, "normal")
+
+    def apply_analysis(self, key, info):
+        self.last_analyzed_key = key
+        self.winfo_toplevel().title(f"Universal Downloader - {info.get('title', 'Unknown')}")
+
+        formats = info.get("formats", [])
+        self.current_extractor = info.get('extractor_key') or info.get('extractor')
+        self.current_duration = info.get('duration')
+        self.current_info = info
+        self.current_is_live = bool(info.get('is_live'))
+        self.setup_storyboard(key, info)
+        if self.current_is_live: self.log("Live stream detected - downloading opens Live Capture.")
+        self.video_formats.clear()
+        self.audio_formats.clear()
+        self.format_sizes.clear()
+        for f in formats:
+            filesize = f.get('filesize') or f.get('filesize_approx')
+            self.format_sizes[f['format_id']] = (estimate_size(f, info.get('duration')), f.get('acodec') != 'none')
+            size_mb = f"~{filesize / (1024*1024):.1f}MB" if filesize else "N/A"
+            if f.get('vcodec') != 'none' and f.get('acodec') == 'none':
+                desc = f"{f.get('height', 'N/A')}p ({f.get('ext')}, {f.get('vcodec')}) - {size_mb}"
+                self.video_formats.append((desc, f['format_id']))
+            elif f.get('acodec') != 'none' and f.get('vcodec') == 'none':
+                desc = f"{f.get('abr', 0)}k ({f.get('ext')}, {f.get('acodec')}) - {size_mb}"
+                self.audio_formats.append((desc, f['format_id']))
+            elif f.get('vcodec') != 'none' and f.get('acodec') != 'none':
+                desc = f"Container: {f.get('height', 'N/A')}p ({f.get('ext')}) - {size_mb}"
+                self.video_formats.append((desc, f['format_id']))
+
+        self.video_format_combo['values'] = [v[0] for v in self.video_formats]
+        self.audio_format_combo['values'] = [a[0] for a in self.audio_formats]
+        if self.video_formats: self.video_format_combo.set(self.video_formats[-1][0])
+        if self.audio_formats: self.audio_format_combo.set(self.audio_formats[-1][0])
+        self.apply_deadline()
         
-        if "threads.com" in url:
-            url = url.replace("threads.com", "threads.net")
-            self.url_var.set(url)
+        subs = info.get('subtitles', {})
+        auto_subs = info.get('automatic_captions', {})
+        manual_subs_list = []
+        auto_subs_list = []
+        def process_subs(source, target_list, tag):
+            for lang_code, sub_list in source.items():
+                name = sub_list[0].get('name', lang_code)
+                label = f"[{tag}] {lang_code} - {name}"
+                target_list.append(label)
+        process_subs(subs, manual_subs_list, "Manual")
+        process_subs(auto_subs, auto_subs_list, "Auto")
+        manual_subs_list.sort()
+        auto_subs_list.sort()
+        available_subs = manual_subs_list + auto_subs_list
 
+        if available_subs:
+            self.sub_lang_combo['values'] = available_subs
+            self.sub_lang_combo.set(available_subs[0])
+            self.subs_check["state"] = "normal"
+            if self.embed_subs_var.get():
+                self.sub_lang_combo["state"] = "readonly"
+        else:
+            self.sub_lang_combo.set("No Subtitles")
+            self.sub_lang_combo['values'] = []
+            self.sub_lang_combo["state"] = "disabled"
+            self.subs_check["state"] = "disabled"
+
+        self.log(f"Analysis complete: {info.get('title', 'Unknown')}")
+        self.download_button["state"] = "normal"
+        self.analyze_button["state"] = "normal"
+
+    def get_deadline_seconds(self):
         try:
-            si = None
-            if sys.platform == "win32":
-                si = subprocess.STARTUPINFO()
-                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                si.wShowWindow = subprocess.SW_HIDE
+            minutes = float(self.deadline_var.get())
+        except ValueError:
+            return None
+        return minutes * 60 if minutes > 0 else None
 
-            command = [self.yt_dlp_path, "--dump-json", url, "--js-runtimes", "node", "--playlist-items", "1"]
-            process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', check=False, startupinfo=si, errors='replace') 
+    def apply_deadline(self):
+        """Select the best format that should finish within the deadline at the measured speed."""
+        seconds = self.get_deadline_seconds()
+        if not seconds: return
+        rate = self.bandwidth.estimate(self.current_extractor)
+        if not rate:
+            self.log(f"No speed history for {self.current_extractor} yet; keeping best quality.")
+            return
+        if self.output_format.get() == "mp3":
+            formats, combo, extra = self.audio_formats, self.audio_format_combo, 0
+        else:
+            audio_desc = self.audio_format_combo.get()
+            audio_id = next((a[1] for a in self.audio_formats if a[0] == audio_desc), None)
+            formats, combo, extra = self.video_formats, self.video_format_combo, (self.format_sizes.get(audio_id, (0,))[0] or 0)
+        if not formats: return
+        # Video-only formats still need the audio track downloaded alongside
+        candidates = []
+        for desc, fid in formats:
+            size, has_audio = self.format_sizes.get(fid, (None, False))
+            candidates.append((fid, size + (0 if has_audio else extra) if size else None))
+        chosen = pick_within_deadline(candidates, rate, seconds)
+        if chosen is None:
+            sized = [c for c in candidates if c[1]]
+            if not sized: return
+            chosen = min(sized, key=lambda c: c[1])[0]
+            self.log(f"Nothing fits {seconds / 60:g} min at {format_rate(rate)}; using smallest format.")
+        desc = next(d for d, fid in formats if fid == chosen)
+        if combo.get() != desc:
+            combo.set(desc)
+            self.log(f"Deadline pick at {format_rate(rate)}: {desc}")
 
-            if not process.stdout.strip():
-                raise Exception("No data received.")
+    # --- Batch Analysis ---
 
-            info = json.loads(process.stdout.strip().split('\n')[0])
-            self.winfo_toplevel().title(f"Universal Downloader - {info.get('title', 'Unknown')}")
-            
-            thumb_url = info.get('thumbnail')
-            if thumb_url: self.after_idle(self.load_thumbnail, thumb_url)
-
-            formats = info.get("formats", [])
-            self.video_formats.clear()
-            self.audio_formats.clear()
-            for f in formats:
-                filesize = f.get('filesize') or f.get('filesize_approx')
-                size_mb = f"~{filesize / (1024*1024):.1f}MB" if filesize else "N/A"
-                if f.get('vcodec') != 'none' and f.get('acodec') == 'none':
-                    desc = f"{f.get('height', 'N/A')}p ({f.get('ext')}, {f.get('vcodec')}) - {size_mb}"
-                    self.video_formats.append((desc, f['format_id']))
-                elif f.get('acodec') != 'none' and f.get('vcodec') == 'none':
-                    desc = f"{f.get('abr', 0)}k ({f.get('ext')}, {f.get('acodec')}) - {size_mb}"
-                    self.audio_formats.append((desc, f['format_id']))
-                elif f.get('vcodec') != 'none' and f.get('acodec') != 'none':
-                    desc = f"Container: {f.get('height', 'N/A')}p ({f.get('ext')}) - {size_mb}"
-                    self.video_formats.append((desc, f['format_id']))
-
-            self.video_format_combo['values'] = [v[0] for v in self.video_formats]
-            self.audio_format_combo['values'] = [a[0] for a in self.audio_formats]
-            if self.video_formats: self.video_format_combo.set(self.video_formats[-1][0])
-            if self.audio_formats: self.audio_format_combo.set(self.audio_formats[-1][0])
-            
-            subs = info.get('subtitles', {})
-            auto_subs = info.get('automatic_captions', {})
-            manual_subs_list = []
-            auto_subs_list = []
-            seen_langs = set()
-            def process_subs(source, target_list, tag):
-                for lang_code, sub_list in source.items():
-                    name = sub_list[0].get('name', lang_code)
-                    label = f"[{tag}] {lang_code} - {name}"
-                    target_list.append(label)
-            process_subs(subs, manual_subs_list, "Manual")
-            process_subs(auto_subs, auto_subs_list, "Auto")
-            manual_subs_list.sort()
-            auto_subs_list.sort()
-            available_subs = manual_subs_list + auto_subs_list
-
-            if available_subs:
-                self.sub_lang_combo['values'] = available_subs
-                self.sub_lang_combo.set(available_subs[0])
-                self.subs_check["state"] = "normal"
-                if self.embed_subs_var.get():
-                    self.sub_lang_combo["state"] = "readonly"
-            else:
-                self.sub_lang_combo.set("No Subtitles")
-                self.sub_lang_combo['values'] = []
-                self.sub_lang_combo["state"] = "disabled"
-                self.subs_check["state"] = "disabled"
+    def open_batch_window(self, urls=None):
+        if self.batch_window and self.batch_window.winfo_exists():
+            self.batch_window.lift()
+            if urls: self.batch_window.add_urls(urls)
+            return
+        self.batch_window = BatchWindow(self)
+        if urls: self.batch_window.add_urls(urls)
 
-            self.log(f"Analysis complete: {info.get('title', 'Unknown')}")
-            self.download_button["state"] = "normal"
+    # --- Shared Queue (several machines draining one backlog) ---
+
+    def set_shared_queue(self, path):
+        try:
+            self.shared_queue = SharedQueue(path)
         except Exception as e:
-            self.log(f"Analysis error: {e}")
-            self.thumb_label.configure(text="Error loading info")
-        finally:
-            self.analyze_button["state"] = "normal"
+            self.log(f"Shared queue error: {e}")
+            self.shared_queue = None
+        return self.shared_queue
+
+    def choose_shared_queue(self, parent=None):
+        path = filedialog.asksaveasfilename(parent=parent, title="Shared queue file (on a shared volume)",
+                                            defaultextension=".db", confirmoverwrite=False,
+                                            filetypes=[("Queue Database", "*.db"), ("All Files", "*.*")])
+        return self.set_shared_queue(path) if path else None
+
+    def toggle_queue_worker(self, enabled):
+        """Let this machine drain the shared queue too, into the current save folder."""
+        if enabled and not self.queue_worker and self.shared_queue:
+            self.queue_worker = QueueWorker(self.shared_queue, self.save_path_var.get(), log=self.log,
+                                            engine=self.engine, loop=self.loop)
+            threading.Thread(target=self.queue_worker.run_forever, daemon=True).start()
+        elif not enabled and self.queue_worker:
+            self.queue_worker.stop()
+            self.queue_worker = None
 
     def download_content(self):
         mode = self.output_format.get()
         if mode == "ig_photo":
-            threading.Thread(target=self.download_ig_photo, daemon=True).start()
+            url = self.url_var.get().strip()
+            save_dir = self.save_path_var.get()
+            if not save_dir: messagebox.showerror("Error", "Select save dir."); return
+            try:
+                job = self.engine.photo_job(url, save_dir, self.index_options())
+            except ValueError as e:
+                messagebox.showerror("Error", f"{e}"); return
+            self.download_button["state"] = "disabled"
+            self.analyze_button["state"] = "disabled"
+            self.active_job = job.id
+            self.run_async(self.watch_download(job))
+        elif self.current_is_live:
+            self.open_live_window(self.url_var.get().strip())
         else:
             self.download_video()
 
-    def download_ig_photo(self):
-        url = self.url_entry.get()
-        save_dir = self.save_path_var.get()
-        if not save_dir: messagebox.showerror("Error", "Select save dir."); return
-        self.log("Starting IG Photo download...")
-        self.download_button["state"] = "disabled"
-        self.analyze_button["state"] = "disabled"
-        self.progress_var.set(10)
+    def open_live_window(self, url):
+        self.live_windows = {k: w for k, w in self.live_windows.items() if w.winfo_exists()}
+        window = self.live_windows.get(media_key(url))
+        if window and window.winfo_exists():
+            window.lift()
+            return
+        title = self.winfo_toplevel().title().replace("Universal Downloader - ", "")
+        self.live_windows[media_key(url)] = LiveWindow(self, url, title)
+
+    def toggle_upgrade_scanner(self):
+        if not self.upgrade_scan_var.get():
+            if self.upgrade_scanner: self.upgrade_scanner.stop()
+            self.upgrade_scanner = None
+            return
+        if not self.content_index: return
+        if not self.upgrade_scanner:
+            self.upgrade_scanner = UpgradeScanner(self.content_index, self.yt_dlp_path, self.ffmpeg_path, log=self.log,
+                                                  busy=lambda: bool(self.engine.active), admission=self.disk_admission)
+        self.upgrade_scanner.start()
+
+    def set_egress(self, specs):
+        """Spread yt-dlp and Instagram traffic over the configured addresses / proxies."""
+        if self.engine.egress: self.engine.egress.stop()
+        self.engine.egress = None
+        self.egress_specs = specs
         try:
-            L = instaloader.Instaloader(
-                download_pictures=True, download_videos=False, 
-                download_video_thumbnails=False, download_geotags=False, 
-                download_comments=False, save_metadata=False, compress_json=False
-            )
-            match = re.search(r"instagram\.com/(?:p|reel)/([^/?#&]+)", url)
-            if not match: raise ValueError("No shortcode found.")
-            shortcode = match.group(1)
-            post = instaloader.Post.from_shortcode(L.context, shortcode)
-            cwd = os.getcwd()
-            try:
-                os.chdir(save_dir)
-                L.download_post(post, target=shortcode)
-            finally:
-                os.chdir(cwd)
-            self.progress_var.set(100)
-            self.log("Complete!")
-            messagebox.showinfo("Success", f"Saved to {shortcode}")
-            self.after_idle(self.reset_ui)
-        except Exception as e:
-            self.log(f"Error: {e}")
-            messagebox.showerror("Error", f"{e}")
+            endpoints = [parse_endpoint(spec) for spec in specs]
+        except ValueError as e:
+            self.log(f"Egress config error: {e}")
+            return
+        if not endpoints: return
+        self.engine.egress = EgressPool(endpoints, log=self.log)
+        self.engine.egress.start()
+        self.log(f"Egress pool: {', '.join(e.name for e in endpoints)}")
+
+    def index_options(self):
+        # Snapshot of Tk settings for worker threads
+        return {"dedup": self.dedup_var.get(), "similar": self.similar_check_var.get()}
+
+    def finish_job(self):
+        self.download_button["state"] = "normal"
+        self.analyze_button["state"] = "normal"
+        self.on_mode_change()
+
+    async def watch_download(self, job):
+        """Relay one engine download to the UI; runs on the engine loop."""
+        try:
+            async for event in self.engine.download(job):
+                if event.kind == ENGINE_LOG:
+                    self.log(event.value)
+                elif event.kind == ENGINE_PROGRESS:
+                    self.ui_bus.progress(job.id, event.value)
+                elif event.kind == FAILED:
+                    self.ui_bus.progress(job.id, 0)
+                    self.ui_bus.dialog("error", "Error", event.value)
+                elif job.kind == "ig_photo":
+                    self.log("Complete!")
+                    self.ui_bus.dialog("info", "Success", f"Saved to {os.path.basename(job.output_paths[0])}")
+                    self.ui_bus.call(self.reset_ui)
+                else:
+                    self.ui_bus.dialog("info", "Success", "Download complete!")
+                    self.ui_bus.call(self.reset_ui)
+                    self.ui_bus.call(self.thumb_label.configure, {"image": '', "text": "No Thumbnail"})
         finally:
-            self.download_button["state"] = "normal"
-            self.on_mode_change()
+            self.ui_bus.call(self.finish_job)
 
     def download_video(self):
-        url = self.url_entry.get()
+        url = self.url_var.get().strip()
         output_format = self.output_format.get()
         is_mp3 = output_format == 'mp3'
+        # Re-pick with the latest speed estimate, so later jobs step down if the link slowed
+        self.apply_deadline()
         video_desc = self.video_format_combo.get()
         audio_desc = self.audio_format_combo.get()
+        video_id = audio_id = None
 
         if not is_mp3:
             if not video_desc and not audio_desc:
@@ -473,6 +924,11 @@ class App(ttk.Window):
 
         if audio_desc: audio_id = next((a[1] for a in self.audio_formats if a[0] == audio_desc), None)
 
+        try:
+            clip_ranges = parse_ranges(self.clip_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", f"{e}"); return
+
         title = self.winfo_toplevel().title()
         sanitized_title = "".join(c for c in title if c.isalnum() or c in (' ', '.', '_')).rstrip()
         # Keep title clean but informative
@@ -487,69 +943,470 @@ class App(ttk.Window):
 
         if not save_path: return
 
-        command = [self.yt_dlp_path]
-        if is_mp3:
-            if audio_id: command.extend(["-f", audio_id])
-            else: command.extend(["-f", "ba/b"])
-            command.extend(["-x", "--audio-format", "mp3"])
-        else:
-            if video_id and audio_id: command.extend(["-f", f"{video_id}+{audio_id}"])
-            elif video_id: command.extend(["-f", f"{video_id}"])
-            if output_format in ['mp4', 'mkv']: command.extend(["--merge-output-format", output_format])
-
+        extra_args = []
         if self.embed_subs_var.get():
             full_text = self.sub_lang_combo.get()
             if " - " in full_text:
                 try:
                     prefix_part = full_text.split(" - ")[0]
                     lang_code = prefix_part.split(" ")[-1]
-                    command.extend(["--write-subs", "--write-auto-subs", "--embed-subs", "--sub-langs", lang_code])
+                    extra_args.extend(["--write-subs", "--write-auto-subs", "--embed-subs", "--sub-langs", lang_code])
                 except:
-                    command.extend(["--write-subs", "--write-auto-subs", "--embed-subs", "--sub-langs", "all,-live_chat"])
+                    extra_args.extend(["--write-subs", "--write-auto-subs", "--embed-subs", "--sub-langs", "all,-live_chat"])
             else:
-                command.extend(["--write-subs", "--write-auto-subs", "--embed-subs", "--sub-langs", "all,-live_chat"])
-            command.extend(["--sleep-subtitles", "2"])
+                extra_args.extend(["--write-subs", "--write-auto-subs", "--embed-subs", "--sub-langs", "all,-live_chat"])
+            extra_args.extend(["--sleep-subtitles", "2"])
+        try:
+            job = self.engine.video_job(url, save_path, output_format, video_id, audio_id, self.current_info, clip_ranges,
+                                        self.accurate_cuts_var.get(), extra_args, self.mp3_quality_var.get(),
+                                        self.normalize_var.get(), self.index_options())
+        except OSError as e:
+            messagebox.showerror("Error", f"Cannot write to {os.path.dirname(save_path)}: {e}"); return
 
-        command.extend([
-            "--ffmpeg-location", self.ffmpeg_path, "-o", save_path, 
-            url, "--progress", "--newline", "--js-runtimes", "node", "--no-playlist"
-        ])
-        
         self.progress_var.set(0)
         self.download_button["state"] = "disabled"
         self.analyze_button["state"] = "disabled"
+        if self.content_index:
+            for path in self.content_index.paths_for_key(media_key(url)):
+                self.log(f"Note: already downloaded as {path}")
         self.log("Downloading...")
-        threading.Thread(target=self.run_download_process, args=(command,), daemon=True).start()
+        self.active_job = job.id
+        self.run_async(self.watch_download(job))
+
+    def reset_ui(self):
+        self.progress_var.set(0)
+        self.winfo_toplevel().title(f"Universal Downloader {CURRENT_VERSION}")
+
+    # --- Batch Audio ---
+
+    def batch_audio(self, urls, dest_dir, on_done=None):
+        """Download the best audio of many URLs; tracks convert on the process pool while later ones download."""
+        quality, normalize, index_options = self.mp3_quality_var.get(), self.normalize_var.get(), self.index_options()
+        urls_by_job = {}
+
+        async def _jobs():
+            for url in urls:
+                try:
+                    _, info = await self.fetch_info(url)
+                    name = re.sub(r'[\\/:*?"<>|%]', "_", f"{info.get('title', 'audio')} [{info.get('id', '')}]")
+                    job = self.engine.video_job(url, os.path.join(dest_dir, name + ".mp3"), "mp3", info=info,
+                                                audio_quality=quality, normalize=normalize, index_options=index_options)
+                except Exception as e:
+                    self.log(f"Audio download failed for {url}: {e}")
+                    if on_done: on_done(url, None, e)
+                    continue
+                urls_by_job[job.id] = url
+                yield job
+
+        def _event(event):
+            url = urls_by_job.get(event.job)
+            if event.kind == DONE:
+                self.log(f"MP3 ready: {event.value[0]}")
+                if on_done: on_done(url, event.value[0], None)
+            elif event.kind == FAILED:
+                self.log(f"MP3 failed for {url}: {event.value}")
+                if on_done: on_done(url, None, Exception(event.value))
 
-    def run_download_process(self, command):
+        return self.run_async(self.engine.run_all(_jobs(), _event))
+
+
+class BatchWindow(ttk.Toplevel):
+    """Paste a block of links (or load a text/HTML file) and analyze them all in parallel."""
+
+    def __init__(self, app):
+        super().__init__(title="Batch Analysis")
+        self.app = app
+        self.geometry("900x600")
+        self.analyzer = None
+        self.rows = {}
+        self.entries = []
+        self.entry_index = {}
+        self.keys = set()
+        self.done = 0
+
+        frame = ttk.Frame(self, padding=10)
+        frame.pack(fill=BOTH, expand=True)
+        ttk.Label(frame, text="Paste links, text or HTML:").pack(anchor="w")
+        self.input_text = scrolledtext.ScrolledText(frame, height=6, font=("Consolas", 9), bg="#222", fg="#ddd", insertbackground="white")
+        self.input_text.pack(fill=X, pady=(0, 5))
+
+        buttons = ttk.Frame(frame)
+        buttons.pack(fill=X, pady=(0, 5))
+        ttk.Button(buttons, text="📄 Load File", command=self.load_file, bootstyle="secondary-outline").pack(side=LEFT)
+        ttk.Button(buttons, text="🔍 Analyze All", command=self.analyze_all, bootstyle="info").pack(side=LEFT, padx=5)
+        ttk.Button(buttons, text="⏹ Stop", command=self.stop, bootstyle="danger-outline").pack(side=LEFT)
+        self.expand_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(buttons, text="Expand Playlists", variable=self.expand_var, bootstyle="round-toggle").pack(side=LEFT, padx=10)
+        ttk.Button(buttons, text="📤 Queue All", command=self.queue_all, bootstyle="warning-outline").pack(side=LEFT, padx=(0, 5))
+        ttk.Button(buttons, text="🎵 All → MP3", command=self.all_to_mp3, bootstyle="success-outline").pack(side=LEFT, padx=(0, 5))
+        self.work_var = tk.BooleanVar(value=bool(app.queue_worker))
+        ttk.Checkbutton(buttons, text="Work on Queue", variable=self.work_var, command=self.on_work_change, bootstyle="round-toggle").pack(side=LEFT, padx=(0, 10))
+        self.gallery_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(buttons, text="🖼 Gallery", variable=self.gallery_var, command=self.on_view_change, bootstyle="round-toggle").pack(side=LEFT)
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(buttons, textvariable=self.status_var, bootstyle="secondary").pack(side=RIGHT)
+        self.queue_status_var = tk.StringVar(value="")
+        ttk.Label(frame, textvariable=self.queue_status_var, font=("Helvetica", 8), bootstyle="warning").pack(anchor="e")
+
+        self.view = ttk.Frame(frame)
+        self.view.pack(fill=BOTH, expand=True)
+        columns = ("url", "title", "duration", "best", "status")
+        self.tree = ttk.Treeview(self.view, columns=columns, show="headings", bootstyle="info")
+        for col, text, width in zip(columns, ("URL", "Title", "Length", "Best", "Status"), (260, 330, 70, 70, 120)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, stretch=col in ("url", "title"))
+        self.tree.pack(fill=BOTH, expand=True)
+        self.tree.bind("<Double-1>", self.on_row_open)
+        self.gallery = VirtualGallery(self.view, app.thumb_cache, app.ui_bus.call, on_open=lambda e: self.open_url(e["url"]))
+        ttk.Label(frame, text="Double-click a row to load it into the main window.", font=("Helvetica", 8), bootstyle="secondary").pack(anchor="w")
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.poll_queue()
+
+    def add_urls(self, urls):
+        self.input_text.insert(tk.END, "\n".join(urls) + "\n")
+        self.analyze_all()
+
+    def load_file(self):
+        path = filedialog.askopenfilename(parent=self, filetypes=[("Text / HTML", "*.txt *.html *.htm"), ("All Files", "*.*")])
+        if not path: return
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            self.input_text.insert(tk.END, f.read() + "\n")
+
+    def add_row(self, url, title="", status="Queued", thumbnail=None):
+        self.keys.add(media_key(url))
+        self.rows[url] = self.tree.insert("", tk.END, values=(url, title, "", "", status))
+        self.entry_index[url] = len(self.entries)
+        self.entries.append({"url": url, "title": title, "thumbnail": thumbnail})
+
+    def analyze_all(self):
+        urls = [u for u in extract_links(self.input_text.get("1.0", tk.END)) if media_key(u) not in self.keys]
+        # Rows a Stop left behind go round again
+        stopped = [u for u, iid in self.rows.items() if self.tree.set(iid, "status") == "Stopped"]
+        if not urls and not stopped: return
+        if self.expand_var.get():
+            playlists = [u for u in urls if is_playlist_url(u)]
+            urls = [u for u in urls if u not in playlists]
+            for url in playlists:
+                self.add_row(url, status="Listing...")
+                threading.Thread(target=self.expand_playlist, args=(url,), daemon=True).start()
+        for url in urls:
+            self.add_row(url)
+        for url in stopped: self.tree.set(self.rows[url], "status", "Queued")
+        if not self.analyzer:
+            self.analyzer = BatchAnalyzer(self.analyze_one, self.on_result)
+        self.analyzer.submit(urls + stopped)
+        self.refresh_gallery()
+        self.update_status()
+
+    def expand_playlist(self, url):
         try:
-            si = None
-            if sys.platform == "win32":
-                si = subprocess.STARTUPINFO()
-                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                si.wShowWindow = subprocess.SW_HIDE
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', startupinfo=si)
-            progress_regex = re.compile(r"[download]\s+([0-9.]+)%\s*")
-            for line in iter(process.stdout.readline, ''):
-                self.log(line)
-                match = progress_regex.search(line)
-                if match: self.after_idle(self.progress_var.set, float(match.group(1)))
-            process.stdout.close()
-            if process.wait() == 0:
-                self.after_idle(self.progress_var.set, 100)
-                messagebox.showinfo("Success", "Download complete!")
-                self.after_idle(self.reset_ui)
-                self.after_idle(lambda: self.thumb_label.configure(image='', text="No Thumbnail"))
-            else:
-                self.after_idle(self.progress_var.set, 0)
-                messagebox.showerror("Error", "Download failed.")
+            entries = flat_playlist(self.app.yt_dlp_path, url)
+            self.app.ui_bus.call(self.show_playlist, url, entries, None)
         except Exception as e:
-            self.log(f"Error: {e}")
-        finally:
-            self.download_button["state"] = "normal"
-            self.analyze_button["state"] = "normal"
-            self.on_mode_change()
+            self.app.ui_bus.call(self.show_playlist, url, [], e)
+
+    def show_playlist(self, url, entries, error):
+        if not self.winfo_exists(): return
+        status = "Error" if error else f"{len(entries)} items"
+        self.tree.set(self.rows[url], "status", status)
+        if error: self.tree.set(self.rows[url], "title", str(error)[:120])
+        # Entries are listed, not extracted; double-click one to analyze it
+        for e in entries:
+            if media_key(e["url"]) not in self.keys: self.add_row(e["url"], e["title"], "Listed", e["thumbnail"])
+        self.refresh_gallery()
+        self.update_status()
+
+    def analyze_one(self, url):
+        return self.app.get_info(url)[1]
+
+    def on_result(self, url, info, error):
+        self.app.ui_bus.call(self.show_result, url, info, error)
+
+    def show_result(self, url, info, error):
+        if url not in self.rows or not self.winfo_exists(): return
+        if error:
+            self.tree.item(self.rows[url], values=(url, str(error)[:120], "", "", "Error"))
+        else:
+            heights = [f.get("height") or 0 for f in info.get("formats", [])]
+            best = f"{max(heights)}p" if heights and max(heights) else ""
+            duration = format_timestamp(info["duration"]) if info.get("duration") else ""
+            self.tree.item(self.rows[url], values=(url, info.get("title", "Unknown"), duration, best, "Ready"))
+            index = self.entry_index[url]
+            self.entries[index] = {"url": url, "title": info.get("title", "Unknown"), "thumbnail": info.get("thumbnail")}
+            if self.gallery_var.get(): self.gallery.update_entry(index, self.entries[index])
+        self.done += 1
+        self.update_status()
+
+    def update_status(self):
+        self.status_var.set(f"{self.done} analyzed / {len(self.rows)} links")
+
+    def queue_all(self):
+        queue = self.app.shared_queue or self.app.choose_shared_queue(parent=self)
+        if not queue or not self.rows: return
+        mode = self.app.output_format.get()
+        urls = [url for url in self.rows if not is_playlist_url(url)]
+        added = queue.enqueue(urls, {"mode": mode if mode != "ig_photo" else "mp4"})
+        self.app.log(f"Shared queue: added {added} of {len(urls)} (others already queued or archived)")
+
+    def all_to_mp3(self):
+        urls = [url for url in self.rows if not is_playlist_url(url)]
+        if not urls: return
+        dest = filedialog.askdirectory(parent=self, initialdir=self.app.save_path_var.get(), title="Save MP3s to")
+        if not dest: return
+        for url in urls: self.tree.set(self.rows[url], "status", "Audio...")
+        def _done(url, path, error):
+            self.app.ui_bus.call(self.tree.set, self.rows[url], "status", "MP3 ✓" if path else "MP3 failed")
+        self.app.batch_audio(urls, dest, on_done=_done)
+
+    def on_work_change(self):
+        if self.work_var.get() and not (self.app.shared_queue or self.app.choose_shared_queue(parent=self)):
+            self.work_var.set(False)
+            return
+        self.app.toggle_queue_worker(self.work_var.get())
+
+    def poll_queue(self):
+        if not self.winfo_exists(): return
+        queue = self.app.shared_queue
+        if queue:
+            def _stats():
+                try:
+                    stats = queue.stats()
+                except Exception:
+                    return
+                c = stats["counts"]
+                text = (f"Shared queue: {c.get('queued', 0)} queued · {c.get('leased', 0)} running · "
+                        f"{c.get('done', 0)} done · {c.get('failed', 0)} failed · {stats['workers']} node(s)")
+                self.app.ui_bus.call(self.queue_status_var.set, text)
+            threading.Thread(target=_stats, daemon=True).start()
+        self.after(5000, self.poll_queue)
+
+    def on_view_change(self):
+        if self.gallery_var.get():
+            self.tree.pack_forget()
+            self.gallery.pack(fill=BOTH, expand=True)
+            self.refresh_gallery()
+        else:
+            self.gallery.pack_forget()
+            self.gallery.set_entries([])  # release every PhotoImage while hidden
+            self.tree.pack(fill=BOTH, expand=True)
+
+    def refresh_gallery(self):
+        if self.gallery_var.get(): self.gallery.set_entries(self.entries)
+
+    def on_row_open(self, event=None):
+        selection = self.tree.selection()
+        if not selection: return
+        self.open_url(self.tree.set(selection[0], "url"))
+
+    def open_url(self, url):
+        # Info is already cached, so the usual auto-analysis fills the combos instantly
+        self.app.url_var.set(url)
+        self.app.lift()
+
+    def stop(self):
+        if self.analyzer:
+            self.analyzer.shutdown()  # lets running analyses finish, then its threads exit
+            self.analyzer = None
+        for url, iid in self.rows.items():
+            if self.tree.set(iid, "status") == "Queued": self.tree.set(iid, "status", "Stopped")
+
+    def on_close(self):
+        if self.analyzer: self.analyzer.shutdown()
+        self.gallery.set_entries([])
+        self.gallery.close()
+        self.destroy()
+
+class LiveWindow(ttk.Toplevel):
+    """Rolling-buffer capture of one live stream, with export of any buffered time range."""
+
+    def __init__(self, app, url, title):
+        super().__init__(title=f"Live Capture - {title}")
+        self.app = app
+        self.url = url
+        self.title_text = title
+        self.capture = None
+        self.geometry("520x330")
+
+        frame = ttk.Frame(self, padding=15)
+        frame.pack(fill=BOTH, expand=True)
+        ttk.Label(frame, text=title, font=("Helvetica", 11, "bold")).pack(anchor="w", pady=(0, 10))
+
+        options = ttk.Frame(frame)
+        options.pack(fill=X)
+        ttk.Label(options, text="Keep last (hours):").pack(side=LEFT)
+        self.retention_var = tk.StringVar(value="2")
+        ttk.Spinbox(options, textvariable=self.retention_var, from_=0.25, to=72, increment=0.25, width=6).pack(side=LEFT, padx=(5, 15))
+        ttk.Label(options, text="Segment (s):").pack(side=LEFT)
+        self.segment_var = tk.StringVar(value="60")
+        ttk.Spinbox(options, textvariable=self.segment_var, from_=10, to=600, increment=10, width=5).pack(side=LEFT, padx=5)
+        self.from_start_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="Capture from stream start", variable=self.from_start_var, bootstyle="round-toggle").pack(anchor="w", pady=10)
+
+        self.toggle_button = ttk.Button(frame, text="🔴 Start Capture", command=self.toggle, bootstyle="danger", width=20)
+        self.toggle_button.pack(pady=5)
+        self.status_var = tk.StringVar(value="Not recording")
+        ttk.Label(frame, textvariable=self.status_var, bootstyle="secondary").pack()
+
+        export = ttk.Labelframe(frame, text=" Export from buffer ", padding=10, bootstyle="info")
+        export.pack(fill=X, pady=(10, 0))
+        ttk.Label(export, text="From").pack(side=LEFT)
+        self.export_from_var = tk.StringVar(value="10")
+        ttk.Spinbox(export, textvariable=self.export_from_var, from_=0, to=4320, width=5).pack(side=LEFT, padx=5)
+        ttk.Label(export, text="to").pack(side=LEFT)
+        self.export_to_var = tk.StringVar(value="0")
+        ttk.Spinbox(export, textvariable=self.export_to_var, from_=0, to=4320, width=5).pack(side=LEFT, padx=5)
+        ttk.Label(export, text="min ago").pack(side=LEFT)
+        ttk.Button(export, text="💾 Export", command=self.export, bootstyle="info-outline").pack(side=RIGHT)
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.update_status()
+
+    def toggle(self):
+        if self.capture and self.capture.is_running():
+            self.capture.stop()
+            self.toggle_button.configure(text="🔴 Start Capture", bootstyle="danger")
+            return
+        try:
+            retention = float(self.retention_var.get()) * 3600
+            segment = max(5, int(float(self.segment_var.get())))
+        except ValueError:
+            messagebox.showerror("Error", "Retention and segment length must be numbers.", parent=self); return
+        safe_title = "".join(c for c in self.title_text if c.isalnum() or c in (' ', '.', '_')).strip() or "Live"
+        out_dir = os.path.join(self.app.save_path_var.get(), f"Live - {safe_title}")
+        self.capture = LiveCapture(self.app.yt_dlp_path, self.app.ffmpeg_path, self.url, out_dir,
+                                   segment_seconds=segment, retention_seconds=retention,
+                                   from_start=self.from_start_var.get(), log=self.app.log)
+        self.capture.start()
+        self.toggle_button.configure(text="⏹ Stop Capture", bootstyle="secondary")
+
+    def update_status(self):
+        if not self.winfo_exists(): return
+        if self.capture:
+            def _status():
+                count, span, size = self.capture.status()
+                state = "Recording" if self.capture.is_running() else "Stopped"
+                text = f"{state} · {count} segments · {format_timestamp(span)} buffered · {size / (1024 ** 3):.2f}GB"
+                self.app.ui_bus.call(self.status_var.set, text)
+            threading.Thread(target=_status, daemon=True).start()
+        self.after(2000, self.update_status)
+
+    def export(self):
+        if not self.capture:
+            messagebox.showerror("Error", "Nothing recorded yet.", parent=self); return
+        try:
+            now = time.time()
+            start = now - float(self.export_from_var.get()) * 60
+            end = now - float(self.export_to_var.get()) * 60
+        except ValueError:
+            messagebox.showerror("Error", "Enter minutes as numbers.", parent=self); return
+        if end <= start:
+            messagebox.showerror("Error", "'From' must be further back than 'to'.", parent=self); return
+        dest = filedialog.asksaveasfilename(parent=self, initialdir=self.app.save_path_var.get(),
+                                            initialfile=f"{self.title_text} {time.strftime('%Y%m%d-%H%M', time.localtime(start))}.mp4",
+                                            defaultextension=".mp4", filetypes=[("MP4 Files", "*.mp4"), ("MPEG-TS", "*.ts")])
+        if not dest: return
+        def _export():
+            try:
+                self.capture.export(start, end, dest)
+                self.app.log(f"Exported {dest}")
+                self.app.ui_bus.dialog("info", "Export", f"Saved {os.path.basename(dest)}")
+            except Exception as e:
+                self.app.ui_bus.dialog("error", "Export failed", f"{e}")
+        threading.Thread(target=_export, daemon=True).start()
+
+    def on_close(self):
+        if self.capture and self.capture.is_running():
+            if not messagebox.askyesno("Live Capture", "Stop recording and close?", parent=self): return
+            self.capture.stop()
+        self.destroy()
+
+class DiagnosticsWindow(ttk.Toplevel):
+    """Live memory view: RSS history against the budget, threads, Tk images and per-subsystem sizes."""
+
+    def __init__(self, app):
+        super().__init__(title="Diagnostics")
+        self.app = app
+        self.geometry("620x560")
+
+        frame = ttk.Frame(self, padding=15)
+        frame.pack(fill=BOTH, expand=True)
+        self.summary_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.summary_var, font=("Consolas", 9), justify=LEFT).pack(anchor="w")
+        self.chart = tk.Canvas(frame, height=120, bg="#222", highlightthickness=0)
+        self.chart.pack(fill=X, pady=10)
+
+        self.tree = ttk.Treeview(frame, columns=("value",), show="tree headings", height=10)
+        self.tree.heading("#0", text="Subsystem / thread")
+        self.tree.heading("value", text="Size / count")
+        self.tree.column("value", width=120, anchor="e")
+        self.tree.pack(fill=BOTH, expand=True)
+
+        controls = ttk.Frame(frame)
+        controls.pack(fill=X, pady=(10, 0))
+        ttk.Label(controls, text="Budget (MB, 0 = off):").pack(side=LEFT)
+        self.budget_var = tk.StringVar(value=str(app.memory.budget_bytes // 2 ** 20))
+        ttk.Spinbox(controls, textvariable=self.budget_var, from_=0, to=65536, increment=256, width=7,
+                    command=self.apply_budget).pack(side=LEFT, padx=5)
+        self.budget_var.trace("w", lambda *a: self.apply_budget())
+        ttk.Button(controls, text="💾 Dump JSON", command=self.dump, bootstyle="info-outline").pack(side=RIGHT)
+        ttk.Button(controls, text="🧹 Evict Now", command=lambda: app.memory.evict("manual"), bootstyle="warning-outline").pack(side=RIGHT, padx=5)
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text="Trace allocations", variable=self.trace_var, command=self.toggle_tracing,
+                        bootstyle="round-toggle").pack(side=RIGHT, padx=5)
+        self.refresh()
+
+    def apply_budget(self):
+        try: self.app.memory.budget_bytes = max(0, int(float(self.budget_var.get()))) * 2 ** 20
+        except ValueError: pass
+
+    def toggle_tracing(self):
+        if self.trace_var.get(): self.app.memory.start_tracing()
+        else: self.app.memory.stop_tracing()
+
+    def refresh(self):
+        if not self.winfo_exists(): return
+        memory = self.app.memory
+        now = memory.sample(self.app.tk_image_count(), record=False)
+        trend = memory.trend()
+        uptime = time.time() - memory.started
+        self.summary_var.set(
+            f"RSS {now['rss'] / 2 ** 20:.1f}MB · threads {now['threads']} · Tk images {now['tk_images']}\n"
+            f"Uptime {format_timestamp(uptime)} · trend "
+            f"{f'{trend / 2 ** 20:+.2f}MB/h' if trend is not None else 'n/a (needs 3h)'} · evictions {len(memory.evictions)}")
+        self.tree.delete(*self.tree.get_children())
+        for name, size in now["subsystems"].items():
+            self.tree.insert("", END, text=name, values=(f"{size / 2 ** 20:.2f}MB" if size is not None else "?",))
+        threads = self.tree.insert("", END, text="threads", values=(now["threads"],), open=True)
+        for name, count in thread_groups().items():
+            self.tree.insert(threads, END, text=name, values=(count,))
+        self.draw_chart([s["rss"] for s in memory.recent] + [now["rss"]], memory.budget_bytes)
+        self.after(2000, self.refresh)
+
+    def draw_chart(self, values, budget):
+        self.chart.delete("all")
+        w, h = max(self.chart.winfo_width(), 100), 120
+        top = max(values + [budget]) * 1.1 or 1
+        if budget:
+            y = h - budget / top * h
+            self.chart.create_line(0, y, w, y, fill="#c0392b", dash=(4, 2))
+        if len(values) > 1:
+            step = w / (len(values) - 1)
+            points = [c for i, v in enumerate(values) for c in (i * step, h - v / top * h)]
+            self.chart.create_line(*points, fill="#3498db", width=2)
+        self.chart.create_text(5, 5, anchor="nw", fill="#aaa", font=("Consolas", 8), text=f"{top / 2 ** 20:.0f}MB")
+
+    def dump(self):
+        path = filedialog.asksaveasfilename(parent=self, initialfile=f"memory-{time.strftime('%Y%m%d-%H%M%S')}.json",
+                                            defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not path: return
+        try:
+            self.app.memory.dump(path)
+            self.app.log(f"Diagnostics written to {path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not write dump: {e}", parent=self)
 
 if __name__ == "__main__":
+    # The audio pipeline uses a process pool; frozen builds need this before anything else
+    multiprocessing.freeze_support()
     app = App()
     app.mainloop()
@@ -0,0 +1,144 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import closing
+
+from links import media_key
+
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 5
+
+
+def default_worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SharedQueue:
+    """Download backlog in one SQLite file that several machines lease jobs from.
+
+    Meant for a file on a shared volume; no server process is needed. Workers
+    hold a lease per job and extend it with heartbeats. A lease that runs out
+    (worker crashed, machine lost power) makes the job available again.
+    Rollback journal mode is used on purpose: WAL needs shared memory, which
+    network filesystems do not provide.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        with closing(self.connect()) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, media_key TEXT,
+                    options TEXT, status TEXT NOT NULL DEFAULT 'queued', worker TEXT,
+                    lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, progress REAL DEFAULT 0,
+                    result_path TEXT, error TEXT, created REAL, updated REAL);
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, lease_expires);
+                CREATE INDEX IF NOT EXISTS jobs_media_key ON jobs(media_key);
+                CREATE TABLE IF NOT EXISTS workers (
+                    name TEXT PRIMARY KEY, last_seen REAL, jobs_done INTEGER NOT NULL DEFAULT 0);
+                CREATE TABLE IF NOT EXISTS archive (
+                    media_key TEXT PRIMARY KEY, url TEXT, path TEXT, worker TEXT, finished REAL);
+            """)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        return conn
+
+    def transaction(self, fn):
+        """Run fn(conn) under BEGIN IMMEDIATE so only one node mutates at a time."""
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            # BEGIN itself failing ("database is locked") leaves nothing to roll back
+            if conn.in_transaction: conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # --- Producer side ---
+
+    def enqueue(self, urls, options=None):
+        """Queue URLs not already archived or pending; returns how many were added."""
+        def _add(conn):
+            added = 0
+            now = time.time()
+            for url in urls:
+                key = media_key(url)
+                if conn.execute("SELECT 1 FROM archive WHERE media_key = ?", (key,)).fetchone(): continue
+                if conn.execute("SELECT 1 FROM jobs WHERE media_key = ? AND status IN ('queued', 'leased')", (key,)).fetchone(): continue
+                conn.execute("INSERT INTO jobs (url, media_key, options, created, updated) VALUES (?, ?, ?, ?, ?)",
+                             (url, key, json.dumps(options or {}), now, now))
+                added += 1
+            return added
+        return self.transaction(_add)
+
+    # --- Worker side ---
+
+    def lease(self, worker, lease_seconds=LEASE_SECONDS):
+        """Claim the oldest available job: (id, url, options) or None."""
+        def _lease(conn):
+            now = time.time()
+            conn.execute("INSERT INTO workers (name, last_seen) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET last_seen = ?",
+                         (worker, now, now))
+            # Expired leases go back in the pool; jobs that keep killing workers are parked
+            conn.execute("""UPDATE jobs SET status = 'failed', error = 'lease expired too often', updated = ?
+                            WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""", (now, now, MAX_ATTEMPTS))
+            row = conn.execute("""SELECT id, url, options FROM jobs
+                                  WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?)
+                                  ORDER BY id LIMIT 1""", (now,)).fetchone()
+            if not row: return None
+            conn.execute("""UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1,
+                            progress = 0, updated = ? WHERE id = ?""", (worker, now + lease_seconds, now, row[0]))
+            return row[0], row[1], json.loads(row[2] or "{}")
+        return self.transaction(_lease)
+
+    def heartbeat(self, job_id, worker, progress=None, lease_seconds=LEASE_SECONDS):
+        """Extend the lease; False means the job was taken over and this worker should stop."""
+        def _beat(conn):
+            now = time.time()
+            conn.execute("UPDATE workers SET last_seen = ? WHERE name = ?", (now, worker))
+            cur = conn.execute("""UPDATE jobs SET lease_expires = ?, progress = COALESCE(?, progress), updated = ?
+                                  WHERE id = ? AND worker = ? AND status = 'leased'""",
+                               (now + lease_seconds, progress, now, job_id, worker))
+            return cur.rowcount == 1
+        return self.transaction(_beat)
+
+    def complete(self, job_id, worker, path=None):
+        def _done(conn):
+            now = time.time()
+            row = conn.execute("SELECT url, media_key FROM jobs WHERE id = ? AND worker = ?", (job_id, worker)).fetchone()
+            if not row: return False
+            conn.execute("UPDATE jobs SET status = 'done', progress = 100, result_path = ?, updated = ? WHERE id = ?",
+                         (path, now, job_id))
+            conn.execute("INSERT OR REPLACE INTO archive (media_key, url, path, worker, finished) VALUES (?, ?, ?, ?, ?)",
+                         (row[1], row[0], path, worker, now))
+            conn.execute("UPDATE workers SET jobs_done = jobs_done + 1, last_seen = ? WHERE name = ?", (now, worker))
+            return True
+        return self.transaction(_done)
+
+    def fail(self, job_id, worker, error, retry=True):
+        def _fail(conn):
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND worker = ?", (job_id, worker)).fetchone()
+            if not row: return
+            status = "queued" if retry and row[0] < MAX_ATTEMPTS else "failed"
+            conn.execute("UPDATE jobs SET status = ?, error = ?, worker = NULL, lease_expires = NULL, updated = ? WHERE id = ?",
+                         (status, str(error)[:500], time.time(), job_id))
+        self.transaction(_fail)
+
+    # --- Monitoring ---
+
+    def stats(self, active_within=LEASE_SECONDS):
+        with closing(self.connect()) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            running = conn.execute("SELECT worker, url, progress FROM jobs WHERE status = 'leased' AND lease_expires >= ?",
+                                   (time.time(),)).fetchall()
+            workers = conn.execute("SELECT COUNT(*) FROM workers WHERE last_seen >= ?", (time.time() - active_within,)).fetchone()[0]
+        return {"counts": counts, "running": running, "workers": workers}
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def system_busy(max_load=0.75):
+    """True when the 1-minute load average per core is above `max_load` (never on Windows)."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1) > max_load
+    except (AttributeError, OSError):
+        return False
+
+
+class Speculator:
+    """Analyzes copied links in the background before anyone asks for them.
+
+    `work(url)` runs on a single low-priority worker. Its result waits under the link's
+    key until `take` claims it, and is handed to `discard` if nobody claims it within `ttl`.
+    The total time spent working in the last `window` seconds is capped at
+    `budget_seconds`. No new work starts while `busy()` is true or the machine is loaded.
+    """
+
+    def __init__(self, work, discard=None, busy=lambda: False, ttl=600, budget_seconds=120, window=3600):
+        self.work = work
+        self.discard = discard
+        self.busy = busy
+        self.ttl = ttl
+        self.budget_seconds = budget_seconds
+        self.window = window
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculate")
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> (future, offered_at)
+        self.spent = deque()  # (finished_at, seconds)
+        self.stats = {"started": 0, "used": 0, "wasted": 0, "skipped": 0}
+
+    def affordable(self):
+        cutoff = time.monotonic() - self.window
+        while self.spent and self.spent[0][0] < cutoff: self.spent.popleft()
+        return sum(s for _, s in self.spent) < self.budget_seconds and not self.busy() and not system_busy()
+
+    def offer(self, key, url):
+        """Start speculative work for `url` unless it is already known or over budget."""
+        with self.lock:
+            self.prune_locked()
+            if key in self.entries: return False
+            if not self.affordable():
+                self.stats["skipped"] += 1
+                return False
+            self.entries[key] = (self.executor.submit(self._run, url), time.monotonic())
+            self.stats["started"] += 1
+            return True
+
+    def _run(self, url):
+        started = time.monotonic()
+        try:
+            return self.work(url)
+        finally:
+            with self.lock:
+                self.spent.append((time.monotonic(), time.monotonic() - started))
+
+    def has(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            return bool(entry and entry[0].done() and not entry[0].exception())
+
+    def take(self, key):
+        """The pending result's future for `key` (the caller owns it now), or None."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry: self.stats["used"] += 1
+        return entry[0] if entry else None
+
+    def prune(self):
+        with self.lock:
+            self.prune_locked()
+
+    def prune_locked(self):
+        now = time.monotonic()
+        for key, (future, offered) in list(self.entries.items()):
+            if now - offered < self.ttl or not future.done(): continue
+            del self.entries[key]
+            self.stats["wasted"] += 1
+            if self.discard and not future.exception(): self.discard(future.result())
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
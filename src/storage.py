@@ -0,0 +1,160 @@
+import hashlib
+import os
+import shutil
+import socket
+import sys
+import threading
+
+STAGING_DIR = ".ytd-staging"
+# Save dirs may be on a volume shared by several machines; each only sweeps its own leftovers
+HOST_TAG = hashlib.sha1(socket.gethostname().encode("utf-8")).hexdigest()[:8]
+
+
+def staging_dir(save_dir, job):
+    """Per-job temp dir next to the destination, so finalizing is a same-filesystem rename."""
+    return os.path.join(save_dir, STAGING_DIR, f"job-{os.getpid()}.{HOST_TAG}-{job}")
+
+
+def make_staging_dir(save_dir, job):
+    path = staging_dir(save_dir, job)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def pid_alive(pid):
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle: return ctypes.GetLastError() == 5  # access denied: it exists
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def sweep_staging(save_dir):
+    """Remove staging dirs this machine left behind in `save_dir` when a run crashed or was killed."""
+    root = os.path.join(save_dir, STAGING_DIR)
+    try: names = os.listdir(root)
+    except OSError: return 0
+    removed = 0
+    for name in names:
+        owner = name.split("-")[1] if name.startswith("job-") and name.count("-") >= 2 else ""
+        pid, _, host = owner.partition(".")  # no host tag: made before tags existed, so on this machine
+        if not pid.isdigit() or host not in ("", HOST_TAG) or pid_alive(int(pid)): continue
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        removed += 1
+    if removed:
+        try: os.rmdir(root)
+        except OSError: pass
+    return removed
+
+
+def staged_path(staging, final_path):
+    return os.path.join(staging, os.path.basename(final_path))
+
+
+def finalize(staging, final_paths):
+    """Atomically move finished files into place; returns the paths that exist afterwards."""
+    done = []
+    for final in final_paths:
+        staged = staged_path(staging, final)
+        if os.path.isfile(staged):
+            os.replace(staged, final)
+        if os.path.isfile(final): done.append(final)
+    discard(staging)
+    return done
+
+
+def finalize_all(staging, dest_dir):
+    """Move everything a job produced into `dest_dir` (for output names only yt-dlp knows)."""
+    done = []
+    for name in sorted(os.listdir(staging)):
+        src = os.path.join(staging, name)
+        if not os.path.isfile(src) or name.endswith((".part", ".ytdl")): continue
+        final = os.path.join(dest_dir, name)
+        os.replace(src, final)
+        done.append(final)
+    discard(staging)
+    return done
+
+
+def discard(staging):
+    shutil.rmtree(staging, ignore_errors=True)
+    parent = os.path.dirname(staging)
+    try: os.rmdir(parent)  # only succeeds once no other job is staging here
+    except OSError: pass
+
+
+def discard_partials(staging):
+    """Remove unfinished downloads, so a different format starts fresh instead of resuming them."""
+    for name in os.listdir(staging):
+        if name.endswith((".part", ".ytdl")) or ".part-Frag" in name:
+            try: os.remove(os.path.join(staging, name))
+            except OSError: pass
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try: total += os.path.getsize(os.path.join(root, name))
+            except OSError: pass
+    return total
+
+
+class DiskAdmission:
+    """Admits a job only when free space covers it plus everything already in flight.
+
+    In-flight jobs count for what they have not written yet (estimate minus
+    the size of their staging dir), since written bytes already show up in
+    the free-space figure. Jobs of unknown size reserve `unknown_bytes`.
+    Stale staging dirs are swept from each save dir the first time it is seen.
+    """
+
+    def __init__(self, margin_bytes=512 * 1024 * 1024, margin_ratio=0.02, unknown_bytes=1024 ** 3):
+        self.margin_bytes = margin_bytes
+        self.margin_ratio = margin_ratio
+        self.unknown_bytes = unknown_bytes
+        self.swept = set()
+        self.cond = threading.Condition()
+        self.jobs = {}  # job -> (device, estimate, staging)
+
+    def outstanding(self, device):
+        return sum(max(0, est - dir_size(staging)) for dev, est, staging in self.jobs.values() if dev == device)
+
+    def fits(self, directory, estimate):
+        usage = shutil.disk_usage(directory)
+        device = os.stat(directory).st_dev
+        margin = max(self.margin_bytes, usage.total * self.margin_ratio)
+        return usage.free - self.outstanding(device) - margin >= estimate
+
+    def admit(self, job, directory, estimate, staging, timeout=None, on_wait=None):
+        """Block until the job fits (True) or `timeout` passes (False)."""
+        estimate = estimate or self.unknown_bytes
+        if directory not in self.swept:
+            self.swept.add(directory)
+            sweep_staging(directory)
+        with self.cond:
+            waited = False
+            while not self.fits(directory, estimate):
+                if timeout is not None and waited: return False
+                if on_wait and not waited: on_wait()
+                waited = True
+                # Re-check periodically too: other programs free space without telling us
+                self.cond.wait(timeout if timeout is not None else 30)
+            self.jobs[job] = (os.stat(directory).st_dev, estimate, staging)
+            return True
+
+    def release(self, job):
+        with self.cond:
+            self.jobs.pop(job, None)
+            self.cond.notify_all()
@@ -0,0 +1,150 @@
+import bisect
+import hashlib
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+from io import BytesIO
+
+from PIL import Image
+
+from httpclient import default_client
+from storage import dir_size
+
+SHEET_MAX_BYTES = 2 * 1024 * 1024
+
+
+def storyboard_formats(info):
+    """Sprite-sheet formats in the info dict (YouTube's sb0..sb3), smallest frames first."""
+    boards = [f for f in info.get("formats") or ()
+              if f.get("format_note") == "storyboard" and f.get("fragments") and f.get("rows") and f.get("columns")]
+    return sorted(boards, key=lambda f: f.get("width") or 0)
+
+
+def pick_storyboard(info, width=240):
+    """Smallest storyboard with frames at least `width` wide, else the largest; None if the site has none."""
+    boards = storyboard_formats(info)
+    return next((f for f in boards if (f.get("width") or 0) >= width), boards[-1] if boards else None)
+
+
+class Storyboard:
+    """Frames of one video's storyboard, sliced from sprite sheets that are fetched on first use.
+
+    Sheets are kept on disk under `cache_dir/<video>/` so reopening a video
+    costs no traffic, and decoded sheets go into `memory` (a ThumbnailCache)
+    so scrubbing back and forth within a sheet never touches the disk.
+    """
+
+    def __init__(self, fmt, duration, cache_dir, key, memory=None):
+        self.fmt = fmt
+        self.rows, self.columns = fmt["rows"], fmt["columns"]
+        self.fragments = fmt["fragments"]
+        self.dir = os.path.join(cache_dir, hashlib.sha1(f"{key}|{fmt.get('format_id')}".encode("utf-8")).hexdigest()[:16])
+        self.memory = memory
+        self.fetched = False  # a sheet was downloaded since the cache was last pruned
+        self.starts = []
+        end = 0
+        for fragment in self.fragments:
+            self.starts.append(end)
+            end += fragment.get("duration") or 0
+        self.duration = duration or end
+
+    def locate(self, seconds):
+        """(sheet index, tile index) of the frame shown at `seconds`."""
+        index = min(max(bisect.bisect_right(self.starts, seconds) - 1, 0), len(self.fragments) - 1)
+        tiles = self.rows * self.columns
+        span = self.fragments[index].get("duration") or self.duration / len(self.fragments)
+        per_tile = 1 / self.fmt["fps"] if self.fmt.get("fps") else span / tiles
+        return index, min(tiles - 1, max(0, int((seconds - self.starts[index]) / per_tile)))
+
+    def sheet_url(self, index):
+        fragment = self.fragments[index]
+        return fragment.get("url") or urllib.parse.urljoin(self.fmt.get("fragment_base_url") or "", fragment["path"])
+
+    def sheet(self, index):
+        key = ("storyboard", self.dir, index)
+        image = self.memory.get(key) if self.memory else None
+        if image is not None: return image
+        path = os.path.join(self.dir, f"{index}.img")
+        if not os.path.exists(path):
+            data = default_client().get(self.sheet_url(index), max_bytes=SHEET_MAX_BYTES).body
+            os.makedirs(self.dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self.fetched = True
+        else:
+            os.utime(self.dir)  # keeps recently viewed videos at the back of the prune order
+        with open(path, "rb") as f:
+            image = Image.open(BytesIO(f.read())).convert("RGB")
+        if self.memory: self.memory.put(key, image)
+        return image
+
+    def frame(self, seconds):
+        index, tile = self.locate(seconds)
+        sheet = self.sheet(index)
+        # The last sheet of a video is often short, so the tile size comes from the format, not the sheet
+        w = self.fmt.get("width") or sheet.width // self.columns
+        h = self.fmt.get("height") or sheet.height // self.rows
+        row, column = divmod(tile, self.columns)
+        return sheet.crop((column * w, row * h, column * w + w, row * h + h))
+
+
+def prune_cache(cache_dir, max_bytes=256 * 1024 * 1024):
+    """Delete the least recently viewed videos' sheets until the cache fits `max_bytes`."""
+    try:
+        dirs = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)]
+    except OSError:
+        return
+    dirs = sorted((os.path.getmtime(d), dir_size(d), d) for d in dirs if os.path.isdir(d))
+    total = sum(size for _, size, _ in dirs)
+    for _, size, path in dirs:
+        if total <= max_bytes: break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+class StoryboardScrubber:
+    """Slices frames on one background thread, always for the newest request.
+
+    A scrub bar fires far more often than sheets can be fetched; requests
+    that are superseded while the worker is busy are simply dropped. The disk
+    cache is pruned at start and, while new sheets arrive, every `prune_every` seconds.
+    `on_frame(board, seconds, image, error)` is called from the worker.
+    """
+
+    def __init__(self, on_frame, cache_dir=None, cache_bytes=256 * 1024 * 1024, prune_every=30):
+        self.on_frame = on_frame
+        self.cache_dir = cache_dir
+        self.cache_bytes = cache_bytes
+        self.prune_every = prune_every
+        self.last_prune = 0
+        self.cond = threading.Condition()
+        self.pending = None
+        threading.Thread(target=self._run, name="storyboard", daemon=True).start()
+
+    def request(self, board, seconds):
+        with self.cond:
+            self.pending = (board, seconds)
+            self.cond.notify()
+
+    def _run(self):
+        self.prune()
+        while True:
+            with self.cond:
+                while self.pending is None: self.cond.wait()
+                board, seconds = self.pending
+                self.pending = None
+            try:
+                image, error = board.frame(seconds), None
+            except Exception as e:
+                image, error = None, e
+            self.on_frame(board, seconds, image, error)
+            if board.fetched and time.monotonic() - self.last_prune >= self.prune_every:
+                board.fetched = False
+                self.prune()
+
+    def prune(self):
+        self.last_prune = time.monotonic()
+        if self.cache_dir: prune_cache(self.cache_dir, self.cache_bytes)
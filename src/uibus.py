@@ -0,0 +1,68 @@
+import queue
+from collections import namedtuple
+
+# Event kinds. PROGRESS and STATE are coalesced (latest per key wins),
+# LOG lines are joined into one insert, CALL and DIALOG run in order.
+PROGRESS = "progress"
+LOG = "log"
+STATE = "state"
+CALL = "call"
+DIALOG = "dialog"
+
+COALESCED = (PROGRESS, STATE)
+
+Event = namedtuple("Event", "kind key payload")
+
+
+class UIBus:
+    """Thread-safe hand-off from worker threads to the Tk main loop.
+
+    Workers only ever `post`; the main loop calls `drain` on a timer and applies
+    the merged batch, so no Tk call is made off the main thread.
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+
+    def post(self, kind, key=None, payload=None):
+        self.queue.put(Event(kind, key, payload))
+
+    def progress(self, job, value):
+        self.post(PROGRESS, job, value)
+
+    def log(self, message):
+        self.post(LOG, None, message)
+
+    def state(self, widget, state):
+        self.post(STATE, widget, state)
+
+    def call(self, fn, *args):
+        self.post(CALL, None, (fn, args))
+
+    def dialog(self, kind, title, message):
+        self.post(DIALOG, None, (kind, title, message))
+
+    def drain(self, limit=5000):
+        """Pending events, merged: one LOG event, and the latest PROGRESS/STATE per key."""
+        events = []
+        latest = {}
+        logs = []
+        for _ in range(limit):
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if event.kind == LOG:
+                logs.append(event.payload)
+            elif event.kind in COALESCED:
+                slot = (event.kind, event.key)
+                if slot in latest:
+                    events[latest[slot]] = None
+                latest[slot] = len(events)
+                events.append(event)
+            else:
+                events.append(event)
+        merged = [e for e in events if e is not None]
+        if logs:
+            merged.insert(0, Event(LOG, None, "\n".join(logs)))
+        return merged
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+
+from dedup import hash_file
+from links import media_key
+from storage import make_staging_dir, staged_path, finalize, discard
+from ytdlp import dump_info, low_priority, startupinfo
+
+FORMAT_RECORD = "formats.json"
+# Fields of the file as written (for merges yt-dlp reports the video's and the audio's together)
+RECORD_TEMPLATE = "after_move:%(.{format_id,ext,height,width,fps,vcodec,acodec,tbr,abr,dynamic_range})j"
+
+
+def record_args(staging):
+    """yt-dlp options that make it write the final format details into the job's staging dir."""
+    # The file name is itself an output template, so a literal % must be doubled
+    return ["--print-to-file", RECORD_TEMPLATE, os.path.join(staging, FORMAT_RECORD).replace("%", "%%")]
+
+
+def read_record(staging):
+    try:
+        with open(os.path.join(staging, FORMAT_RECORD), "r", encoding="utf-8") as f:
+            lines = [l for l in f.read().splitlines() if l.strip()]
+        return json.loads(lines[-1]) if lines else None
+    except (OSError, ValueError):
+        return None
+
+
+def describe(fmt):
+    """Comparable quality metrics of a format dict or a stored record."""
+    has_video = fmt.get("vcodec") not in (None, "none")
+    has_audio = fmt.get("acodec") not in (None, "none")
+    return {"height": (fmt.get("height") or 0) if has_video else 0, "fps": fmt.get("fps") or 0,
+            "hdr": (fmt.get("dynamic_range") or "SDR") != "SDR", "audio": has_audio,
+            "abr": (fmt.get("abr") or 0) if has_audio else 0}
+
+
+def best_available(info):
+    """(selector, metrics) of the best video+audio the extractor offers now, or None."""
+    formats = [f for f in info.get("formats") or () if f.get("format_id") and not f.get("has_drm")]
+    videos = [f for f in formats if f.get("vcodec") not in (None, "none") and f.get("height")]
+    audios = [f for f in formats if f.get("acodec") not in (None, "none") and f.get("vcodec") == "none"]
+    if not videos: return None
+    video = max(videos, key=lambda f: (f.get("height") or 0, f.get("fps") or 0, f.get("tbr") or 0))
+    audio = max(audios, key=lambda f: f.get("abr") or f.get("tbr") or 0) if audios else None
+    metrics = describe(video)
+    if not audio or (metrics["audio"] and metrics["abr"] >= (audio.get("abr") or 0)):
+        return video["format_id"], metrics
+    metrics.update(audio=True, abr=audio.get("abr") or audio.get("tbr") or 0)
+    return f"{video['format_id']}+{audio['format_id']}", metrics
+
+
+def upgrade_reasons(old, new, height_ratio=1.3, abr_ratio=1.4, fps_ratio=1.5):
+    """Why `new` is worth a re-download over `old`; empty when the gain is below the thresholds."""
+    if new["height"] < old["height"] or (old["audio"] and not new["audio"]): return []
+    reasons = []
+    if new["height"] >= old["height"] * height_ratio:
+        reasons.append(f"{old['height']}p -> {new['height']}p")
+    if new["audio"] and not old["audio"]:
+        reasons.append("audio track now available")
+    elif old["abr"] and new["abr"] >= old["abr"] * abr_ratio:
+        reasons.append(f"audio {old['abr']:.0f}k -> {new['abr']:.0f}k")
+    if old["fps"] and new["fps"] >= old["fps"] * fps_ratio:
+        reasons.append(f"{old['fps']:.0f} -> {new['fps']:.0f} fps")
+    if new["hdr"] and not old["hdr"]:
+        reasons.append("HDR")
+    return reasons
+
+
+class UpgradeScanner:
+    """Re-extracts library items in the background and replaces those with a clearly better format.
+
+    Every downloaded video has a record of the formats it was made from.
+    Items are re-checked at most once per `recheck_days`, one at a time at
+    low CPU priority, and never while the app is downloading. The gain is
+    measured against the best format offered at download time, not the one
+    picked, so a deliberate 720p or deadline pick stays as it is until the
+    site offers more than it did then. A replacement is queued only when
+    that gain passes the thresholds in upgrade_reasons;
+    it is downloaded into a staging dir beside the file and swapped in with
+    a single rename, so the old file stays intact until the new one is done.
+    """
+
+    def __init__(self, index, yt_dlp_path, ffmpeg_dir, log=print, busy=lambda: False,
+                 recheck_days=7, pause=30, admission=None):
+        self.index = index
+        self.yt_dlp_path = yt_dlp_path
+        self.ffmpeg_dir = ffmpeg_dir
+        self.log = log
+        self.busy = busy
+        self.recheck_seconds = recheck_days * 86400
+        self.pause = pause
+        self.admission = admission
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.process = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive(): return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="upgrade-scanner", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.process:
+            try: self.process.kill()
+            except OSError: pass
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            if self.busy():
+                self.stop_event.wait(60)
+                continue
+            try:
+                pending = self.index.pending_upgrades(1)
+                if pending:
+                    self.replace(*pending[0])
+                else:
+                    due = self.index.due_for_check(time.time() - self.recheck_seconds, 1)
+                    if not due:
+                        self.stop_event.wait(3600)
+                        continue
+                    self.check(*due[0])
+            except Exception as e:
+                self.log(f"Upgrade scanner: {e}")
+            self.stop_event.wait(self.pause)
+
+    def check(self, path, url, record):
+        old = record.get("offered")
+        self.index.mark_checked(path)
+        # Audio-only files are not scanned; nor are records that predate the offer, since a pick can't be told apart
+        if not old or not old["height"]: return
+        found = best_available(dump_info(self.yt_dlp_path, url, timeout=180, background=True))
+        if not found: return
+        selector, new = found
+        reasons = upgrade_reasons(old, new)
+        if reasons:
+            self.index.queue_upgrade(path, url, selector, "; ".join(reasons))
+            self.log(f"Upgrade available for {os.path.basename(path)}: {', '.join(reasons)}")
+
+    def replace(self, path, url, selector, reason, args):
+        if not os.path.exists(path):
+            self.index.finish_upgrade(path, "failed", "file is gone")
+            return
+        job = f"upgrade-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]}"
+        staging = make_staging_dir(os.path.dirname(path), job)
+        ext = os.path.splitext(path)[1].lstrip(".").lower()
+        command = [self.yt_dlp_path, "-f", selector]
+        if ext in ("mp4", "mkv", "webm", "mov"): command.extend(["--merge-output-format", ext])
+        command.extend(list(args) + ["--ffmpeg-location", self.ffmpeg_dir,
+                                     "-o", staged_path(staging, path).replace("%", "%%")] + record_args(staging))
+        command.extend([url, "--no-playlist", "--js-runtimes", "node", "--quiet", "--no-warnings"])
+        self.log(f"Upgrading {os.path.basename(path)} ({reason})...")
+        admitted = False
+        try:
+            if self.admission:
+                # The old file stays until the swap, so room for a second copy is needed
+                admitted = self.admission.admit(job, os.path.dirname(path), os.path.getsize(path) * 2, staging, timeout=0)
+                if not admitted: raise OSError("not enough disk space")
+            command, kwargs = low_priority(command)
+            self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                            errors="replace", startupinfo=startupinfo(), **kwargs)
+            error = self.process.communicate()[1]
+            if self.stop_event.is_set(): return
+            staged = staged_path(staging, path)
+            if self.process.returncode != 0 or not os.path.isfile(staged) or not os.path.getsize(staged):
+                raise Exception(error.strip()[-200:] or "download failed")
+            record = read_record(staging) or {}
+            if record: record["offered"] = describe(record)  # the best there was
+            finalize(staging, [path])
+            self.index.add(path, hash_file(path), url, media_key=media_key(url))
+            self.index.record_formats(path, url, record, args)
+            self.index.finish_upgrade(path, "done")
+            self.log(f"Upgraded {os.path.basename(path)}")
+        except Exception as e:
+            self.index.finish_upgrade(path, "failed", str(e)[:500])
+            self.log(f"Upgrade of {os.path.basename(path)} failed: {e}")
+        finally:
+            self.process = None
+            discard(staging)
+            if admitted: self.admission.release(job)
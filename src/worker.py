@@ -0,0 +1,146 @@
+"""Headless download node for a shared queue.
+
+    python src/worker.py --queue /mnt/share/downloads.db --out /mnt/share/videos
+
+Run one per machine; they all lease from the same queue file. Each job goes
+through the same Engine as downloads started from the GUI.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import re
+import threading
+
+from dedup import ContentIndex
+from engine import Engine, PROGRESS, DONE, FAILED
+from failures import classify, FATAL, MERGE_ERROR
+from sharedqueue import SharedQueue, default_worker_name, LEASE_SECONDS
+
+
+def output_path(out_dir, info, mode):
+    name = re.sub(r'[\\/:*?"<>|%]', "_", f"{info.get('title', 'video')} [{info.get('id', '')}]")
+    return os.path.join(out_dir, f"{name}.{mode}")
+
+
+class QueueWorker:
+    """Leases jobs from a SharedQueue and downloads them with an Engine.
+
+    Pass the app's engine and its loop to share its limits, disk admission and
+    library index; otherwise the worker runs its own engine on a private loop.
+    """
+
+    def __init__(self, queue, out_dir, name=None, log=print, yt_dlp_path=None, ffmpeg_dir=None, engine=None, loop=None):
+        self.queue = queue
+        self.out_dir = out_dir
+        self.name = name or default_worker_name()
+        self.log = log
+        self.engine = engine or Engine(yt_dlp_path, ffmpeg_dir, max_downloads=1)
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="worker-engine", daemon=True).start()
+        self.loop = loop
+        self.stop_event = threading.Event()
+
+    def run_forever(self, poll=10):
+        self.log(f"[{self.name}] Draining {self.queue.path}")
+        while not self.stop_event.is_set():
+            try:
+                leased = self.queue.lease(self.name)
+            except Exception as e:
+                self.log(f"[{self.name}] Queue error: {e}")
+                leased = None
+            if leased:
+                self.run_job(*leased)
+            else:
+                self.stop_event.wait(poll)
+
+    def stop(self):
+        self.stop_event.set()
+
+    async def download(self, url, options, state):
+        """(path, stat) of each file the engine finished for one leased job; raises when it gives up."""
+        info = await self.engine.analyze(url)
+        mode = options.get("mode", "mp4")
+        selector = options.get("format")
+        job = self.engine.video_job(url, output_path(self.out_dir, info, mode), mode, info=info,
+                                    **({"audio_id": selector} if mode == "mp3" else {"video_id": selector}))
+        state["job"] = job
+        async for event in self.engine.download(job):
+            if event.kind == PROGRESS: state["progress"] = event.value
+            # Remembered so a lost lease removes exactly the files this node wrote
+            elif event.kind == DONE: return [(path, os.stat(path)) for path in event.value]
+            elif event.kind == FAILED: raise Exception(event.value)
+
+    def run_job(self, job_id, url, options):
+        self.log(f"[{self.name}] Job {job_id}: {url}")
+        state = {"progress": 0.0, "job": None}
+        future = asyncio.run_coroutine_threadsafe(self.download(url, options, state), self.loop)
+        beat_stop = threading.Event()
+
+        def _heartbeat():
+            while not beat_stop.wait(LEASE_SECONDS / 4):
+                try:
+                    if not self.queue.heartbeat(job_id, self.name, state["progress"]):
+                        # Someone else owns the job now (our lease lapsed); stop competing for it
+                        future.cancel()
+                        return
+                except Exception as e:
+                    self.log(f"[{self.name}] Heartbeat error: {e}")
+
+        threading.Thread(target=_heartbeat, daemon=True).start()
+        try:
+            written = future.result()
+        except concurrent.futures.CancelledError:
+            self.log(f"[{self.name}] Job {job_id} was taken over by another node")
+            return
+        except Exception as e:
+            category = (state["job"] and state["job"].failure) or classify([f"ERROR: {e}"])
+            self.queue.fail(job_id, self.name, e, retry=category not in (FATAL, MERGE_ERROR))
+            self.log(f"[{self.name}] Job {job_id} failed: {e}")
+            return
+        finally:
+            beat_stop.set()
+        if not self.queue.complete(job_id, self.name, written[0][0] if written else None):
+            self.log(f"[{self.name}] Job {job_id} finished after its lease was lost; discarding the output")
+            self.discard(written)
+            return
+        self.log(f"[{self.name}] Job {job_id} done")
+
+    def discard(self, written):
+        for path, stat in written:
+            try:
+                # Another node may already have put its own copy at the same path
+                if not os.path.samestat(os.stat(path), stat): continue
+                os.remove(path)
+            except OSError:
+                continue
+            if self.engine.content_index: self.engine.content_index.forget(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lease and download jobs from a shared queue file.")
+    parser.add_argument("--queue", required=True, help="SQLite queue file on a shared volume")
+    parser.add_argument("--out", required=True, help="Directory finished files are moved into")
+    parser.add_argument("--name", help="Worker name (default: host-pid)")
+    parser.add_argument("--index", help="Library index database for deduplication (default: none)")
+    parser.add_argument("--enqueue", nargs="*", metavar="URL", help="Add URLs to the queue and exit")
+    parser.add_argument("--mode", default="mp4", choices=["mp4", "mkv", "mp3"])
+    args = parser.parse_args()
+
+    queue = SharedQueue(args.queue)
+    if args.enqueue is not None:
+        print(f"Queued {queue.enqueue(args.enqueue, {'mode': args.mode})} new job(s).")
+        return
+    engine = Engine(max_downloads=1, content_index=ContentIndex(args.index) if args.index else None)
+    worker = QueueWorker(queue, args.out, name=args.name, engine=engine)
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
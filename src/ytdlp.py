@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+
+
+def tool_paths():
+    """(yt-dlp executable, ffmpeg dir) from the bundled bin/ folder."""
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    exe_ext = ".exe" if sys.platform == "win32" else ""
+    return os.path.join(base_path, "bin", f"yt-dlp{exe_ext}"), os.path.join(base_path, "bin")
+
+
+def with_format(command, selector):
+    command = list(command)
+    if "-f" in command: command[command.index("-f") + 1] = selector
+    else: command[1:1] = ["-f", selector]
+    return command
+
+
+def startupinfo():
+    """Keeps console windows from flashing up on Windows."""
+    if sys.platform != "win32": return None
+    si = subprocess.STARTUPINFO()
+    si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    si.wShowWindow = subprocess.SW_HIDE
+    return si
+
+
+def low_priority(command):
+    """(command, Popen kwargs) that run a child below normal CPU priority (background work)."""
+    if sys.platform == "win32": return list(command), {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    # `nice` rather than preexec_fn, which is unsafe in a threaded process
+    nice = shutil.which("nice")
+    return ([nice, "-n", "10"] if nice else []) + list(command), {}
+
+
+def dump_info(yt_dlp_path, url, timeout=None, background=False):
+    """Info dict of the first item at `url` (yt-dlp --dump-json)."""
+    command, kwargs = [yt_dlp_path, "--dump-json", url, "--js-runtimes", "node", "--playlist-items", "1"], {}
+    if background: command, kwargs = low_priority(command)
+    process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', check=False,
+                             startupinfo=startupinfo(), errors='replace', timeout=timeout, **kwargs)
+    if not process.stdout.strip():
+        error = next((l for l in process.stderr.splitlines() if "ERROR" in l), "")
+        raise Exception(error or "No data received.")
+    return json.loads(process.stdout.strip().split('\n')[0])
+
+
+class InfoCache:
+    """LRU of info dicts by media key, bounded by their approximate JSON size.
+
+    A YouTube info dict with every format listed runs to hundreds of KB, so
+    an all-day session must not keep every one it has ever analysed.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()  # key -> (info, cost)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None: return None
+            self.items.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, info):
+        cost = len(json.dumps(info, separators=(",", ":")))
+        with self.lock:
+            if key in self.items: self.size -= self.items.pop(key)[1]
+            self.items[key] = (info, cost)
+            self.size += cost
+            self.trim_locked(self.max_bytes)
+
+    def trim(self, max_bytes):
+        with self.lock:
+            self.trim_locked(max_bytes)
+
+    def trim_locked(self, max_bytes):
+        # The newest entry always stays: it is usually the one on screen
+        while self.size > max_bytes and len(self.items) > 1:
+            _, (_, cost) = self.items.popitem(last=False)
+            self.size -= cost
+
+    def __len__(self):
+        return len(self.items)
+
+
+def is_playlist_url(url):
+    return "list=" in url or "/playlist" in url or url.rstrip("/").endswith(("/videos", "/shorts", "/streams"))
+
+
+def flat_playlist(yt_dlp_path, url, timeout=300):
+    """Entries of a playlist/channel without extracting each video: [{url, title, thumbnail}]."""
+    command = [yt_dlp_path, "--flat-playlist", "--dump-single-json", url, "--js-runtimes", "node"]
+    process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', check=False,
+                             startupinfo=startupinfo(), errors='replace', timeout=timeout)
+    if not process.stdout.strip():
+        raise Exception("No data received.")
+    data = json.loads(process.stdout)
+    entries = []
+    for e in data.get("entries") or []:
+        entry_url = e.get("url") or e.get("webpage_url")
+        if not entry_url: continue
+        if not entry_url.startswith("http") and e.get("ie_key") == "Youtube":
+            entry_url = f"https://www.youtube.com/watch?v={entry_url}"
+        thumbs = e.get("thumbnails") or []
+        entries.append({"url": entry_url, "title": e.get("title") or entry_url,
+                        "thumbnail": e.get("thumbnail") or (thumbs[-1].get("url") if thumbs else None)})
+    return entries
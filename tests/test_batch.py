@@ -0,0 +1,51 @@
+import threading
+import time
+
+from batch import BatchAnalyzer
+
+
+def test_per_site_cap_leaves_workers_for_other_sites():
+    release = threading.Event()
+    lock = threading.Lock()
+    running, peak, results = {}, {}, []
+
+    def analyze(url):
+        site = url.split("/")[2]
+        with lock:
+            running[site] = running.get(site, 0) + 1
+            peak[site] = max(peak.get(site, 0), running[site])
+        if site == "slow.co.uk": release.wait(5)
+        with lock:
+            running[site] -= 1
+        return {"url": url}
+
+    done = threading.Event()
+
+    def on_result(url, info, error):
+        results.append((url, error))
+        if len(results) == 8: done.set()
+
+    analyzer = BatchAnalyzer(analyze, on_result, max_workers=4, per_site=2)
+    analyzer.submit([f"https://slow.co.uk/{i}" for i in range(4)] + [f"https://fast.co.uk/{i}" for i in range(4)])
+    deadline = time.time() + 5
+    while len(results) < 4 and time.time() < deadline: time.sleep(0.01)
+    # Every fast.co.uk link finished while slow.co.uk held its two slots
+    assert sorted(url for url, _ in results) == [f"https://fast.co.uk/{i}" for i in range(4)]
+    release.set()
+    assert done.wait(5)
+    assert peak["slow.co.uk"] == 2 and peak["fast.co.uk"] <= 2
+    analyzer.shutdown()
+
+
+def test_errors_are_reported():
+    got = []
+    finished = threading.Event()
+
+    def analyze(url):
+        raise ValueError("nope")
+
+    analyzer = BatchAnalyzer(analyze, lambda url, info, error: (got.append((url, info, error)), finished.set()))
+    analyzer.submit(["https://a.com/1"])
+    assert finished.wait(5)
+    assert got[0][0] == "https://a.com/1" and got[0][1] is None and isinstance(got[0][2], ValueError)
+    analyzer.shutdown()
@@ -0,0 +1,41 @@
+import pytest
+
+from clips import parse_timestamp, parse_ranges, format_timestamp, section_args, clip_output_paths, clip_output_template
+
+
+@pytest.mark.parametrize("text, seconds", [("90", 90), ("1:30", 90), ("01:02:03.5", 3723.5), (" 0:05 ", 5)])
+def test_parse_timestamp(text, seconds):
+    assert parse_timestamp(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "1:2:3:4", "1:x", "-5", "1.2.3"])
+def test_parse_timestamp_rejects(text):
+    with pytest.raises(ValueError):
+        parse_timestamp(text)
+
+
+def test_parse_ranges():
+    assert parse_ranges("0:30-1:00, 1:02:00-1:02:30") == [(30.0, 60.0), (3720.0, 3750.0)]
+    assert parse_ranges("10-20;\n30-40,") == [(10.0, 20.0), (30.0, 40.0)]
+    assert parse_ranges("  ") == []
+
+
+@pytest.mark.parametrize("text", ["0:30", "1:00-0:30", "5-5", "a-b"])
+def test_parse_ranges_rejects(text):
+    with pytest.raises(ValueError):
+        parse_ranges(text)
+
+
+def test_format_timestamp():
+    assert format_timestamp(3723.9) == "01:02:03"
+
+
+def test_section_args_use_fixed_precision():
+    assert section_args([(12345.25, 1234567)], accurate=True) == [
+        "--download-sections", "*12345.250-1234567.000", "--force-keyframes-at-cuts"]
+
+
+def test_clip_outputs():
+    assert clip_output_paths("/v/A.mp4", 1) == ["/v/A.mp4"]
+    assert clip_output_paths("/v/A.mp4", 2) == ["/v/A.clip1.mp4", "/v/A.clip2.mp4"]
+    assert clip_output_template("/v/100%.mp4", 2) == "/v/100%%.clip%(section_number)s.mp4"
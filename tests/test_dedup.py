@@ -0,0 +1,89 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+import dedup
+from dedup import ContentIndex, GrowingFileHasher, hash_file
+
+
+def sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def wait_until_read(hasher, size, timeout=5):
+    deadline = time.time() + timeout
+    while hasher._pos < size and time.time() < deadline: time.sleep(0.01)
+
+
+def test_streamed_part_hash_is_used(tmp_path, monkeypatch):
+    final = str(tmp_path / "video.mp4")
+    hasher = GrowingFileHasher(final, poll_interval=0.01).start()
+    with open(final + ".part", "wb") as f:
+        f.write(b"a" * 1000)
+        f.flush()
+        wait_until_read(hasher, 1000)
+        f.write(b"b" * 500)
+    os.replace(final + ".part", final)
+    # Rehashing would mean the streamed digest was thrown away
+    monkeypatch.setattr(dedup, "hash_file", lambda path: pytest.fail("file was hashed again"))
+    assert hasher.finish() == sha(b"a" * 1000 + b"b" * 500)
+
+
+def test_patched_temp_file_is_hashed_again(tmp_path):
+    final = str(tmp_path / "video.mp4")
+    temp = str(tmp_path / "video.temp.mp4")
+    hasher = GrowingFileHasher(final, poll_interval=0.01).start()
+    with open(temp, "wb") as f:
+        f.write(b"\0" * 8 + b"payload")
+    wait_until_read(hasher, 15)
+    with open(temp, "r+b") as f:
+        f.write(b"mdatsize")  # ffmpeg fixes the header up after writing the body
+    os.replace(temp, final)
+    assert hasher.finish() == sha(b"mdatsize" + b"payload")
+
+
+def test_part_replaced_by_another_file_is_hashed_again(tmp_path):
+    final = str(tmp_path / "video.mp4")
+    hasher = GrowingFileHasher(final, poll_interval=0.01).start()
+    with open(final + ".part", "wb") as f: f.write(b"old")
+    wait_until_read(hasher, 3)
+    with open(final, "wb") as f: f.write(b"merged")
+    os.remove(final + ".part")
+    assert hasher.finish() == sha(b"merged")
+
+
+def test_nothing_written(tmp_path):
+    assert GrowingFileHasher(str(tmp_path / "video.mp4"), poll_interval=0.01).start().finish() is None
+
+
+def test_register_links_identical_files(tmp_path):
+    index = ContentIndex(str(tmp_path / "index.db"))
+    first, second = str(tmp_path / "a.mp4"), str(tmp_path / "b.mp4")
+    for path in (first, second):
+        with open(path, "wb") as f: f.write(b"same bytes")
+    assert index.register(first, hash_file(first), "https://a.com/1", "a:1") == (None, None)
+    existing, method = index.register(second, hash_file(second), "https://b.com/1", "b:1")
+    assert existing == first and method in ("reflink", "hardlink")
+    if method == "hardlink": assert os.path.samefile(first, second)
+    assert index.paths_for_key("b:1") == [second]
+
+
+def test_lookup_forgets_missing_files(tmp_path):
+    index = ContentIndex(str(tmp_path / "index.db"))
+    path = str(tmp_path / "a.mp4")
+    with open(path, "wb") as f: f.write(b"x")
+    index.add(path, "digest")
+    os.remove(path)
+    assert index.lookup("digest") is None
+    assert index.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
+
+
+def test_forget_accepts_relative_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = ContentIndex("index.db")
+    with open("a.mp4", "wb") as f: f.write(b"x")
+    index.add("a.mp4", "digest")
+    index.forget("a.mp4")
+    assert index.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
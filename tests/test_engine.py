@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from engine import Engine, DONE, FAILED
+
+# Stands in for yt-dlp: format "137+140" leaves a .part and is refused with 403;
+# any other format writes the file, resuming a leftover .part like yt-dlp would.
+FAKE_YT_DLP = r'''#!{python}
+import os, sys
+args = sys.argv[1:]
+out = args[args.index("-o") + 1]
+selector = args[args.index("-f") + 1]
+with open(os.environ["CALLS"], "a") as f: f.write(selector + "\n")
+if selector == "137+140":
+    with open(out + ".part", "ab") as f: f.write(b"137-bytes;")
+    print("ERROR: unable to download video data: HTTP Error 403: Forbidden")
+    sys.exit(1)
+data = open(out + ".part", "rb").read() if os.path.exists(out + ".part") else b""
+with open(out, "wb") as f: f.write(data + selector.encode())
+if os.path.exists(out + ".part"): os.remove(out + ".part")
+'''
+
+INFO = {"extractor_key": "Youtube", "formats": [
+    {"format_id": "136", "vcodec": "avc1", "acodec": "none", "height": 720},
+    {"format_id": "137", "vcodec": "avc1", "acodec": "none", "height": 1080},
+    {"format_id": "140", "vcodec": "none", "acodec": "mp4a"}]}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fake yt-dlp is a shebang script")
+def test_forbidden_retries_then_falls_back_without_resuming(tmp_path, monkeypatch):
+    fake = tmp_path / "yt-dlp"
+    fake.write_text(FAKE_YT_DLP.format(python=sys.executable))
+    fake.chmod(0o755)
+    calls = tmp_path / "calls"
+    monkeypatch.setenv("CALLS", str(calls))
+    save_dir = tmp_path / "videos"
+    save_dir.mkdir()
+    engine = Engine(str(fake), str(tmp_path))
+    job = engine.video_job("https://www.youtube.com/watch?v=dQw4w9WgXcQ", str(save_dir / "v.mp4"), "mp4", "137", "140", INFO)
+
+    async def run():
+        return [event async for event in engine.download(job) if event.kind in (DONE, FAILED)]
+
+    [event] = asyncio.run(run())
+    assert event.kind == DONE, event.value
+    # One fresh-URL retry of the refused format, then the next best one
+    assert calls.read_text().split() == ["137+140", "137+140", "136+140"]
+    assert (save_dir / "v.mp4").read_bytes() == b"136+140"
+    assert os.listdir(save_dir) == ["v.mp4"]
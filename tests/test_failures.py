@@ -0,0 +1,79 @@
+import pytest
+
+from failures import (classify, next_action, CircuitBreaker, THROTTLED, FORBIDDEN, FORMAT_UNAVAILABLE,
+                      MERGE_ERROR, NETWORK_RESET, FATAL, UNKNOWN, MAX_ATTEMPTS)
+
+
+@pytest.mark.parametrize("line, category", [
+    ("ERROR: [youtube] abc: Private video. Sign in if you've been granted access", FATAL),
+    ("ERROR: unable to download video data: HTTP Error 429: Too Many Requests", THROTTLED),
+    ("ERROR: [youtube] abc: Sign in to confirm you're not a bot", THROTTLED),
+    ("ERROR: unable to download video data: HTTP Error 403: Forbidden", FORBIDDEN),
+    ("ERROR: [youtube] abc: Requested format is not available", FORMAT_UNAVAILABLE),
+    ("ERROR: Postprocessing: Conversion failed!", MERGE_ERROR),
+    ("ERROR: [Errno 104] Connection reset by peer", NETWORK_RESET),
+    ("ERROR: unable to download video data: HTTP Error 503: Service Unavailable", NETWORK_RESET),
+    ("ERROR: something nobody has seen before", UNKNOWN),
+])
+def test_classify(line, category):
+    assert classify(["[download] 12.0% of 10MiB", line]) == category
+
+
+def test_classify_prefers_error_lines():
+    # A title mentioning rate limits must not make a merge failure look like throttling
+    lines = ["[info] Downloading: How to rate-limit your API", "ERROR: Postprocessing: Conversion failed!"]
+    assert classify(lines) == MERGE_ERROR
+
+
+def test_classify_checks_fatal_first():
+    assert classify(["ERROR: HTTP Error 403: Forbidden", "ERROR: Video unavailable"]) == FATAL
+
+
+def test_fatal_gives_up():
+    assert next_action(FATAL, 0).kind == "give_up"
+
+
+def test_gives_up_after_max_attempts():
+    assert next_action(NETWORK_RESET, MAX_ATTEMPTS - 1).kind == "give_up"
+
+
+def test_format_problems_fall_back():
+    assert next_action(FORMAT_UNAVAILABLE, 0) == ("fallback", 0)
+    assert next_action(MERGE_ERROR, 2) == ("fallback", 0)
+
+
+def test_throttle_backs_off():
+    action = next_action(THROTTLED, 1)
+    assert action.kind == "retry" and 0 <= action.delay <= 40
+
+
+def test_network_reset_retries_at_once_then_backs_off():
+    assert next_action(NETWORK_RESET, 0) == ("retry", 0)
+    assert next_action(NETWORK_RESET, 1) == ("retry", 0)
+    assert next_action(NETWORK_RESET, 2).kind == "retry"
+
+
+def test_forbidden_retries_once_then_falls_back():
+    assert next_action(FORBIDDEN, 0, 0) == ("retry", 0)
+    assert next_action(FORBIDDEN, 1, 1) == ("fallback", 0)
+
+
+def test_forbidden_retry_survives_earlier_failures():
+    # Two throttles first: the first 403 still gets its fresh-URL retry
+    assert next_action(FORBIDDEN, 2, 0) == ("retry", 0)
+
+
+def test_unknown_retries_once():
+    assert next_action(UNKNOWN, 0).kind == "retry"
+    assert next_action(UNKNOWN, 1).kind == "give_up"
+
+
+def test_circuit_breaker_opens_and_closes():
+    breaker = CircuitBreaker(threshold=2, window=60, cooldown=100)
+    breaker.record_failure("a.com")
+    assert breaker.wait_time("a.com") == 0
+    breaker.record_failure("a.com")
+    assert 99 < breaker.wait_time("a.com") <= 100
+    assert breaker.wait_time("b.com") == 0
+    breaker.record_success("a.com")
+    assert breaker.wait_time("a.com") == 0
@@ -0,0 +1,91 @@
+import pytest
+
+from links import canonicalize, extract_links, media_key, is_short_link, is_media_link, site_of
+
+
+def test_canonicalize_drops_tracking_params():
+    url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ&si=abc&utm_source=x&t=42"
+    assert canonicalize(url) == "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42"
+
+
+def test_canonicalize_lowercases_scheme_and_host_only():
+    assert canonicalize("HTTPS://WWW.Example.COM/Path/A?b=C") == "https://www.example.com/Path/A?b=C"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://threads.com/@a/post/X1", "https://threads.net/@a/post/X1"),
+    ("https://www.threads.com/@a/post/X1", "https://www.threads.net/@a/post/X1"),
+    ("https://www.fancythreads.com/shop", "https://www.fancythreads.com/shop"),
+    ("https://threads.com.evil.org/x", "https://threads.com.evil.org/x"),
+])
+def test_canonicalize_threads_domain(url, expected):
+    assert canonicalize(url) == expected
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtube.com/watch?v=dQw4w9WgXcQ&feature=share&t=10",
+    "https://m.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RD",
+    "https://youtu.be/dQw4w9WgXcQ?si=xyz",
+    "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube.com/live/dQw4w9WgXcQ?feature=shared",
+])
+def test_media_key_youtube_variants(url):
+    assert media_key(url) == "youtube:dQw4w9WgXcQ"
+
+
+def test_media_key_instagram_post_and_reel_share_a_key():
+    assert media_key("https://www.instagram.com/p/Cabc123/?igsh=zz") == "instagram:Cabc123"
+    assert media_key("https://instagram.com/reel/Cabc123/") == "instagram:Cabc123"
+
+
+def test_media_key_threads_net_and_com():
+    assert media_key("https://www.threads.com/@a/post/X1") == media_key("https://www.threads.net/@a/post/X1") == "threads:X1"
+
+
+def test_media_key_other_sites():
+    assert media_key("https://www.facebook.com/watch/?v=123") == "facebook:123"
+    assert media_key("https://www.tiktok.com/@u/video/456?lang=en") == "tiktok:456"
+
+
+def test_media_key_unknown_site_is_canonical_url():
+    assert media_key("https://www.fancythreads.com/v/1?utm_source=x") == "https://www.fancythreads.com/v/1"
+
+
+def test_short_links():
+    assert is_short_link("https://youtu.be/x") is False
+    assert is_short_link("https://bit.ly/abc")
+    assert is_short_link("https://www.facebook.com/share/v/1AbC/")
+    assert not is_short_link("https://notfacebook.com/share/v/1AbC/")
+
+
+def test_is_media_link():
+    assert is_media_link("https://youtu.be/dQw4w9WgXcQ")
+    assert is_media_link("https://fb.watch/abc/")
+    assert not is_media_link("https://www.youtube.com/")
+
+
+@pytest.mark.parametrize("url, site", [
+    ("https://m.youtube.com/watch?v=x", "youtube.com"),
+    ("https://youtu.be/x", "youtube.com"),
+    ("https://www.bbc.co.uk/iplayer/x", "bbc.co.uk"),
+    ("https://www.itv.co.uk/watch/x", "itv.co.uk"),
+    ("https://www.abc.net.au/x", "abc.net.au"),
+    ("https://video.example.com:8443/x", "example.com"),
+])
+def test_site_of(url, site):
+    assert site_of(url) == site
+
+
+def test_extract_links_dedups_by_media_key():
+    text = """Watch https://youtu.be/dQw4w9WgXcQ, and again https://www.youtube.com/watch?v=dQw4w9WgXcQ&si=1.
+    <a href="https://www.instagram.com/reel/Cabc/">reel</a> https://www.instagram.com/p/Cabc/"""
+    # href targets come first, then bare links
+    assert extract_links(text) == ["https://www.instagram.com/reel/Cabc/", "https://youtu.be/dQw4w9WgXcQ"]
+
+
+def test_extract_links_unescapes_html():
+    assert extract_links('<a href="https://example.com/v?id=1&amp;utm_source=x">') == ["https://example.com/v?id=1"]
@@ -0,0 +1,107 @@
+import sqlite3
+import time
+
+import pytest
+
+from sharedqueue import SharedQueue, MAX_ATTEMPTS
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SharedQueue(str(tmp_path / "queue.db"), timeout=1)
+
+
+def expire(queue, job_id):
+    conn = sqlite3.connect(queue.path)
+    conn.execute("UPDATE jobs SET lease_expires = ? WHERE id = ?", (time.time() - 1, job_id))
+    conn.commit()
+    conn.close()
+
+
+def status(queue, job_id):
+    conn = sqlite3.connect(queue.path)
+    row = conn.execute("SELECT status, worker, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_enqueue_skips_pending_and_archived(queue):
+    assert queue.enqueue(["https://youtu.be/dQw4w9WgXcQ", "https://www.youtube.com/watch?v=dQw4w9WgXcQ"]) == 1
+    job_id, url, options = queue.lease("a")
+    assert queue.complete(job_id, "a", "/v/x.mp4")
+    assert queue.enqueue(["https://youtu.be/dQw4w9WgXcQ?si=1"]) == 0
+
+
+def test_lease_is_exclusive_and_in_order(queue):
+    queue.enqueue(["https://a.com/1", "https://a.com/2"], {"mode": "mp3"})
+    assert queue.lease("a") == (1, "https://a.com/1", {"mode": "mp3"})
+    assert queue.lease("b")[0] == 2
+    assert queue.lease("c") is None
+
+
+def test_heartbeat_extends_only_own_lease(queue):
+    queue.enqueue(["https://a.com/1"])
+    job_id = queue.lease("a")[0]
+    assert queue.heartbeat(job_id, "a", 50.0)
+    assert not queue.heartbeat(job_id, "b")
+
+
+def test_expired_lease_is_taken_over(queue):
+    queue.enqueue(["https://a.com/1"])
+    job_id = queue.lease("a")[0]
+    assert queue.lease("b") is None
+    expire(queue, job_id)
+    assert queue.lease("b")[0] == job_id
+    # The old owner learns it lost the job and cannot complete it
+    assert not queue.heartbeat(job_id, "a")
+    assert not queue.complete(job_id, "a", "/v/x.mp4")
+    assert queue.complete(job_id, "b", "/v/x.mp4")
+    assert status(queue, job_id)[:2] == ("done", "b")
+
+
+def test_job_that_keeps_expiring_is_parked(queue):
+    queue.enqueue(["https://a.com/1"])
+    for i in range(MAX_ATTEMPTS):
+        job_id = queue.lease(f"w{i}")[0]
+        expire(queue, job_id)
+    assert queue.lease("last") is None
+    assert status(queue, job_id)[0] == "failed"
+
+
+def test_fail_requeues_until_attempts_run_out(queue):
+    queue.enqueue(["https://a.com/1"])
+    job_id = queue.lease("a")[0]
+    queue.fail(job_id, "a", "network_reset")
+    assert status(queue, job_id) == ("queued", None, 1)
+    job_id = queue.lease("a")[0]
+    queue.fail(job_id, "a", "fatal", retry=False)
+    assert status(queue, job_id)[0] == "failed"
+
+
+def test_fail_from_a_lost_lease_is_ignored(queue):
+    queue.enqueue(["https://a.com/1"])
+    job_id = queue.lease("a")[0]
+    expire(queue, job_id)
+    queue.lease("b")
+    queue.fail(job_id, "a", "boom")
+    assert status(queue, job_id)[:2] == ("leased", "b")
+
+
+def test_stats(queue):
+    queue.enqueue(["https://a.com/1", "https://a.com/2"])
+    queue.lease("a")
+    stats = queue.stats()
+    assert stats["counts"] == {"leased": 1, "queued": 1}
+    assert stats["workers"] == 1 and stats["running"][0][:2] == ("a", "https://a.com/1")
+
+
+def test_locked_database_reports_the_lock(queue):
+    impatient = SharedQueue(queue.path, timeout=0.1)
+    blocker = sqlite3.connect(queue.path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            impatient.lease("a")
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
@@ -0,0 +1,104 @@
+import os
+from collections import namedtuple
+
+import pytest
+
+import storage
+from storage import DiskAdmission, staging_dir, staged_path, finalize, discard, discard_partials, sweep_staging
+
+Usage = namedtuple("Usage", "total used free")
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def free_space(monkeypatch):
+    """Pretend the disk has `space["free"]` bytes free, whatever is really there."""
+    space = {"free": 1000 * MB}
+    monkeypatch.setattr(storage.shutil, "disk_usage", lambda path: Usage(10000 * MB, 0, space["free"]))
+    return space
+
+
+def admission(**kwargs):
+    return DiskAdmission(margin_bytes=100 * MB, margin_ratio=0, **kwargs)
+
+
+def test_admits_while_space_covers_jobs_in_flight(tmp_path, free_space):
+    disk = admission()
+    assert disk.admit(1, str(tmp_path), 500 * MB, str(tmp_path / "s1"), timeout=0)
+    assert not disk.admit(2, str(tmp_path), 500 * MB, str(tmp_path / "s2"), timeout=0)
+    disk.release(1)
+    assert disk.admit(2, str(tmp_path), 500 * MB, str(tmp_path / "s2"), timeout=0)
+
+
+def test_written_bytes_stop_counting_as_outstanding(tmp_path, free_space):
+    disk = admission()
+    staging = tmp_path / "s1"
+    staging.mkdir()
+    assert disk.admit(1, str(tmp_path), 500 * MB, str(staging), timeout=0)
+    (staging / "video.part").write_bytes(b"x" * MB)
+    assert disk.outstanding(os.stat(tmp_path).st_dev) == 499 * MB
+
+
+def test_unknown_size_reserves_default(tmp_path, free_space):
+    disk = admission(unknown_bytes=600 * MB)
+    assert disk.admit(1, str(tmp_path), None, str(tmp_path / "s1"), timeout=0)
+    assert disk.jobs[1][1] == 600 * MB
+    assert not disk.admit(2, str(tmp_path), 400 * MB, str(tmp_path / "s2"), timeout=0)
+
+
+def test_admit_calls_on_wait_once(tmp_path, free_space):
+    calls = []
+    assert not admission().admit(1, str(tmp_path), 5000 * MB, None, timeout=0, on_wait=lambda: calls.append(1))
+    assert calls == [1]
+
+
+def test_finalize_moves_files_and_removes_staging(tmp_path):
+    staging = staging_dir(str(tmp_path), 7)
+    os.makedirs(staging)
+    final = str(tmp_path / "Video.mp4")
+    with open(staged_path(staging, final), "w") as f: f.write("data")
+    assert finalize(staging, [final, str(tmp_path / "missing.mp4")]) == [final]
+    assert not os.path.exists(os.path.join(str(tmp_path), storage.STAGING_DIR))
+
+
+def test_discard_partials_keeps_finished_files(tmp_path):
+    for name in ("a.mp4.part", "a.mp4.ytdl", "a.f137.mp4.part-Frag3", "a.f140.m4a", "formats.json"):
+        (tmp_path / name).write_text("x")
+    discard_partials(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["a.f140.m4a", "formats.json"]
+
+
+def test_sweep_removes_only_dead_local_staging(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "pid_alive", lambda pid: pid == 100)
+    root = tmp_path / storage.STAGING_DIR
+    names = [f"job-200.{storage.HOST_TAG}-1",  # dead, this machine
+             "job-201-2",                        # dead, made before host tags
+             f"job-100.{storage.HOST_TAG}-3",  # still running
+             "job-202.0000beef-4",               # another machine on a shared volume
+             "notes"]
+    for name in names: (root / name).mkdir(parents=True)
+    assert sweep_staging(str(tmp_path)) == 2
+    assert sorted(os.listdir(root)) == sorted(names[2:])
+
+
+def test_sweep_runs_once_per_save_dir(tmp_path, free_space, monkeypatch):
+    swept = []
+    monkeypatch.setattr(storage, "sweep_staging", swept.append)
+    disk = admission()
+    disk.admit(1, str(tmp_path), MB, str(tmp_path / "s1"), timeout=0)
+    disk.admit(2, str(tmp_path), MB, str(tmp_path / "s2"), timeout=0)
+    assert swept == [str(tmp_path)]
+
+
+def test_pid_alive():
+    assert storage.pid_alive(os.getpid())
+
+
+def test_discard_leaves_other_jobs_staging(tmp_path):
+    first, second = staging_dir(str(tmp_path), 1), staging_dir(str(tmp_path), 2)
+    os.makedirs(first)
+    os.makedirs(second)
+    discard(first)
+    assert os.listdir(os.path.dirname(second)) == [os.path.basename(second)]
+    discard(second)
+    assert not os.path.exists(os.path.dirname(second))